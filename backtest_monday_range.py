@@ -1,23 +1,21 @@
 from __future__ import annotations
 import argparse
+import os
 import json
-import matplotlib.pyplot as plt
+from contextlib import nullcontext
 
 from src.data import download_ohlc
+from src.ingest import FileProvider
+from src.cache import BarStore, FeatureStore
+from src.experiments import ExperimentStore
+from src.anchors import anchor_ranges
 from src.features import add_monday_range
 from src.backtest import backtest_sweep_fade
-from src.metrics import equity_metrics, trade_metrics
-
-def bars_per_year_from_interval(interval: str) -> float:
-    # crude mapping for Sharpe annualisation
-    interval = interval.lower().strip()
-    if interval.endswith("h"):
-        hours = float(interval[:-1])
-        return 365.0 * 24.0 / hours
-    if interval.endswith("d"):
-        days = float(interval[:-1])
-        return 365.0 / days
-    return 365.0 * 24.0 / 4.0  # fallback
+from src.intrabar import StoreResolver, backtest_intrabar
+from src.robustness import robustness_report
+from src.metrics import equity_metrics, trade_metrics, bars_per_year_from_interval
+from src.plotting import render_equity
+from src.profiling import Profiler, PROFILE_MODES, stage
 
 def main():
     ap = argparse.ArgumentParser(description="Backtest: Monday range sweep-and-fade strategy.")
@@ -26,45 +24,122 @@ def main():
     ap.add_argument("--period", default="2y")
     ap.add_argument("--start", default=None)
     ap.add_argument("--end", default=None)
+    ap.add_argument("--cache_dir", default="data/bars", help="local bar cache (memory-mapped .npy per column)")
+    ap.add_argument("--no_cache", action="store_true", help="always download, bypassing the local cache")
+    ap.add_argument("--refresh", action="store_true", help="fetch bars newer than the last cached one")
+    ap.add_argument("--data_file", default=None,
+                    help="local CSV/Parquet of bars or trades to resample to --interval instead of yfinance")
+    ap.add_argument("--data_kind", choices=["bars", "trades"], default="bars",
+                    help="bars: open/high/low/close columns; trades: one price column")
+    ap.add_argument("--anchor", default="monday",
+                    help="anchor range: monday, monday_first_<N>h, sunday_<H>h_monday, prior_week or <start>..<end> "
+                         "(window relative to Monday 00:00, e.g. -6h..1d)")
     ap.add_argument("--initial_capital", type=float, default=10_000.0)
     ap.add_argument("--risk_per_trade", type=float, default=100.0)
     ap.add_argument("--stop_mult", type=float, default=1.0)
     ap.add_argument("--tp1_frac", type=float, default=0.5)
+    ap.add_argument("--engine", choices=["loop", "array"], default="loop",
+                    help="loop: reference per-row loop; array: NumPy/numba state machine (identical output)")
+    ap.add_argument("--intrabar_interval", default=None,
+                    help="resolve bars that span stop and target with cached finer bars of this interval (e.g. 1m)")
+    ap.add_argument("--experiments", default="results/experiments.sqlite",
+                    help="experiment store: a run with the same parameters, bars and code is read back, not recomputed")
+    ap.add_argument("--no_memo", action="store_true", help="always recompute, bypassing the experiment store")
     ap.add_argument("--out_trades", default="results/trades.csv")
     ap.add_argument("--out_metrics", default="results/backtest_metrics.json")
+    ap.add_argument("--bootstrap", type=int, default=0, help="bootstrap/shuffle resamples for confidence intervals (0: off)")
+    ap.add_argument("--out_robustness", default="results/robustness.json")
     ap.add_argument("--out_plot", default="results/plots/equity_curve.png")
+    ap.add_argument("--plot_points", type=int, default=4000,
+                    help="max points drawn in the equity plot (min/max decimation; render time independent of bars)")
+    ap.add_argument("--profile", nargs="?", const="stages", choices=PROFILE_MODES, default=None,
+                    help="record per-stage wall/CPU time, rows and memory (memory: tracemalloc peaks; "
+                         "cprofile: also dump a cProfile profile)")
+    ap.add_argument("--out_profile", default="results/backtest_profile.json")
     args = ap.parse_args()
 
-    df = download_ohlc(args.symbol, interval=args.interval, period=args.period, start=args.start, end=args.end)
-    df = add_monday_range(df)
+    profiler = Profiler(args.profile) if args.profile else None
+    with profiler.activate() if profiler else nullcontext():
+        run(args, ap)
+    if profiler is not None:
+        print("\n=== Profile ===")
+        print(profiler.summary())
+        for path in profiler.save(args.out_profile):
+            print(f"Saved: {path}")
+
+def run(args, ap):
+    store = None if args.no_cache else BarStore(args.cache_dir)
+    provider = FileProvider({args.symbol: args.data_file}, kind=args.data_kind) if args.data_file else None
+    with stage("load") as st:
+        df = download_ohlc(args.symbol, interval=args.interval, period=args.period, start=args.start, end=args.end,
+                           provider=provider, store=store, refresh=args.refresh)
+        st.rows = len(df)
+    if store is not None:
+        print(f"Bar cache: {store.stats}")
+    features = None if store is None else FeatureStore(os.path.join(args.cache_dir, "_features"))
+    with stage("features", rows=len(df)):
+        df = add_monday_range(df, store=features)
+    if features is not None:
+        print(f"Feature cache: {features.stats}")
+    if args.anchor != "monday":
+        with stage("anchor", rows=len(df)):
+            df = anchor_ranges(df, [args.anchor]).frame(df, args.anchor)
 
-    df_out, trades = backtest_sweep_fade(
-        df,
+    params = dict(
         initial_capital=args.initial_capital,
         risk_per_trade=args.risk_per_trade,
         stop_mult=args.stop_mult,
         tp1_frac=args.tp1_frac,
     )
+    bars_per_year = bars_per_year_from_interval(args.interval)
 
-    trades.to_csv(args.out_trades, index=False)
+    def compute():
+        intrabar = None
+        with stage("backtest", rows=len(df)):
+            if args.intrabar_interval:
+                if store is None:
+                    ap.error("--intrabar_interval reads finer bars from the local cache; drop --no_cache")
+                resolver = StoreResolver(store, args.symbol, args.intrabar_interval, bar_interval=args.interval)
+                df_out, trades, intrabar = backtest_intrabar(df, resolver, **params)
+            else:
+                df_out, trades = backtest_sweep_fade(df, engine=args.engine, **params)
 
-    bars_per_year = bars_per_year_from_interval(args.interval)
-    em = equity_metrics(df_out["equity"], bars_per_year=bars_per_year)
-    tm = trade_metrics(trades)
-    metrics = {"equity": em, "trades": tm}
+        with stage("metrics", rows=len(df_out)):
+            em = equity_metrics(df_out["equity"], bars_per_year=bars_per_year)
+            tm = trade_metrics(trades)
+            metrics = {"equity": em, "trades": tm}
+            if intrabar is not None:
+                metrics["intrabar"] = intrabar
+        return metrics, {"trades": trades, "equity": df_out["equity"]}
+
+    # intrabar runs also read finer cached bars that the key does not cover
+    if args.no_memo or args.intrabar_interval:
+        metrics, artifacts = compute()
+    else:
+        experiments = ExperimentStore(args.experiments)
+        key = dict(params, anchor=args.anchor, bars_per_year=bars_per_year)
+        metrics, artifacts, hit = experiments.memoize("backtest", key, df, compute,
+                                                      symbol=args.symbol, interval=args.interval)
+        print(f"Experiment store: {'hit' if hit else 'stored'} ({args.experiments})")
+        experiments.close()
+    trades, equity = artifacts["trades"], artifacts["equity"]
+
+    with stage("write"):
+        trades.to_csv(args.out_trades, index=False)
+        with open(args.out_metrics, "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2)
 
-    with open(args.out_metrics, "w", encoding="utf-8") as f:
-        json.dump(metrics, f, indent=2)
+    if args.bootstrap > 0:
+        with stage("robustness", rows=len(trades)):
+            report = robustness_report(trades, n_resamples=args.bootstrap, initial_capital=args.initial_capital)
+        with open(args.out_robustness, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved: {args.out_robustness}")
 
     # plot
-    plt.figure()
-    df_out["equity"].plot()
-    plt.title(f"Equity curve: {args.symbol} ({args.interval})")
-    plt.xlabel("Time")
-    plt.ylabel("Equity")
-    plt.tight_layout()
-    plt.savefig(args.out_plot, dpi=150)
-    plt.close()
+    with stage("plot", rows=len(equity)):
+        render_equity(equity, args.out_plot, title=f"Equity curve: {args.symbol} ({args.interval})",
+                      max_points=args.plot_points)
 
     print("\n=== Backtest metrics ===")
     print(metrics)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+
+from src.benchmark import STAGES, run_benchmarks, compare_to_baseline
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks: stage timings/memory on synthetic bars, with regression gates.")
+    ap.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated bar counts")
+    ap.add_argument("--interval", default="1h")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of: " + ", ".join(STAGES))
+    ap.add_argument("--weekends", choices=["yes", "no"], default="yes", help="no: drop Sat/Sun bars")
+    ap.add_argument("--holiday_rate", type=float, default=0.0)
+    ap.add_argument("--gap_rate", type=float, default=0.0)
+    ap.add_argument("--max_reference_bars", type=int, default=20_000, help="largest size for the slow loop stages")
+    ap.add_argument("--cross_check_bars", type=int, default=20_000, help="largest size for fast-vs-reference checks")
+    ap.add_argument("--baseline", default="results/benchmarks/baseline.json")
+    ap.add_argument("--save_baseline", action="store_true", help="write this run as the new baseline")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (fraction)")
+    ap.add_argument("--out_json", default="results/benchmarks/latest.json")
+    args = ap.parse_args()
+
+    report = run_benchmarks(
+        [int(s) for s in args.sizes.split(",") if s.strip()],
+        stages=[s.strip() for s in args.stages.split(",") if s.strip()],
+        interval=args.interval,
+        seed=args.seed,
+        repeat=args.repeat,
+        max_reference_bars=args.max_reference_bars,
+        cross_check_bars=args.cross_check_bars,
+        weekends=args.weekends == "yes",
+        holiday_rate=args.holiday_rate,
+        gap_rate=args.gap_rate,
+    )
+
+    os.makedirs(os.path.dirname(args.out_json) or ".", exist_ok=True)
+    with open(args.out_json, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved: {args.out_json}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline: {args.baseline}")
+        problems = compare_to_baseline(report, {}, threshold=args.threshold)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare_to_baseline(report, baseline, threshold=args.threshold)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save_baseline to create one.")
+        problems = compare_to_baseline(report, {}, threshold=args.threshold)
+
+    if problems:
+        print("\n=== Regressions ===")
+        for p in problems:
+            print(f"  {p}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+if __name__ == "__main__":
+    main()
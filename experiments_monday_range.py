@@ -0,0 +1,44 @@
+from __future__ import annotations
+import argparse
+
+import pandas as pd
+
+from src.experiments import ExperimentStore, METRIC_COLUMNS
+
+def main():
+    ap = argparse.ArgumentParser(description="Query and prune the experiment store of memoized runs.")
+    ap.add_argument("--experiments", default="results/experiments.sqlite")
+    ap.add_argument("--kind", choices=["sweep", "backtest", "research", "pipeline"], default=None)
+    ap.add_argument("--symbol", default=None)
+    ap.add_argument("--best", choices=METRIC_COLUMNS, default=None, help="top run per --by group by this metric")
+    ap.add_argument("--by", default="symbol", choices=["symbol", "interval", "kind", "data_hash", "code_version"])
+    ap.add_argument("--evict_days", type=float, default=None, help="delete runs not used for this many days")
+    ap.add_argument("--max_mb", type=float, default=None, help="delete least recently used runs above this size")
+    ap.add_argument("--out_csv", default=None)
+    args = ap.parse_args()
+
+    store = ExperimentStore(args.experiments)
+    if args.evict_days is not None or args.max_mb is not None:
+        max_bytes = None if args.max_mb is None else int(args.max_mb * 1024 * 1024)
+        removed = store.evict(max_age_days=args.evict_days, max_bytes=max_bytes)
+        print(f"Evicted {removed} runs")
+
+    if args.best:
+        table = store.best(args.best, by=args.by, kind=args.kind)
+    else:
+        table = store.runs(kind=args.kind, symbol=args.symbol)
+        if args.symbol is None and not table.empty:
+            print(table.groupby(["kind", "symbol", "interval"], dropna=False)
+                  .agg(runs=("run_key", "size"), mb=("bytes", lambda b: b.sum() / 1e6), hits=("hits", "sum"))
+                  .to_string())
+    if not table.empty:
+        table = table.assign(**{c: pd.to_datetime(table[c], unit="s") for c in ("created", "last_used") if c in table})
+    print(f"\n=== {len(table)} runs in {args.experiments} ===")
+    print(table.head(20).to_string(index=False))
+    if args.out_csv:
+        table.to_csv(args.out_csv, index=False)
+        print(f"Saved: {args.out_csv}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
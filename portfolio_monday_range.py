@@ -0,0 +1,92 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from src.cache import BarStore, FeatureStore
+from src.data import download_ohlc
+from src.features import add_monday_range
+from src.metrics import bars_per_year_from_interval
+from src.plotting import render_equity
+from src.portfolio import backtest_portfolio
+from src.universe import read_symbols
+
+def main():
+    ap = argparse.ArgumentParser(description="Portfolio backtest: Monday range sweep-and-fade on many symbols, shared capital.")
+    ap.add_argument("--symbols_file", required=True, help="text file, one symbol per line")
+    ap.add_argument("--interval", default="1h")
+    ap.add_argument("--period", default="2y")
+    ap.add_argument("--start", default=None)
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--cache_dir", default="data/bars", help="local bar cache (memory-mapped .npy per column)")
+    ap.add_argument("--no_cache", action="store_true", help="always download, bypassing the local cache")
+    ap.add_argument("--initial_capital", type=float, default=100_000.0)
+    ap.add_argument("--risk_per_trade", type=float, default=100.0, help="$ risk at the stop per trade")
+    ap.add_argument("--risk_frac", type=float, default=None, help="risk per trade as a fraction of equity (overrides --risk_per_trade)")
+    ap.add_argument("--max_positions", type=int, default=None, help="max concurrent positions")
+    ap.add_argument("--max_open_risk", type=float, default=None, help="max summed open risk, fraction of equity")
+    ap.add_argument("--max_leverage", type=float, default=None, help="max summed entry notional, multiple of equity")
+    ap.add_argument("--stop_mult", type=float, default=1.0)
+    ap.add_argument("--tp1_frac", type=float, default=0.5)
+    ap.add_argument("--out_dir", default="results/portfolio")
+    args = ap.parse_args()
+
+    symbols = read_symbols(args.symbols_file)
+    os.makedirs(args.out_dir, exist_ok=True)
+    store = None if args.no_cache else BarStore(args.cache_dir)
+    features = None if store is None else FeatureStore(os.path.join(args.cache_dir, "_features"))
+
+    t0 = time.perf_counter()
+    frames = {}
+    for sym in symbols:
+        try:
+            df = download_ohlc(sym, interval=args.interval, period=args.period, start=args.start, end=args.end, store=store)
+            frames[sym] = add_monday_range(df, store=features)
+        except Exception as exc:  # one bad symbol must not stop the book
+            print(f"{sym:<12} skipped: {type(exc).__name__}: {exc}")
+    t_load = time.perf_counter() - t0
+    if not frames:
+        raise SystemExit("No symbols could be loaded")
+
+    t0 = time.perf_counter()
+    result = backtest_portfolio(
+        frames,
+        bars_per_year=bars_per_year_from_interval(args.interval),
+        initial_capital=args.initial_capital,
+        risk_per_trade=args.risk_per_trade,
+        risk_frac=args.risk_frac,
+        max_positions=args.max_positions,
+        max_open_risk=args.max_open_risk,
+        max_leverage=args.max_leverage,
+        stop_mult=args.stop_mult,
+        tp1_frac=args.tp1_frac,
+    )
+    t_run = time.perf_counter() - t0
+
+    out_equity = os.path.join(args.out_dir, "portfolio_equity.csv")
+    out_trades = os.path.join(args.out_dir, "portfolio_trades.csv")
+    out_skipped = os.path.join(args.out_dir, "portfolio_skipped.csv")
+    out_attr = os.path.join(args.out_dir, "portfolio_attribution.csv")
+    out_metrics = os.path.join(args.out_dir, "portfolio_metrics.json")
+    out_plot = os.path.join(args.out_dir, "portfolio_equity.png")
+    pd.concat([result.equity, result.open_positions, result.open_risk], axis=1).to_csv(out_equity)
+    result.trades.to_csv(out_trades, index=False)
+    result.skipped.to_csv(out_skipped, index=False)
+    result.attribution.to_csv(out_attr, index=False)
+    with open(out_metrics, "w", encoding="utf-8") as f:
+        json.dump(result.metrics, f, indent=2)
+    render_equity(result.equity, out_plot, title=f"Portfolio equity: {len(frames)} symbols ({args.interval})")
+
+    print(f"\n=== Portfolio: {len(frames)}/{len(symbols)} symbols, load {t_load:.2f}s, backtest {t_run:.2f}s ===")
+    print(json.dumps(result.metrics, indent=2))
+    print("\nTop / bottom contributors:")
+    attr = result.attribution.sort_values("pnl", ascending=False)
+    print(pd.concat([attr.head(5), attr.tail(5)]).drop_duplicates("symbol").to_string(index=False))
+    for path in (out_equity, out_trades, out_skipped, out_attr, out_metrics, out_plot):
+        print(f"Saved: {path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
 from __future__ import annotations
 import argparse
+import os
 import json
+from contextlib import nullcontext
+
 import pandas as pd
 
 from src.data import download_ohlc
+from src.ingest import FileProvider
+from src.cache import BarStore, FeatureStore
+from src.experiments import ExperimentStore
+from src.anchors import anchor_ranges
 from src.features import add_monday_range
 from src.research import analyze_weekly_sweep_signals, summarize_research
+from src.profiling import Profiler, PROFILE_MODES, stage
 
 def main():
     ap = argparse.ArgumentParser(description="Research: Monday range sweep-and-fade statistics.")
@@ -14,19 +22,78 @@ def main():
     ap.add_argument("--period", default="2y")
     ap.add_argument("--start", default=None)
     ap.add_argument("--end", default=None)
+    ap.add_argument("--cache_dir", default="data/bars", help="local bar cache (memory-mapped .npy per column)")
+    ap.add_argument("--no_cache", action="store_true", help="always download, bypassing the local cache")
+    ap.add_argument("--refresh", action="store_true", help="fetch bars newer than the last cached one")
+    ap.add_argument("--data_file", default=None,
+                    help="local CSV/Parquet of bars or trades to resample to --interval instead of yfinance")
+    ap.add_argument("--data_kind", choices=["bars", "trades"], default="bars",
+                    help="bars: open/high/low/close columns; trades: one price column")
+    ap.add_argument("--anchor", default="monday",
+                    help="anchor range: monday, monday_first_<N>h, sunday_<H>h_monday, prior_week or <start>..<end> "
+                         "(window relative to Monday 00:00, e.g. -6h..1d)")
+    ap.add_argument("--engine", choices=["loop", "array"], default="loop",
+                    help="loop: reference per-week scan; array: vectorized week-offset scan (identical output)")
+    ap.add_argument("--experiments", default="results/experiments.sqlite",
+                    help="experiment store: a run with the same anchor, bars and code is read back, not recomputed")
+    ap.add_argument("--no_memo", action="store_true", help="always recompute, bypassing the experiment store")
     ap.add_argument("--out_csv", default="results/research_signals.csv")
     ap.add_argument("--out_json", default="results/research_summary.json")
+    ap.add_argument("--profile", nargs="?", const="stages", choices=PROFILE_MODES, default=None,
+                    help="record per-stage wall/CPU time, rows and memory (memory: tracemalloc peaks; "
+                         "cprofile: also dump a cProfile profile)")
+    ap.add_argument("--out_profile", default="results/research_profile.json")
     args = ap.parse_args()
+    if args.anchor != "monday" and args.engine == "loop":
+        ap.error("--anchor reads the anchor's range columns; use --engine array (the loop scan recomputes Monday)")
+
+    profiler = Profiler(args.profile) if args.profile else None
+    with profiler.activate() if profiler else nullcontext():
+        run(args)
+    if profiler is not None:
+        print("\n=== Profile ===")
+        print(profiler.summary())
+        for path in profiler.save(args.out_profile):
+            print(f"Saved: {path}")
+
+def run(args):
+    store = None if args.no_cache else BarStore(args.cache_dir)
+    provider = FileProvider({args.symbol: args.data_file}, kind=args.data_kind) if args.data_file else None
+    with stage("load") as st:
+        df = download_ohlc(args.symbol, interval=args.interval, period=args.period, start=args.start, end=args.end,
+                           provider=provider, store=store, refresh=args.refresh)
+        st.rows = len(df)
+    if store is not None:
+        print(f"Bar cache: {store.stats}")
+    features = None if store is None else FeatureStore(os.path.join(args.cache_dir, "_features"))
+    with stage("features", rows=len(df)):
+        df = add_monday_range(df, store=features)
+    if features is not None:
+        print(f"Feature cache: {features.stats}")
+    if args.anchor != "monday":
+        with stage("anchor", rows=len(df)):
+            df = anchor_ranges(df, [args.anchor]).frame(df, args.anchor)
 
-    df = download_ohlc(args.symbol, interval=args.interval, period=args.period, start=args.start, end=args.end)
-    df = add_monday_range(df)
+    def compute():
+        with stage("research", rows=len(df)):
+            signals = analyze_weekly_sweep_signals(df, engine=args.engine)
+            summary = summarize_research(signals)
+        return summary, {"signals": signals}
 
-    signals = analyze_weekly_sweep_signals(df)
-    signals.to_csv(args.out_csv, index=False)
+    if args.no_memo:
+        summary, artifacts = compute()
+    else:
+        experiments = ExperimentStore(args.experiments)
+        summary, artifacts, hit = experiments.memoize("research", {"anchor": args.anchor}, df, compute,
+                                                      symbol=args.symbol, interval=args.interval)
+        print(f"Experiment store: {'hit' if hit else 'stored'} ({args.experiments})")
+        experiments.close()
+    signals = artifacts["signals"]
 
-    summary = summarize_research(signals)
-    with open(args.out_json, "w", encoding="utf-8") as f:
-        json.dump(summary, f, indent=2)
+    with stage("write", rows=len(signals)):
+        signals.to_csv(args.out_csv, index=False)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
 
     print("\n=== Research summary ===")
     for k, v in summary.items():
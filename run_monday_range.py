@@ -0,0 +1,226 @@
+from __future__ import annotations
+import argparse
+import os
+import json
+from contextlib import nullcontext
+
+from src.data import download_ohlc, lookback_start
+from src.ingest import FileProvider
+from src.cache import BarStore, FeatureStore, store_key
+from src.experiments import ExperimentStore
+from src.anchors import anchor_ranges
+from src.features import add_monday_range
+from src.robustness import robustness_report
+from src.metrics import bars_per_year_from_interval
+from src.outofcore import cached_rows, iter_week_chunks, run_out_of_core
+from src.pipeline import PipelineResult, compare_anchors, run_pipeline, write_outputs
+from src.plotting import render_equity
+from src.profiling import Profiler, PROFILE_MODES, stage
+
+def main():
+    ap = argparse.ArgumentParser(description="Research + backtest in one pass: Monday range sweep-and-fade.")
+    ap.add_argument("--symbol", default="BTC-USD")
+    ap.add_argument("--interval", default="4h")
+    ap.add_argument("--period", default="2y")
+    ap.add_argument("--start", default=None)
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--cache_dir", default="data/bars", help="local bar cache (memory-mapped .npy per column)")
+    ap.add_argument("--no_cache", action="store_true", help="always download, bypassing the local cache")
+    ap.add_argument("--refresh", action="store_true", help="fetch bars newer than the last cached one")
+    ap.add_argument("--data_file", default=None,
+                    help="local CSV/Parquet of bars or trades to resample to --interval instead of yfinance")
+    ap.add_argument("--data_kind", choices=["bars", "trades"], default="bars",
+                    help="bars: open/high/low/close columns; trades: one price column")
+    ap.add_argument("--anchor", default="monday",
+                    help="anchor range: monday, monday_first_<N>h, sunday_<H>h_monday, prior_week or <start>..<end> "
+                         "(window relative to Monday 00:00, e.g. -6h..1d)")
+    ap.add_argument("--initial_capital", type=float, default=10_000.0)
+    ap.add_argument("--risk_per_trade", type=float, default=100.0)
+    ap.add_argument("--stop_mult", type=float, default=1.0)
+    ap.add_argument("--tp1_frac", type=float, default=0.5)
+    ap.add_argument("--compare_anchors", default=None,
+                    help="comma-separated anchors to research + backtest side by side (ranges computed in one pass)")
+    ap.add_argument("--out_anchors", default="results/anchor_comparison.csv")
+    ap.add_argument("--experiments", default="results/experiments.sqlite",
+                    help="experiment store: a run with the same parameters, bars and code is read back, not recomputed")
+    ap.add_argument("--no_memo", action="store_true", help="always recompute, bypassing the experiment store")
+    ap.add_argument("--out_of_core", action="store_true",
+                    help="stream cached bars week by week from the memory-mapped cache (memory bounded by one "
+                         "week of bars); bars not cached yet are loaded once to fill the cache")
+    ap.add_argument("--chunk_weeks", type=int, default=1, help="ISO weeks per chunk with --out_of_core")
+    ap.add_argument("--out_equity", default=None, help="with --out_of_core: also write per-bar equity to this .npy")
+    ap.add_argument("--out_csv", default="results/research_signals.csv")
+    ap.add_argument("--out_json", default="results/research_summary.json")
+    ap.add_argument("--out_trades", default="results/trades.csv")
+    ap.add_argument("--out_metrics", default="results/backtest_metrics.json")
+    ap.add_argument("--bootstrap", type=int, default=0, help="bootstrap/shuffle resamples for confidence intervals (0: off)")
+    ap.add_argument("--out_robustness", default="results/robustness.json")
+    ap.add_argument("--out_plot", default="results/plots/equity_curve.png")
+    ap.add_argument("--plot_points", type=int, default=4000,
+                    help="max points drawn in the equity plot (min/max decimation; render time independent of bars)")
+    ap.add_argument("--profile", nargs="?", const="stages", choices=PROFILE_MODES, default=None,
+                    help="record per-stage wall/CPU time, rows and memory (memory: tracemalloc peaks; "
+                         "cprofile: also dump a cProfile profile)")
+    ap.add_argument("--out_profile", default="results/run_profile.json")
+    args = ap.parse_args()
+    if args.out_of_core and (args.no_cache or args.anchor != "monday" or args.compare_anchors):
+        ap.error("--out_of_core streams the Monday anchor from the local cache; "
+                 "drop --no_cache, --anchor and --compare_anchors")
+
+    profiler = Profiler(args.profile) if args.profile else None
+    with profiler.activate() if profiler else nullcontext():
+        run_streamed(args) if args.out_of_core else run(args)
+    if profiler is not None:
+        print("\n=== Profile ===")
+        print(profiler.summary())
+        for path in profiler.save(args.out_profile):
+            print(f"Saved: {path}")
+
+def run(args):
+    store = None if args.no_cache else BarStore(args.cache_dir)
+    provider = FileProvider({args.symbol: args.data_file}, kind=args.data_kind) if args.data_file else None
+    with stage("load") as st:
+        df = download_ohlc(args.symbol, interval=args.interval, period=args.period, start=args.start, end=args.end,
+                           provider=provider, store=store, refresh=args.refresh)
+        st.rows = len(df)
+    if store is not None:
+        print(f"Bar cache: {store.stats}")
+    features = None if store is None else FeatureStore(os.path.join(args.cache_dir, "_features"))
+    with stage("features", rows=len(df)):
+        df = add_monday_range(df, store=features)
+    if features is not None:
+        print(f"Feature cache: {features.stats}")
+    if args.anchor != "monday":
+        with stage("anchor", rows=len(df)):
+            df = anchor_ranges(df, [args.anchor]).frame(df, args.anchor)
+
+    params = dict(
+        bars_per_year=bars_per_year_from_interval(args.interval),
+        initial_capital=args.initial_capital,
+        risk_per_trade=args.risk_per_trade,
+        stop_mult=args.stop_mult,
+        tp1_frac=args.tp1_frac,
+    )
+
+    def compute():
+        with stage("pipeline", rows=len(df)):
+            res = run_pipeline(df, **params)
+        metrics = dict(res.metrics, summary=res.summary)
+        return metrics, {"signals": res.signals, "trades": res.trades, "equity": res.equity}
+
+    if args.no_memo:
+        metrics, artifacts = compute()
+    else:
+        experiments = ExperimentStore(args.experiments)
+        metrics, artifacts, hit = experiments.memoize("pipeline", dict(params, anchor=args.anchor), df, compute,
+                                                      symbol=args.symbol, interval=args.interval)
+        print(f"Experiment store: {'hit' if hit else 'stored'} ({args.experiments})")
+        experiments.close()
+    metrics = dict(metrics)
+    result = PipelineResult(signals=artifacts["signals"], summary=metrics.pop("summary"),
+                            equity=artifacts["equity"], trades=artifacts["trades"], metrics=metrics)
+    with stage("write"):
+        write_outputs(
+            result,
+            out_csv=args.out_csv,
+            out_json=args.out_json,
+            out_trades=args.out_trades,
+            out_metrics=args.out_metrics,
+        )
+
+    if args.compare_anchors:
+        with stage("compare_anchors", rows=len(df)):
+            table = compare_anchors(
+                df,
+                [a.strip() for a in args.compare_anchors.split(",") if a.strip()],
+                bars_per_year=bars_per_year_from_interval(args.interval),
+                initial_capital=args.initial_capital,
+                risk_per_trade=args.risk_per_trade,
+                stop_mult=args.stop_mult,
+                tp1_frac=args.tp1_frac,
+            )
+        table.to_csv(args.out_anchors, index=False)
+        print("\n=== Anchor comparison ===")
+        cols = ["anchor", "research_total_signals", "research_p_hit_mid", "total_return", "max_drawdown"]
+        print(table[[c for c in cols if c in table.columns]].to_string(index=False))
+        print(f"Saved: {args.out_anchors}")
+
+    if args.bootstrap > 0:
+        with stage("robustness", rows=len(result.trades)):
+            report = robustness_report(result.trades, result.signals, n_resamples=args.bootstrap,
+                                       initial_capital=args.initial_capital)
+        with open(args.out_robustness, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved: {args.out_robustness}")
+
+    # plot
+    with stage("plot", rows=len(result.equity)):
+        render_equity(result.equity, args.out_plot, title=f"Equity curve: {args.symbol} ({args.interval})",
+                      max_points=args.plot_points)
+
+    print("\n=== Research summary ===")
+    for k, v in result.summary.items():
+        print(f"{k:>22}: {v}")
+    print("\n=== Backtest metrics ===")
+    print(result.metrics)
+    for path in (args.out_csv, args.out_json, args.out_trades, args.out_metrics, args.out_plot):
+        print(f"Saved: {path}")
+
+def run_streamed(args):
+    store = BarStore(args.cache_dir)
+    provider = FileProvider({args.symbol: args.data_file}, kind=args.data_kind) if args.data_file else None
+    key = store_key(args.symbol, provider)
+    if store.meta(key, args.interval) is None or args.refresh:
+        with stage("load") as st:
+            st.rows = len(download_ohlc(args.symbol, interval=args.interval, period=args.period, start=args.start,
+                                        end=args.end, provider=provider, store=store, refresh=args.refresh))
+        print(f"Bar cache: {store.stats}")
+    cols = store.columns(key, args.interval)
+    start = args.start or (lookback_start(cols["index"], args.period, args.end) if cols is not None else None)
+    bars = cached_rows(store, key, args.interval, start, args.end)
+    if not bars:
+        raise SystemExit(f"No cached {args.interval} bars for {args.symbol} in the requested window")
+
+    result = run_out_of_core(
+        iter_week_chunks(store, key, args.interval, start=start, end=args.end, weeks=args.chunk_weeks),
+        bars_per_year=bars_per_year_from_interval(args.interval),
+        initial_capital=args.initial_capital,
+        risk_per_trade=args.risk_per_trade,
+        stop_mult=args.stop_mult,
+        tp1_frac=args.tp1_frac,
+        equity_path=args.out_equity,
+        total_bars=bars,
+    )
+    with stage("write"):
+        write_outputs(
+            result,
+            out_csv=args.out_csv,
+            out_json=args.out_json,
+            out_trades=args.out_trades,
+            out_metrics=args.out_metrics,
+        )
+
+    if args.bootstrap > 0:
+        with stage("robustness", rows=len(result.trades)):
+            report = robustness_report(result.trades, result.signals, n_resamples=args.bootstrap,
+                                       initial_capital=args.initial_capital)
+        with open(args.out_robustness, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved: {args.out_robustness}")
+
+    with stage("plot", rows=len(result.weekly_equity)):
+        render_equity(result.weekly_equity, args.out_plot,
+                      title=f"Equity curve (weekly): {args.symbol} ({args.interval})", max_points=args.plot_points)
+
+    print(f"\n=== Out-of-core: {result.bars} bars streamed in chunks of {args.chunk_weeks} week(s) ===")
+    print("\n=== Research summary ===")
+    for k, v in result.summary.items():
+        print(f"{k:>22}: {v}")
+    print("\n=== Backtest metrics ===")
+    print(result.metrics)
+    paths = [args.out_csv, args.out_json, args.out_trades, args.out_metrics, args.out_plot]
+    for path in paths + ([args.out_equity] if args.out_equity else []):
+        print(f"Saved: {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.engine import sweep_signals
+
+_NS_PER_DAY = 86_400 * 10**9
+_NS_PER_WEEK = 7 * _NS_PER_DAY
+_EPOCH_TO_MONDAY = 3 * _NS_PER_DAY  # 1970-01-01 is a Thursday
+
+@dataclass(frozen=True)
+class Anchor:
+    """Anchor range window [start, end) relative to Monday 00:00 of each ISO week.
+
+    start may be negative (reaching into the previous week). Bars of the week at or
+    after `end` are tradeable against the range.
+    """
+    name: str
+    start: pd.Timedelta
+    end: pd.Timedelta
+
+    def __post_init__(self):
+        object.__setattr__(self, "start", pd.Timedelta(self.start))
+        object.__setattr__(self, "end", pd.Timedelta(self.end))
+        if self.start >= self.end:
+            raise ValueError(f"Anchor {self.name!r}: start must be before end")
+
+def parse_anchor(spec: str | Anchor) -> Anchor:
+    """Anchor from a name:
+
+    - "monday": all of Monday (what add_monday_range uses)
+    - "monday_first_<N>h": the first N hours of Monday
+    - "sunday_<H>h_monday": Sunday from H:00 through the end of Monday
+    - "prior_week": the whole previous week (Monday to Sunday)
+    - "<start>..<end>": any window as Timedelta strings, e.g. "-6h..1d"
+    """
+    if isinstance(spec, Anchor):
+        return spec
+    s = spec.strip()
+    if s == "monday":
+        return Anchor(s, "0h", "1d")
+    if s == "prior_week":
+        return Anchor(s, "-7d", "0h")
+    m = re.fullmatch(r"monday_first_(\d+)h", s)
+    if m:
+        return Anchor(s, "0h", pd.Timedelta(hours=int(m.group(1))))
+    m = re.fullmatch(r"sunday_(\d+)h_monday", s)
+    if m:
+        return Anchor(s, pd.Timedelta(hours=int(m.group(1)) - 24), "1d")
+    if ".." in s:
+        start, end = s.split("..", 1)
+        return Anchor(s, start, end)
+    raise ValueError(f"Unknown anchor: {spec!r}")
+
+class AnchorRanges:
+    """Anchor high/low for many anchor definitions, one row per ISO week.
+
+    Built by anchor_ranges() from a single vectorized reduction over every
+    (anchor, week) window, so adding anchors costs little beyond the windows' bars.
+    Per-bar columns for one anchor (the add_monday_range feature columns) are a
+    gather from the week table.
+    """
+
+    def __init__(self, anchors: Sequence[Anchor], week_of_bar: np.ndarray, offset: np.ndarray,
+                 iso_year: np.ndarray, iso_week: np.ndarray, high: np.ndarray, low: np.ndarray):
+        self.anchors = {a.name: (i, a) for i, a in enumerate(anchors)}
+        self.week_of_bar = week_of_bar  # week row of each bar
+        self.offset = offset            # ns since Monday 00:00 of the bar's week
+        self.iso_year = iso_year        # per week
+        self.iso_week = iso_week
+        self.high = high                # (anchor, week)
+        self.low = low
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.anchors)
+
+    def _row(self, name: str) -> tuple[int, Anchor]:
+        try:
+            return self.anchors[name]
+        except KeyError:
+            raise KeyError(f"Anchor {name!r} not in this index (has {self.names})") from None
+
+    def table(self) -> pd.DataFrame:
+        """Long per-week table: anchor, iso_year, iso_week, high, low, mid, range."""
+        n_weeks = len(self.iso_year)
+        high, low = self.high.ravel(), self.low.ravel()
+        return pd.DataFrame({
+            "anchor": np.repeat(self.names, n_weeks),
+            "iso_year": np.tile(self.iso_year, len(self.anchors)),
+            "iso_week": np.tile(self.iso_week, len(self.anchors)),
+            "high": high,
+            "low": low,
+            "mid": (high + low) / 2.0,
+            "range": high - low,
+        })
+
+    def columns(self, name: str) -> Dict[str, np.ndarray]:
+        """mon_high, mon_low, mon_range, mon_mid and is_tradeable per bar for anchor `name`."""
+        i, anchor = self._row(name)
+        mon_high = self.high[i][self.week_of_bar]
+        mon_low = self.low[i][self.week_of_bar]
+        return {
+            "mon_high": mon_high,
+            "mon_low": mon_low,
+            "mon_range": mon_high - mon_low,
+            "mon_mid": (mon_high + mon_low) / 2.0,
+            "is_tradeable": self.offset >= anchor.end.value,
+        }
+
+    def arrays(self, base: Dict[str, np.ndarray], name: str) -> Dict[str, np.ndarray]:
+        """engine.feature_arrays output re-pointed at anchor `name`, with long_sig/short_sig,
+        ready for research.signal_outcomes and engine.run_sweep_fade."""
+        out = dict(base)
+        out.update(self.columns(name))
+        out["long_sig"], out["short_sig"] = sweep_signals(out)
+        return out
+
+    def frame(self, df: pd.DataFrame, name: str) -> pd.DataFrame:
+        """Copy of an add_monday_range frame with the range columns of anchor `name`,
+        for backtest_sweep_fade and analyze_weekly_sweep_signals(engine="array")."""
+        out = df.copy()
+        for col, values in self.columns(name).items():
+            out[col] = values
+        return out
+
+def _wall_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    if index.tz is not None:
+        index = index.tz_localize(None)  # wall clock, like add_calendar_features' weekday
+    return index.as_unit("ns").asi8
+
+def anchor_ranges(df: pd.DataFrame, anchors: Iterable[str | Anchor]) -> AnchorRanges:
+    """Per-week anchor high/low for every anchor in one pass over time-sorted bars.
+
+    Window bounds for all (anchor, week) pairs are located with one searchsorted and
+    reduced with one fmax/fmin reduceat each; empty windows (e.g. a week without
+    Monday bars) give NaN, as in add_monday_range. The "monday" anchor reproduces
+    add_monday_range's columns exactly.
+    """
+    specs = [parse_anchor(a) for a in anchors]
+    if len({a.name for a in specs}) != len(specs):
+        raise ValueError("Anchor names must be unique")
+    ts = _wall_ns(pd.DatetimeIndex(df.index))
+    n = len(ts)
+    if n > 1 and (np.diff(ts) < 0).any():
+        raise ValueError("Bars must be sorted by time")
+
+    week = (ts + _EPOCH_TO_MONDAY) // _NS_PER_WEEK
+    starts = np.flatnonzero(np.r_[True, week[1:] != week[:-1]]) if n else np.zeros(0, dtype=np.int64)
+    week_of_bar = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+    monday = week[starts] * _NS_PER_WEEK - _EPOCH_TO_MONDAY
+    offset = ts - monday[week_of_bar]
+    iso = pd.DatetimeIndex(monday.view("M8[ns]")).isocalendar()
+    iso_year = iso["year"].to_numpy(dtype=np.int64)
+    iso_week = iso["week"].to_numpy(dtype=np.int64)
+
+    shape = (len(specs), len(starts))
+    high = np.full(shape, np.nan)
+    low = np.full(shape, np.nan)
+    if n and specs:
+        bounds = np.empty((len(specs), len(starts), 2), dtype=np.int64)
+        bounds[:, :, 0] = monday + np.array([a.start.value for a in specs])[:, None]
+        bounds[:, :, 1] = monday + np.array([a.end.value for a in specs])[:, None]
+        idx = np.searchsorted(ts, bounds.ravel()).reshape(-1, 2)
+        nonempty = idx[:, 1] > idx[:, 0]
+        pairs = idx[nonempty].ravel()
+        if len(pairs):
+            h = np.append(df["high"].to_numpy(dtype=np.float64), np.nan)  # end bound may equal n
+            l = np.append(df["low"].to_numpy(dtype=np.float64), np.nan)
+            high.ravel()[nonempty] = np.fmax.reduceat(h, pairs)[0::2]
+            low.ravel()[nonempty] = np.fmin.reduceat(l, pairs)[0::2]
+    return AnchorRanges(specs, week_of_bar, offset, iso_year, iso_week, high, low)
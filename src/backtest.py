@@ -4,6 +4,9 @@ import numpy as np
 from dataclasses import dataclass
 from typing import Dict, Any, List, Optional, Tuple
 
+from src.engine import feature_arrays, run_sweep_fade, expand_sparse, SIDES, REASONS
+from src.profiling import stage
+
 @dataclass
 class Trade:
     entry_time: pd.Timestamp
@@ -26,15 +29,44 @@ def backtest_sweep_fade(
     tp1_frac: float = 0.5,       # fraction to take at mid
     tp2_to_full: float = 1.0,    # 1.0 means opposite side (Mon high for long, Mon low for short)
     exit_friday_close: bool = True,
+    engine: str = "loop",
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
     """Event-driven backtest: one trade per week, first signal only.
 
     Position sizing: fixed $ risk per trade using distance to stop.
 
+    engine:
+      - "loop": reference row-by-row implementation over the DataFrame
+      - "array": same state machine over NumPy arrays (numba-compiled when available),
+        producing an identical trade log and equity/position columns
+
     Returns:
       - df_out: original df plus equity/position columns
       - trades: trade log
     """
+    params = dict(
+        initial_capital=initial_capital, risk_per_trade=risk_per_trade, stop_mult=stop_mult,
+        tp1_at_mid=tp1_at_mid, tp1_frac=tp1_frac, tp2_to_full=tp2_to_full,
+        exit_friday_close=exit_friday_close,
+    )
+    if engine not in ("loop", "array"):
+        raise ValueError(f"Unknown engine: {engine!r} (expected 'loop' or 'array')")
+    with stage(f"backtest_{engine}", rows=len(df)):
+        if engine == "array":
+            return _backtest_sweep_fade_array(df, **params)
+        return _backtest_sweep_fade_loop(df, **params)
+
+def _backtest_sweep_fade_loop(
+    df: pd.DataFrame,
+    *,
+    initial_capital: float,
+    risk_per_trade: float,
+    stop_mult: float,
+    tp1_at_mid: bool,
+    tp1_frac: float,
+    tp2_to_full: float,
+    exit_friday_close: bool,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
     df = df.copy()
     df["equity"] = np.nan
     df["position"] = 0.0
@@ -161,3 +193,104 @@ def backtest_sweep_fade(
 
     trades_df = pd.DataFrame([t.__dict__ for t in trades])
     return df, trades_df
+
+def trades_from_arrays(index: pd.Index, res: Dict[str, Any], iso_year, iso_week) -> pd.DataFrame:
+    """Build the trade log from `run_sweep_fade` trade buffers (same layout as the loop)."""
+    trades: List[Trade] = []
+    for k in range(res["num_trades"]):
+        i = int(res["trade_index"][k])
+        ts = index[i]
+        trades.append(Trade(
+            entry_time=ts, exit_time=ts,
+            side=SIDES[int(res["trade_side"][k])],
+            entry=float(res["trade_entry"][k]),
+            exit=float(res["trade_exit"][k]),
+            qty=float(res["trade_qty"][k]),
+            pnl=float(res["trade_pnl_closed"][k]),
+            reason=REASONS[int(res["trade_reason"][k])],
+            week_id=(int(iso_year[i]), int(iso_week[i])),
+        ))
+    return pd.DataFrame([t.__dict__ for t in trades])
+
+def _backtest_sweep_fade_array(df: pd.DataFrame, **params) -> tuple[pd.DataFrame, pd.DataFrame]:
+    arrays = feature_arrays(df)
+    res = run_sweep_fade(arrays, **params)
+
+    out = df.copy()
+    out["equity"] = res["equity"]
+    out["position"] = res["position"]
+    out["trade_pnl"] = res["trade_pnl"]
+    trades_df = trades_from_arrays(df.index, res, arrays["iso_year"], arrays["iso_week"])
+    return out, trades_df
+
+@dataclass
+class BacktestResult:
+    """Columnar backtest output: plain arrays plus a structured trade buffer.
+
+    equity/position/trade_pnl are dense arrays aligned with `index`, or, when
+    `change_points` is set (sparse mode), the values at those bar indices only.
+    `trades` is an engine.TRADE_DTYPE structured array.
+    """
+    index: pd.Index
+    equity: np.ndarray
+    position: np.ndarray
+    trade_pnl: np.ndarray
+    trades: np.ndarray
+    change_points: Optional[Dict[str, np.ndarray]] = None
+
+    @property
+    def num_trades(self) -> int:
+        return len(self.trades)
+
+    def column(self, name: str) -> np.ndarray:
+        """Dense equity/position/trade_pnl values (expanded from change points if sparse)."""
+        values = getattr(self, name)
+        if self.change_points is None:
+            return values
+        return expand_sparse(self.change_points[name], values, len(self.index))
+
+    def frame(self) -> pd.DataFrame:
+        """equity/position/trade_pnl as a DataFrame on the bar index."""
+        return pd.DataFrame({c: self.column(c) for c in ("equity", "position", "trade_pnl")}, index=self.index)
+
+    def trade_log(self) -> pd.DataFrame:
+        """Trade log in the same layout as `backtest_sweep_fade`."""
+        t = self.trades
+        rows = []
+        for i, side, entry, exit_px, qty, pnl, reason, y, w in zip(
+            t["exit_index"].tolist(), t["side"].tolist(), t["entry"].tolist(), t["exit"].tolist(),
+            t["qty"].tolist(), t["pnl"].tolist(), t["reason"].tolist(), t["iso_year"].tolist(), t["iso_week"].tolist(),
+        ):
+            ts = self.index[i]
+            rows.append(Trade(entry_time=ts, exit_time=ts, side=SIDES[side], entry=entry, exit=exit_px,
+                              qty=qty, pnl=pnl, reason=REASONS[reason], week_id=(y, w)).__dict__)
+        return pd.DataFrame(rows)
+
+def backtest_sweep_fade_columnar(
+    df: pd.DataFrame,
+    *,
+    dtype: Any = np.float64,
+    sparse: bool = False,
+    chunk_bars: int | None = None,
+    use_numba: bool | None = None,
+    **params,
+) -> BacktestResult:
+    """Memory-lean variant of the array engine for long histories.
+
+    Never copies `df`: the kernel reads views of its columns chunk by chunk and writes
+    into preallocated result arrays (float32 with dtype=np.float32, or change points
+    only with sparse=True). Peak memory beyond the inputs is the result arrays plus
+    one chunk of scratch. Same trading rules and results as backtest_sweep_fade;
+    params are the same keyword arguments.
+    """
+    arrays = feature_arrays(df)
+    res = run_sweep_fade(arrays, dtype=dtype, sparse=sparse, chunk_bars=chunk_bars, use_numba=use_numba, **params)
+    names = ("equity", "position", "trade_pnl")
+    return BacktestResult(
+        index=df.index,
+        equity=res["equity"],
+        position=res["position"],
+        trade_pnl=res["trade_pnl"],
+        trades=res["trades"],
+        change_points={k: res[k + "_at"] for k in names} if sparse else None,
+    )
@@ -0,0 +1,201 @@
+from __future__ import annotations
+import gc
+import io
+import platform
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import backtest_sweep_fade
+from src.features import add_monday_range
+from src.live import replay_sweep_fade
+from src.metrics import equity_metrics, bars_per_year_from_interval
+from src.pipeline import run_pipeline
+from src.portfolio import backtest_portfolio
+from src.plotting import render_equity
+from src.research import analyze_weekly_sweep_signals
+from src.synthetic import synthetic_ohlc
+
+# Each stage takes a context dict: raw (OHLC), features (add_monday_range output),
+# equity (pd.Series) and bars_per_year.
+STAGES: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "add_monday_range": lambda ctx: add_monday_range(ctx["raw"]),
+    "backtest_loop": lambda ctx: backtest_sweep_fade(ctx["features"]),
+    "backtest_array": lambda ctx: backtest_sweep_fade(ctx["features"], engine="array"),
+    "research_loop": lambda ctx: analyze_weekly_sweep_signals(ctx["features"]),
+    "research_array": lambda ctx: analyze_weekly_sweep_signals(ctx["features"], engine="array"),
+    "equity_metrics": lambda ctx: equity_metrics(ctx["equity"], bars_per_year=ctx["bars_per_year"]),
+    "pipeline": lambda ctx: run_pipeline(ctx["features"], bars_per_year=ctx["bars_per_year"]),
+    "plot_equity": lambda ctx: render_equity(ctx["equity"], io.BytesIO()),
+}
+
+# row-by-row reference implementations: too slow to time on the largest inputs
+REFERENCE_STAGES = {"backtest_loop", "research_loop"}
+
+def _frames_equal(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    try:
+        pd.testing.assert_frame_equal(a, b, check_exact=True)
+        return True
+    except AssertionError:
+        return False
+
+def _check_backtest(ctx):
+    a, ta = backtest_sweep_fade(ctx["features"])
+    b, tb = backtest_sweep_fade(ctx["features"], engine="array")
+    return _frames_equal(a, b) and _frames_equal(ta, tb)
+
+def _check_research(ctx):
+    return _frames_equal(
+        analyze_weekly_sweep_signals(ctx["features"]),
+        analyze_weekly_sweep_signals(ctx["features"], engine="array"),
+    )
+
+def _check_replay(ctx):
+    _, ta = backtest_sweep_fade(ctx["features"], engine="array")
+    _, tb = replay_sweep_fade(ctx["raw"])
+    return _frames_equal(ta, tb)
+
+def _check_pipeline(ctx):
+    res = run_pipeline(ctx["features"], bars_per_year=ctx["bars_per_year"])
+    out, trades = backtest_sweep_fade(ctx["features"])
+    return (
+        _frames_equal(res.signals, analyze_weekly_sweep_signals(ctx["features"]))
+        and _frames_equal(res.trades, trades)
+        and np.array_equal(res.equity.to_numpy(), out["equity"].to_numpy())
+    )
+
+def _check_portfolio(ctx):
+    # on a holiday calendar some weeks lose their Monday range while a trade is open
+    raw = ctx["raw"]
+    days = raw.index.normalize()
+    unique_days = days.unique()
+    holidays = unique_days[np.random.default_rng(0).random(len(unique_days)) < 0.3]
+    features = add_monday_range(raw[~days.isin(holidays)])
+    out, _ = backtest_sweep_fade(features, engine="array")
+    res = backtest_portfolio({"X": features}, bars_per_year=ctx["bars_per_year"], initial_capital=10_000.0)
+    return np.allclose(res.equity.to_numpy(), out["equity"].to_numpy(), rtol=0.0, atol=1e-6)
+
+# fast path vs reference implementation, compared for exact equality (portfolio: to
+# float rounding, as it sums P&L per leg in a different order)
+CROSS_CHECKS: Dict[str, Callable[[Dict[str, Any]], bool]] = {
+    "backtest_array_vs_loop": _check_backtest,
+    "research_array_vs_loop": _check_research,
+    "live_replay_vs_batch": _check_replay,
+    "pipeline_vs_separate": _check_pipeline,
+    "portfolio_vs_single_holidays": _check_portfolio,
+}
+
+def make_context(n_bars: int, interval: str = "1h", seed: int = 0, **synthetic_kwargs) -> Dict[str, Any]:
+    raw = synthetic_ohlc(n_bars, interval=interval, seed=seed, **synthetic_kwargs)
+    features = add_monday_range(raw)
+    bars_per_year = bars_per_year_from_interval(interval)
+    out, _ = backtest_sweep_fade(features, engine="array")
+    return {"raw": raw, "features": features, "equity": out["equity"], "bars_per_year": bars_per_year}
+
+def measure(fn: Callable[[Dict[str, Any]], Any], ctx: Dict[str, Any], repeat: int = 3) -> Dict[str, float]:
+    """Best-of-`repeat` wall time, plus peak traced allocation from one extra traced run."""
+    times = []
+    for _ in range(max(repeat, 1)):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(ctx)
+        times.append(time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time_s": min(times), "peak_mb": peak / 2**20}
+
+def run_benchmarks(
+    sizes: Sequence[int],
+    *,
+    stages: Sequence[str] | None = None,
+    interval: str = "1h",
+    seed: int = 0,
+    repeat: int = 3,
+    max_reference_bars: int = 20_000,
+    cross_check_bars: int = 20_000,
+    verbose: bool = True,
+    **synthetic_kwargs,
+) -> Dict[str, Any]:
+    """Time and memory-profile each stage at each size on seeded synthetic bars.
+
+    Reference (loop) stages are skipped above `max_reference_bars`; cross-checks run
+    at sizes up to `cross_check_bars`. Returns a JSON-serialisable dict:
+    {"meta": ..., "results": {stage: {size: {time_s, peak_mb, bars_per_s}}},
+     "cross_checks": {check: {size: bool}}}
+    """
+    stages = list(stages or STAGES)
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages: {sorted(unknown)}")
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "interval": interval,
+            "seed": seed,
+            "repeat": repeat,
+            "synthetic": synthetic_kwargs,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+        },
+        "results": {s: {} for s in stages},
+        "cross_checks": {c: {} for c in CROSS_CHECKS},
+    }
+    for n in sizes:
+        ctx = make_context(n, interval=interval, seed=seed, **synthetic_kwargs)
+        for stage in stages:
+            if stage in REFERENCE_STAGES and n > max_reference_bars:
+                continue
+            m = measure(STAGES[stage], ctx, repeat=repeat)
+            m["bars_per_s"] = n / m["time_s"] if m["time_s"] > 0 else float("inf")
+            report["results"][stage][str(n)] = m
+            if verbose:
+                print(f"{stage:>18} n={n:>9,}  {m['time_s']:9.4f}s  {m['peak_mb']:8.1f} MB  {m['bars_per_s']:14,.0f} bars/s", flush=True)
+        if n <= cross_check_bars:
+            for name, check in CROSS_CHECKS.items():
+                ok = bool(check(ctx))
+                report["cross_checks"][name][str(n)] = ok
+                if verbose:
+                    print(f"{'check':>18} n={n:>9,}  {name}: {'identical' if ok else 'MISMATCH'}", flush=True)
+    return report
+
+def compare_to_baseline(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    *,
+    threshold: float = 0.25,
+    memory_threshold: float | None = 0.25,
+    min_time_s: float = 0.005,
+) -> List[str]:
+    """Regressions of `report` against `baseline` (empty list: pass).
+
+    A stage/size regresses when its time exceeds the baseline by more than
+    `threshold` (fraction), ignoring timings under `min_time_s` where noise
+    dominates, or its peak memory exceeds the baseline by more than
+    `memory_threshold`. Cross-check mismatches are always reported.
+    """
+    problems: List[str] = []
+    for stage, by_size in report.get("results", {}).items():
+        for size, m in by_size.items():
+            base = baseline.get("results", {}).get(stage, {}).get(size)
+            if not base:
+                continue
+            if max(m["time_s"], base["time_s"]) >= min_time_s and m["time_s"] > base["time_s"] * (1 + threshold):
+                problems.append(f"{stage} n={size}: time {m['time_s']:.4f}s vs baseline {base['time_s']:.4f}s")
+            if memory_threshold is not None and base["peak_mb"] > 0 and m["peak_mb"] > base["peak_mb"] * (1 + memory_threshold):
+                problems.append(f"{stage} n={size}: peak {m['peak_mb']:.1f} MB vs baseline {base['peak_mb']:.1f} MB")
+    for check, by_size in report.get("cross_checks", {}).items():
+        for size, ok in by_size.items():
+            if not ok:
+                problems.append(f"{check} n={size}: fast path output differs from reference")
+    return problems
@@ -0,0 +1,453 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import shutil
+import uuid
+from typing import Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from src.data import OHLC_COLUMNS, OHLCProvider, lookback_start, normalize_ohlc
+from src.features import MONDAY_COLUMNS, add_monday_range
+from src.profiling import stage
+
+# bump when add_monday_range's output changes, to invalidate stored features
+FEATURES_VERSION = 1
+
+def _key(symbol: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", symbol)
+
+def store_key(symbol: str, provider: OHLCProvider | None = None) -> str:
+    """Name `symbol`'s bars are cached under: provider.cache_key(symbol) when the
+    provider defines one (e.g. FileProvider, so each source file gets its own entry)."""
+    cache_key = getattr(provider, "cache_key", None)
+    return cache_key(symbol) if cache_key is not None else symbol
+
+def _tmp_suffix() -> str:
+    # unique per write, so concurrent writers (processes or hosts sharing the cache)
+    # never share a temporary file
+    return f"tmp-{os.getpid()}-{uuid.uuid4().hex[:12]}"
+
+class BarStore:
+    """On-disk OHLC bar cache: one .npy file per column under <root>/<symbol>/<interval>/.
+
+    Timestamps are stored as int64 nanoseconds in index.npy. Reads memory-map the
+    column files, so the returned DataFrame's columns are views over the files.
+    meta.json records the row count and the window the cache is known to cover.
+    """
+
+    def __init__(self, root: str = "data/bars"):
+        self.root = root
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "partial": 0, "bars_fetched": 0, "bars_served": 0}
+
+    def path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, _key(symbol), interval)
+
+    def meta(self, symbol: str, interval: str) -> Dict[str, Any] | None:
+        p = os.path.join(self.path(symbol, interval), "meta.json")
+        if not os.path.exists(p):
+            return None
+        with open(p, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def columns(self, symbol: str, interval: str, mmap: bool = True) -> Dict[str, np.ndarray] | None:
+        """Cached column arrays: "index" (int64 ns) and OHLC_COLUMNS, memory-mapped unless
+        mmap=False; None if absent/inconsistent. Nothing is read until the arrays are indexed."""
+        meta = self.meta(symbol, interval)
+        if meta is None:
+            return None
+        d = self.path(symbol, interval)
+        mode = "r" if mmap else None
+        try:
+            cols = {c: np.load(os.path.join(d, f"{c}.npy"), mmap_mode=mode) for c in ("index", *OHLC_COLUMNS)}
+        except (FileNotFoundError, ValueError):
+            return None
+        if any(len(a) != meta["rows"] for a in cols.values()):
+            return None  # interrupted write; treat as a miss
+        return cols
+
+    def read(self, symbol: str, interval: str, mmap: bool = True) -> pd.DataFrame | None:
+        """Cached bars (memory-mapped unless mmap=False), or None if absent/inconsistent."""
+        cols = self.columns(symbol, interval, mmap=mmap)
+        if cols is None:
+            return None
+        index = pd.DatetimeIndex(cols.pop("index").view("M8[ns]"))
+        return pd.DataFrame(cols, index=index, copy=False)
+
+    def write(self, symbol: str, interval: str, df: pd.DataFrame, covered_from: pd.Timestamp, covered_to: pd.Timestamp) -> None:
+        """Replace the cached bars for symbol/interval (columns first, meta.json last).
+
+        Each file is written to a unique temporary name and renamed into place, so
+        concurrent writers of the same bars never interleave within a file.
+        """
+        d = self.path(symbol, interval)
+        os.makedirs(d, exist_ok=True)
+        suffix = _tmp_suffix()
+        arrays = {"index": df.index.as_unit("ns").asi8}
+        arrays.update({c: df[c].to_numpy(dtype=np.float64) for c in OHLC_COLUMNS})
+        for name, arr in arrays.items():
+            tmp = os.path.join(d, f"{name}.{suffix}.npy")
+            np.save(tmp, np.ascontiguousarray(arr))
+            os.replace(tmp, os.path.join(d, f"{name}.npy"))
+        meta = {
+            "symbol": symbol,
+            "interval": interval,
+            "rows": int(len(df)),
+            "covered_from": str(covered_from),
+            "covered_to": str(covered_to),
+        }
+        tmp = os.path.join(d, f"meta.json.{suffix}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, os.path.join(d, "meta.json"))
+
+    def load(
+        self,
+        symbol: str,
+        interval: str,
+        provider: OHLCProvider,
+        period: str | None = "2y",
+        start: str | None = None,
+        end: str | None = None,
+        refresh: bool = False,
+    ) -> pd.DataFrame:
+        """Serve [start or period lookback, end) from the cache, fetching only what is missing.
+
+        - nothing cached: fetch the whole window (miss)
+        - refresh, or an explicit end beyond the cached window: fetch from the last cached bar
+          on (partial); the last cached bar is re-fetched since it may have been incomplete
+        - requested start earlier than the cached window: fetch the missing head (partial)
+
+        Without start, period counts back from the last bar before end, as for providers
+        (see OHLCProvider), so historical files and frames give the same window with or
+        without the store. Without refresh an open-ended request is served from the cache
+        as-is, so repeated runs work offline. Bars are cached under store_key(symbol,
+        provider). The result is a positional slice of the memory-mapped frame.
+        """
+        want_to = pd.Timestamp(end) if end else pd.Timestamp.now().floor("s")
+        key = store_key(symbol, provider)
+
+        cached = self.read(key, interval)
+        if cached is None or not len(cached):
+            with stage("download"):
+                raw = provider.fetch(symbol, interval, period=None if (start and end) else period, start=start, end=end)
+            bars = normalize_ohlc(raw)
+            want_from = pd.Timestamp(start) if start else lookback_start(bars.index, period, end)
+            self.stats["misses"] += 1
+            self.stats["bars_fetched"] += len(bars)
+            self.write(key, interval, bars, covered_from=want_from, covered_to=want_to)
+            bars = self.read(key, interval)
+        else:
+            meta = self.meta(key, interval)
+            covered_from = pd.Timestamp(meta["covered_from"])
+            covered_to = pd.Timestamp(meta["covered_to"])
+            parts = []
+            if refresh or (end and want_to > covered_to):
+                with stage("download"):
+                    parts.append(provider.fetch(symbol, interval, start=cached.index[-1], end=end))
+            fetched = [normalize_ohlc(p) for p in parts if p is not None and not p.empty]
+            if start:
+                want_from = pd.Timestamp(start)
+            else:  # the lookback ends at the last bar known once the tail is fetched
+                known = cached.index.append([f.index for f in fetched]).sort_values() if fetched else cached.index
+                want_from = lookback_start(known, period, end)
+            if want_from < covered_from:
+                head_start = None if want_from == pd.Timestamp.min else want_from
+                with stage("download"):
+                    head = provider.fetch(symbol, interval, period="max", start=head_start, end=cached.index[0])
+                parts.append(head)
+                if head is not None and not head.empty:
+                    fetched.append(normalize_ohlc(head))
+
+            if parts:
+                self.stats["partial"] += 1
+                self.stats["bars_fetched"] += sum(len(p) for p in fetched)
+                merged = pd.concat([cached, *fetched]) if fetched else cached
+                merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+                self.write(
+                    key, interval, merged,
+                    covered_from=min(covered_from, want_from),
+                    covered_to=max(covered_to, want_to),
+                )
+                bars = self.read(key, interval)
+            else:
+                self.stats["hits"] += 1
+                bars = cached
+
+        lo = bars.index.searchsorted(want_from, side="left")
+        hi = bars.index.searchsorted(want_to, side="left") if end else len(bars)
+        bars = bars.iloc[lo:hi]
+        if bars.empty:
+            raise ValueError("No data downloaded. Check symbol/interval/period.")
+        self.stats["bars_served"] += len(bars)
+        return bars
+
+def bars_digests(df: pd.DataFrame, rows, block_rows: int = 1 << 16) -> Dict[int, str]:
+    """Content hashes of the first r bars for each r in `rows`, in one pass.
+
+    Covers timestamps, high and low (all the Monday-range features read), hashed as
+    interleaved per-row records so every prefix digest falls out of the same stream.
+    """
+    cols = (df.index.asi8, df["high"].to_numpy(dtype=np.float64).view(np.int64),
+            df["low"].to_numpy(dtype=np.float64).view(np.int64))
+    wanted = sorted({int(r) for r in rows if 0 <= r <= len(df)})
+    h = hashlib.sha256(f"monday-range-v{FEATURES_VERSION}/{df.index.unit}/{df.index.tz}".encode())
+    block = np.empty((block_rows, 3), dtype=np.int64)
+    out: Dict[int, str] = {}
+    pos = 0
+    for r in wanted:
+        while pos < r:
+            m = min(block_rows, r - pos)
+            for j, a in enumerate(cols):
+                block[:m, j] = a[pos:pos + m]
+            h.update(block[:m])
+            pos += m
+        out[r] = h.hexdigest()[:32]
+    return out
+
+def bars_digest(df: pd.DataFrame) -> str:
+    return bars_digests(df, [len(df)])[len(df)]
+
+def _week_starts(index: pd.DatetimeIndex) -> tuple[np.ndarray, np.ndarray]:
+    """Start row of each ISO week run (rows are time-sorted) and the week's Monday as
+    days since the epoch, from local wall-clock times."""
+    local = index.tz_localize(None) if index.tz is not None else index
+    days = local.asi8 // (np.timedelta64(1, "D") // np.timedelta64(1, local.unit))
+    monday = days - (days + 3) % 7  # 1970-01-01 was a Thursday
+    starts = np.flatnonzero(np.r_[True, monday[1:] != monday[:-1]])
+    return starts, monday[starts]
+
+def week_digests(df: pd.DataFrame, bounds: np.ndarray, block_rows: int = 1 << 16) -> list[str]:
+    """Content hash of the bars in each row range [bounds[j], bounds[j + 1]) (ISO weeks),
+    over the same per-row records as `bars_digests`, built a block of weeks at a time."""
+    cols = (df.index.asi8, df["high"].to_numpy(dtype=np.float64).view(np.int64),
+            df["low"].to_numpy(dtype=np.float64).view(np.int64))
+    base = hashlib.sha256(f"monday-range-v{FEATURES_VERSION}/{df.index.unit}/{df.index.tz}".encode())
+    bounds = np.asarray(bounds, dtype=np.int64)
+    out = []
+    j = 0
+    while j < len(bounds) - 1:
+        k = max(int(np.searchsorted(bounds, bounds[j] + block_rows, side="right")) - 1, j + 1)
+        lo = int(bounds[j])
+        block = np.column_stack([a[lo:int(bounds[k])] for a in cols])
+        for a, b in zip(bounds[j:k].tolist(), bounds[j + 1:k + 1].tolist()):
+            h = base.copy()
+            h.update(block[a - lo:b - lo])
+            out.append(h.hexdigest()[:32])
+        j = k
+    return out
+
+def _shared_run(weeks: list, cached: list) -> tuple[int, int, int]:
+    """Longest run of consecutive weeks (Monday, digest) that `weeks` shares with an
+    entry's `cached` weeks, as (first week, end week) in `weeks` and first week in `cached`."""
+    pos = {w[0]: i for i, w in enumerate(cached)}
+    best = (0, 0, 0)
+    j = 0
+    while j < len(weeks):
+        i = pos.get(weeks[j][0])
+        if i is None or cached[i][2] != weeks[j][2]:
+            j += 1
+            continue
+        j0, i0 = j, i
+        while j < len(weeks) and i < len(cached) and cached[i][0] == weeks[j][0] and cached[i][2] == weeks[j][2]:
+            i += 1
+            j += 1
+        if j - j0 > best[1] - best[0]:
+            best = (j0, j, i0)
+    return best
+
+class FeatureStore:
+    """Content-addressed cache of add_monday_range columns.
+
+    Layout under <root>:
+      entries/<digest>.json       one per cached input, keyed by `bars_digest`
+      segments/<id>/<column>.npy  row ranges of feature columns shared between entries
+
+    An entry lists its segments in row order as [id, rows] or [id, rows, start] (rows
+    start.. of the segment); the last one always holds the final (possibly still
+    growing) ISO week and everything before it is "stable". Each row's features only
+    depend on its own ISO week's bars, so an entry also records its stable weeks as
+    [monday, row, digest]. When a frame misses, the longest run of whole weeks it
+    shares with a cached entry (same history plus appended or revised last-week bars,
+    or a lookback window that moved forward) is served from that entry's segments;
+    only the weeks before and after it are computed and written. The entry it was
+    built from is dropped unless keep_superseded. Checking the input still hashes
+    every bar, but that costs far less than the calendar/groupby work it replaces.
+    """
+
+    def __init__(self, root: str = "data/features", keep_superseded: bool = False, max_segments: int = 32):
+        self.root = root
+        self.keep_superseded = keep_superseded
+        self.max_segments = max_segments
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "partial": 0, "rows_computed": 0, "rows_served": 0}
+
+    def _entry_path(self, digest: str) -> str:
+        return os.path.join(self.root, "entries", f"{digest}.json")
+
+    def _segment_path(self, seg: str) -> str:
+        return os.path.join(self.root, "segments", seg)
+
+    def entries(self) -> list[Dict[str, Any]]:
+        d = os.path.join(self.root, "entries")
+        if not os.path.isdir(d):
+            return []
+        out = []
+        for name in sorted(os.listdir(d)):
+            if name.endswith(".json"):
+                with open(os.path.join(d, name), "r", encoding="utf-8") as f:
+                    out.append(json.load(f))
+        return out
+
+    def _load_segment(self, seg: str) -> Dict[str, np.ndarray] | None:
+        d = self._segment_path(seg)
+        try:
+            cols = {c: np.load(os.path.join(d, f"{c}.npy"), mmap_mode="r") for c in MONDAY_COLUMNS}
+        except (FileNotFoundError, ValueError):
+            return None
+        if len({len(a) for a in cols.values()}) != 1:
+            return None
+        return cols
+
+    def _read_segment(self, seg: str, rows: int, start: int = 0) -> Dict[str, np.ndarray] | None:
+        cols = self._load_segment(seg)
+        if cols is None or len(cols[MONDAY_COLUMNS[0]]) < start + rows:
+            return None
+        return {c: a[start:start + rows] for c, a in cols.items()}
+
+    def _write_segment(self, seg: str, cols: Dict[str, np.ndarray]) -> None:
+        """Write a segment directory atomically. Segment names are content-addressed, so
+        one that already exists complete (e.g. written by a concurrent run) is kept."""
+        d = self._segment_path(seg)
+        rows = len(cols[MONDAY_COLUMNS[0]])
+
+        def complete():
+            cached = self._load_segment(seg)
+            return cached is not None and len(cached[MONDAY_COLUMNS[0]]) == rows
+
+        if complete():
+            return
+        tmp = f"{d}.{_tmp_suffix()}"
+        os.makedirs(tmp)
+        try:
+            for c in MONDAY_COLUMNS:
+                np.save(os.path.join(tmp, f"{c}.npy"), np.ascontiguousarray(cols[c]))
+            try:
+                os.rename(tmp, d)
+            except OSError:
+                if not complete():
+                    shutil.rmtree(d, ignore_errors=True)  # leftovers of an interrupted write
+                    os.rename(tmp, d)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def read(self, entry: Dict[str, Any]) -> list[Dict[str, np.ndarray]] | None:
+        """Memory-mapped segments of an entry, or None if any is missing/inconsistent."""
+        segs = []
+        for seg, rows, *start in entry["segments"]:
+            cols = self._read_segment(seg, rows, *start)
+            if cols is None:
+                return None
+            segs.append(cols)
+        return segs
+
+    def _release(self, segments) -> None:
+        """Delete the given segments unless an entry still refers to them."""
+        live = {seg for e in self.entries() for seg, *_ in e["segments"]}
+        for seg in segments:
+            if seg not in live:
+                shutil.rmtree(self._segment_path(seg), ignore_errors=True)
+
+    def add_monday_range(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Same result as features.add_monday_range(df), computing only uncached weeks."""
+        n = len(df)
+        if n == 0:
+            return add_monday_range(df)
+        digest = bars_digest(df)
+
+        segs = None
+        if os.path.exists(self._entry_path(digest)):
+            with open(self._entry_path(digest), "r", encoding="utf-8") as f:
+                segs = self.read(json.load(f))
+        if segs is not None:
+            self.stats["hits"] += 1
+        else:
+            starts, mondays = _week_starts(df.index)
+            head_rows = int(starts[-1])
+            # stable weeks only: the last one may still grow
+            weeks = [[int(m), int(r), d] for m, r, d in zip(mondays[:-1], starts[:-1], week_digests(df, starts))]
+
+            base, base_segs, run = None, None, (0, 0, 0)
+            candidates = [e for e in self.entries() if e.get("version") == FEATURES_VERSION and e.get("weeks")]
+            for e in sorted(candidates, key=lambda e: -len(e["weeks"])):
+                j0, j1, i0 = _shared_run(weeks, e["weeks"])
+                if j1 - j0 > run[1] - run[0]:
+                    e_segs = self.read(e)
+                    if e_segs is not None:
+                        base, base_segs, run = e, e_segs, (j0, j1, i0)
+            j0, j1, i0 = run
+            lo, hi = (int(starts[j0]), int(starts[j1])) if base else (0, 0)
+            self.stats["partial" if base else "misses"] += 1
+            self.stats["rows_computed"] += n - (hi - lo)
+
+            segments, segs = [], []
+
+            def computed(a, b):
+                if b > a:
+                    part = add_monday_range(df.iloc[a:b])
+                    part = {c: part[c].to_numpy() for c in MONDAY_COLUMNS}
+                    seg = f"{digest}.{a}-{b}"
+                    self._write_segment(seg, part)
+                    segments.append([seg, b - a])
+                    segs.append(part)
+
+            computed(0, lo)
+            if base:  # rows [lo, hi) are the entry's rows from its week i0 on
+                skip, left, files = base["weeks"][i0][1], hi - lo, 0
+                for (seg, rows, *start), cols in zip(base["segments"], base_segs):
+                    take = min(rows - skip, left) if skip < rows else 0
+                    if take > 0:
+                        off = (start[0] if start else 0) + skip
+                        segments.append([seg, take] if off == 0 else [seg, take, off])
+                        segs.append({c: a[skip:skip + take] for c, a in cols.items()})
+                        files += len(self._load_segment(seg)[MONDAY_COLUMNS[0]])
+                        left -= take
+                    skip = max(skip - rows, 0)
+                # compact once there are many segments, or once the shared ones are
+                # mostly rows the window has moved past
+                if len(segments) >= self.max_segments or files > 2 * (hi - lo):
+                    merged = {c: np.concatenate([s[c] for s in segs]) for c in MONDAY_COLUMNS}
+                    seg = f"{digest}.0-{hi}"
+                    self._write_segment(seg, merged)
+                    segments, segs = [[seg, hi]], [merged]
+            computed(hi, head_rows)
+            computed(head_rows, n)
+
+            os.makedirs(os.path.join(self.root, "entries"), exist_ok=True)
+            entry = {
+                "digest": digest,
+                "rows": n,
+                "first_ts": int(df.index[0].value),
+                "head_rows": head_rows,
+                "weeks": weeks,
+                "segments": segments,
+                "version": FEATURES_VERSION,
+            }
+            tmp = f"{self._entry_path(digest)}.{_tmp_suffix()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._entry_path(digest))  # entry last: readers never see partial segments
+            if base and not self.keep_superseded and base["digest"] != digest:
+                try:
+                    os.remove(self._entry_path(base["digest"]))
+                except FileNotFoundError:  # already superseded by a concurrent run
+                    pass
+                self._release(seg for seg, *_ in base["segments"])
+        self.stats["rows_served"] += n
+
+        out = df.copy()
+        for c in MONDAY_COLUMNS:
+            out[c] = np.concatenate([s[c] for s in segs]) if len(segs) > 1 else np.array(segs[0][c])
+        return out
@@ -1,27 +1,101 @@
 from __future__ import annotations
+import numpy as np
 import pandas as pd
-import yfinance as yf
+from typing import Dict, Protocol, TYPE_CHECKING
 
-def download_ohlc(
-    symbol: str,
-    interval: str = "4h",
-    period: str = "2y",
-    start: str | None = None,
-    end: str | None = None,
-) -> pd.DataFrame:
-    """Download OHLC data using yfinance.
+from src.profiling import stage
 
-    Returns a DataFrame with columns: open, high, low, close and a tz-naive DatetimeIndex.
+if TYPE_CHECKING:
+    from src.cache import BarStore
+
+OHLC_COLUMNS = ["open", "high", "low", "close"]
+
+class OHLCProvider(Protocol):
+    """Anything that can return raw bars for a symbol; see YFinanceProvider.
+
+    start/end bound the bars as [start, end). Without start, `period` (yfinance style:
+    "60d", "2y", "max") counts back from the last bar available before end, i.e. from
+    now for a live feed and from the last row for a file or frame (see lookback_start).
+    BarStore applies the same convention to the cached bars. A provider whose bars
+    differ from the symbol's usual source may also define cache_key(symbol) -> str, the
+    name BarStore caches them under (see FileProvider).
+    """
+
+    def fetch(
+        self,
+        symbol: str,
+        interval: str,
+        period: str | None = None,
+        start: str | pd.Timestamp | None = None,
+        end: str | pd.Timestamp | None = None,
+    ) -> pd.DataFrame: ...
+
+class YFinanceProvider:
+    """Default provider; yfinance is imported on first use so offline providers don't need it.
+
+    Fetches through a per-call yf.Ticker rather than yf.download, which collects its
+    results in module-global state and so is not safe to call from several threads
+    (download_many). For one symbol both return the same bars once normalized.
     """
-    df = yf.download(
-        symbol,
-        interval=interval,
-        period=None if (start and end) else period,
-        start=start,
-        end=end,
-        progress=False,
-    )
 
+    def fetch(self, symbol, interval, period=None, start=None, end=None) -> pd.DataFrame:
+        import yfinance as yf
+
+        return yf.Ticker(symbol).history(
+            interval=interval,
+            period=period,
+            start=start,
+            end=end,
+        )
+
+class FrameProvider:
+    """In-process provider serving fixed frames, e.g. synthetic bars in tests or offline runs.
+
+    Honours start/end and period (see OHLCProvider) so incremental refreshes can be
+    exercised without a network. `calls` records every fetch.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        self.frames = frames
+        self.calls: list[tuple] = []
+
+    def fetch(self, symbol, interval, period=None, start=None, end=None) -> pd.DataFrame:
+        self.calls.append((symbol, interval, period, start, end))
+        df = self.frames.get(symbol)
+        if df is None:
+            return pd.DataFrame()
+        df = df.sort_index()
+        if end is not None:
+            df = df[df.index < pd.Timestamp(end)]
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        elif period is not None and len(df):
+            df = df[df.index >= period_start(df.index[-1], period)]
+        return df
+
+def period_start(last: pd.Timestamp, period: str) -> pd.Timestamp:
+    """First timestamp covered by a yfinance-style period ("60d", "6mo", "2y", "max") ending at `last`."""
+    period = period.lower().strip()
+    if period in ("max", ""):
+        return pd.Timestamp.min
+    if period == "ytd":
+        return pd.Timestamp(year=last.year, month=1, day=1)
+    for suffix, unit in (("mo", "months"), ("wk", "weeks"), ("y", "years"), ("d", "days")):
+        if period.endswith(suffix):
+            return last - pd.DateOffset(**{unit: int(period[: -len(suffix)])})
+    raise ValueError(f"Unrecognised period: {period!r}")
+
+def lookback_start(index: pd.DatetimeIndex | np.ndarray, period: str | None, end=None) -> pd.Timestamp:
+    """First timestamp of a `period` lookback over sorted bars (DatetimeIndex or int64 ns),
+    counted back from the last bar before `end` (the OHLCProvider convention)."""
+    ts = index.as_unit("ns").asi8 if isinstance(index, pd.DatetimeIndex) else np.asarray(index)
+    hi = int(np.searchsorted(ts, pd.Timestamp(end).value, side="left")) if end is not None else len(ts)
+    if hi == 0:
+        return pd.Timestamp.min
+    return period_start(pd.Timestamp(int(ts[hi - 1])), period or "max")
+
+def normalize_ohlc(df: pd.DataFrame | None) -> pd.DataFrame:
+    """Lower-case OHLC columns, drop NaNs, tz-naive sorted DatetimeIndex."""
     if df is None or df.empty:
         raise ValueError("No data downloaded. Check symbol/interval/period.")
 
@@ -31,7 +105,7 @@ def download_ohlc(
     else:
         df.columns = [c.lower() for c in df.columns]
 
-    df = df[["open", "high", "low", "close"]].copy()
+    df = df[OHLC_COLUMNS].copy()
     df = df.dropna()
 
     # normalize timezone to naive for consistent weekly grouping
@@ -39,3 +113,31 @@ def download_ohlc(
         df.index = df.index.tz_localize(None)
 
     return df.sort_index()
+
+def download_ohlc(
+    symbol: str,
+    interval: str = "4h",
+    period: str = "2y",
+    start: str | None = None,
+    end: str | None = None,
+    *,
+    provider: OHLCProvider | None = None,
+    store: "BarStore | None" = None,
+    refresh: bool = False,
+) -> pd.DataFrame:
+    """Download OHLC data using yfinance (or another provider).
+
+    With a `store`, cached bars are served from disk (memory-mapped) and only the
+    missing head/tail of the requested window is fetched; `refresh=True` always
+    asks the provider for bars newer than the last cached one.
+
+    Returns a DataFrame with columns: open, high, low, close and a tz-naive DatetimeIndex.
+    """
+    provider = provider or YFinanceProvider()
+    if store is not None:
+        return store.load(symbol, interval, provider, period=period, start=start, end=end, refresh=refresh)
+
+    with stage("download") as st:
+        raw = provider.fetch(symbol, interval, period=None if (start and end) else period, start=start, end=end)
+        st.rows = 0 if raw is None else len(raw)
+    return normalize_ohlc(raw)
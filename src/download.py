@@ -0,0 +1,186 @@
+from __future__ import annotations
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Any, Iterable, Tuple
+
+import pandas as pd
+
+from src.data import OHLCProvider, YFinanceProvider, download_ohlc
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second on average, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: float | None = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1.0))
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.burst
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+class EmptyResult(Exception):
+    """Provider returned no rows (yfinance reports many transient failures this way)."""
+
+class RetryingProvider:
+    """Wraps a provider with rate limiting and exponential-backoff retries.
+
+    Every attempt takes a token from `limiter` (if any). A failed attempt (an
+    exception, or an empty frame when retry_empty) is retried after
+    backoff * 2**attempt seconds (capped at max_backoff, plus up to `jitter` of
+    random extra), up to `retries` times; the last error is re-raised.
+    `attempts` counts fetch attempts per symbol.
+    """
+
+    def __init__(
+        self,
+        provider: OHLCProvider,
+        *,
+        limiter: TokenBucket | None = None,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        jitter: float = 0.1,
+        retry_empty: bool = True,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.provider = provider
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_empty = retry_empty
+        self.sleep = sleep
+        self.attempts: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def fetch(self, symbol, interval, period=None, start=None, end=None) -> pd.DataFrame:
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            with self.lock:
+                self.attempts[symbol] = self.attempts.get(symbol, 0) + 1
+            try:
+                df = self.provider.fetch(symbol, interval, period=period, start=start, end=end)
+                if self.retry_empty and (df is None or df.empty):
+                    raise EmptyResult(f"{symbol}: provider returned no rows")
+                return df
+            except EmptyResult:
+                if attempt == self.retries:
+                    return pd.DataFrame()  # let download_ohlc report "No data" as usual
+            except Exception:
+                if attempt == self.retries:
+                    raise
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            self.sleep(delay * (1.0 + self.jitter * random.random()))
+        raise AssertionError("unreachable")
+
+class FlakyProvider:
+    """Stand-in provider for testing: wraps another (e.g. FrameProvider) and adds
+    `latency` seconds per request and random ConnectionErrors at `failure_rate`."""
+
+    def __init__(self, provider: OHLCProvider, *, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.provider = provider
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def fetch(self, symbol, interval, period=None, start=None, end=None) -> pd.DataFrame:
+        with self.lock:
+            self.calls += 1
+            fail = self.rng.random() < self.failure_rate
+            self.failures += fail
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise ConnectionError(f"simulated failure fetching {symbol}")
+        return self.provider.fetch(symbol, interval, period=period, start=start, end=end)
+
+def download_many(
+    symbols: Iterable[str],
+    *,
+    interval: str = "4h",
+    period: str = "2y",
+    start: str | None = None,
+    end: str | None = None,
+    provider: OHLCProvider | None = None,
+    store=None,
+    refresh: bool = False,
+    workers: int = 8,
+    rate: float | None = None,
+    burst: float | None = None,
+    retries: int = 3,
+    backoff: float = 0.5,
+    verbose: bool = False,
+) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """Fetch many symbols concurrently through download_ohlc.
+
+    Up to `workers` symbols are in flight at once (threads: providers block on I/O, and
+    must be thread-safe, as YFinanceProvider and the providers here are);
+    `rate` caps requests per second across all of them (token bucket, bursts up to
+    `burst`); failed requests are retried with exponential backoff. Each symbol goes
+    through download_ohlc, so normalization and the optional BarStore cache behave
+    exactly as for a single download. A symbol that still fails is reported, not raised.
+
+    Returns ({symbol: bars} for successful symbols, report) where report has one row
+    per symbol (input order): status, bars, attempts, seconds, error.
+    """
+    symbols = list(symbols)
+    limiter = TokenBucket(rate, burst) if rate else None
+    fetcher = RetryingProvider(provider or YFinanceProvider(), limiter=limiter, retries=retries, backoff=backoff)
+
+    def one(symbol: str) -> Tuple[str, pd.DataFrame | None, Dict[str, Any]]:
+        t = time.perf_counter()
+        row: Dict[str, Any] = {"symbol": symbol, "status": "ok", "bars": 0, "error": ""}
+        df = None
+        try:
+            df = download_ohlc(symbol, interval=interval, period=period, start=start, end=end,
+                               provider=fetcher, store=store, refresh=refresh)
+            row["bars"] = int(len(df))
+        except Exception as exc:
+            row["status"] = "error"
+            row["error"] = f"{type(exc).__name__}: {exc}"
+        row["seconds"] = time.perf_counter() - t
+        return symbol, df, row
+
+    frames: Dict[str, pd.DataFrame] = {}
+    rows: Dict[str, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futures = [ex.submit(one, s) for s in symbols]
+        for fut in as_completed(futures):
+            symbol, df, row = fut.result()
+            row["attempts"] = fetcher.attempts.get(symbol, 0)
+            rows[symbol] = row
+            if df is not None:
+                frames[symbol] = df
+            if verbose:
+                tail = f"{row['bars']} bars" if row["status"] == "ok" else row["error"]
+                print(f"[{len(rows)}/{len(symbols)}] {symbol:<12} {row['status']:<5} "
+                      f"{row['seconds']:.2f}s attempts={row['attempts']}  {tail}", flush=True)
+
+    report = pd.DataFrame([rows[s] for s in symbols], columns=["symbol", "status", "bars", "attempts", "seconds", "error"])
+    return frames, report
@@ -0,0 +1,494 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from typing import Dict, Any
+
+from src.profiling import stage
+
+try:  # optional JIT; the kernel runs as plain Python over lists without it
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # pragma: no cover - depends on environment
+    njit = None
+    HAS_NUMBA = False
+
+SIDE_NONE, SIDE_LONG, SIDE_SHORT = 0, 1, -1
+REASON_STOP, REASON_TP2, REASON_FRIDAY = 0, 1, 2
+SIDES = {SIDE_LONG: "LONG", SIDE_SHORT: "SHORT"}
+REASONS = ("STOP", "TP2", "FRIDAY")
+
+FEATURE_COLUMNS = (
+    "open", "high", "low", "close", "weekday", "iso_year", "iso_week",
+    "mon_high", "mon_low", "mon_mid", "mon_range", "is_tradeable",
+)
+
+# Kernel state carried between calls (one float64 slot each), so the state machine
+# can run over a series in chunks (or week by week) with identical results.
+S_EQUITY, S_IN_POS, S_SIDE, S_ENTRY, S_QTY, S_STOP, S_TP1, S_TP2 = 0, 1, 2, 3, 4, 5, 6, 7
+S_TP1_TAKEN, S_WEEK_Y, S_WEEK_W, S_HAS_TRADED, S_STARTED = 8, 9, 10, 11, 12
+S_ENTRY_AT = 13  # entry bar of the open position, relative to the next chunk's first bar
+STATE_SIZE = 14
+
+TRADE_DTYPE = np.dtype([
+    ("entry_index", np.int64),  # bar index of the entry
+    ("exit_index", np.int64),   # bar index of the exit (also the trade log's entry_time)
+    ("side", np.int8),
+    ("entry", np.float64),
+    ("exit", np.float64),
+    ("qty", np.float64),
+    ("pnl", np.float64),
+    ("reason", np.int8),
+    ("iso_year", np.int32),
+    ("iso_week", np.int32),
+])
+
+def initial_state(initial_capital: float) -> np.ndarray:
+    state = np.zeros(STATE_SIZE)
+    state[S_EQUITY] = float(initial_capital)
+    state[S_SIDE] = SIDE_NONE
+    state[S_WEEK_Y] = -1
+    state[S_WEEK_W] = -1
+    return state
+
+def kernel_params(
+    *,
+    risk_per_trade: float = 100.0,
+    stop_mult: float = 1.0,
+    tp1_at_mid: bool = True,
+    tp1_frac: float = 0.5,
+    tp2_to_full: float = 1.0,
+    exit_friday_close: bool = True,
+) -> tuple:
+    """Strategy parameters in the kernel's positional order (defaults as in run_sweep_fade)."""
+    return (
+        float(risk_per_trade), float(stop_mult), bool(tp1_at_mid),
+        float(tp1_frac), float(tp2_to_full), bool(exit_friday_close),
+    )
+
+def _sweep_fade_kernel(
+    open_, high, low, close, weekday, iso_year, iso_week,
+    mon_high, mon_low, mon_mid, mon_range, tradeable, long_sig, short_sig, next_weekday,
+    risk_per_trade, stop_mult, tp1_at_mid, tp1_frac, tp2_to_full, exit_friday_close,
+    state, equity_out, position_out, pnl_out,
+    t_entry_idx, t_idx, t_side, t_entry, t_exit, t_qty, t_pnl, t_reason,
+):
+    """Same state machine as the loop in `backtest_sweep_fade`, over flat sequences.
+
+    Processes one chunk of bars starting from `state` (see initial_state) and writes the
+    state back at the end; `next_weekday` is the weekday of the bar after the chunk
+    (-1 at the end of the data) for the Friday close-out. Entry bars in t_entry_idx are
+    chunk-relative (negative for a position carried in). Written so that it compiles
+    under numba (arrays) and also runs as plain Python (lists, which index much faster
+    than NumPy scalars). Outputs are written in place; returns the number of trades
+    recorded in the t_* buffers.
+    """
+    n = len(close)
+    n_trades = 0
+    equity = state[S_EQUITY]
+    in_pos = state[S_IN_POS] != 0.0
+    side = int(state[S_SIDE])
+    entry = state[S_ENTRY]
+    qty = state[S_QTY]
+    stop = state[S_STOP]
+    tp1 = state[S_TP1]
+    tp2 = state[S_TP2]
+    tp1_taken = state[S_TP1_TAKEN] != 0.0
+    week_y = int(state[S_WEEK_Y])
+    week_w = int(state[S_WEEK_W])
+    has_traded_week = state[S_HAS_TRADED] != 0.0
+    entry_at = int(state[S_ENTRY_AT])
+
+    first = 0
+    if state[S_STARTED] == 0.0 and n > 0:
+        # the very first bar only seeds the equity curve (the loop starts at row 1)
+        equity_out[0] = equity
+        position_out[0] = 0.0
+        pnl_out[0] = 0.0
+        state[S_STARTED] = 1.0
+        first = 1
+
+    for i in range(first, n):
+        if iso_year[i] != week_y or iso_week[i] != week_w:
+            week_y = iso_year[i]
+            week_w = iso_week[i]
+            has_traded_week = False
+
+        mh = mon_high[i]
+        ml = mon_low[i]
+        rng = mon_range[i]
+        if mh != mh or ml != ml or rng <= 0:
+            equity_out[i] = equity
+            position_out[i] = 0.0
+            pnl_out[i] = 0.0
+            continue
+
+        following = next_weekday if i == n - 1 else weekday[i + 1]
+        is_last_friday_bar = weekday[i] == 4 and following != 4
+        bar_pnl = 0.0
+
+        # --- Entry: first valid signal, Tue-Thu only ---
+        if (not in_pos) and tradeable[i] and (not has_traded_week) and weekday[i] < 4:
+            long_signal = long_sig[i]
+            short_signal = short_sig[i]
+
+            if long_signal or short_signal:
+                entry = open_[i]
+                if long_signal:
+                    side = SIDE_LONG
+                    stop = ml - stop_mult * rng
+                    tp1 = mon_mid[i]
+                    tp2 = mh if tp2_to_full >= 1.0 else mon_mid[i] + tp2_to_full * (mh - mon_mid[i])
+                    dist = abs(entry - stop)
+                else:
+                    side = SIDE_SHORT
+                    stop = mh + stop_mult * rng
+                    tp1 = mon_mid[i]
+                    tp2 = ml if tp2_to_full >= 1.0 else mon_mid[i] - tp2_to_full * (mon_mid[i] - ml)
+                    dist = abs(stop - entry)
+
+                qty = (risk_per_trade / dist) if dist > 0 else 0.0
+                if qty > 0:
+                    in_pos = True
+                    entry_at = i
+                    tp1_taken = False
+                    has_traded_week = True
+
+        # --- Manage exits ---
+        if in_pos and qty > 0:
+            hit_stop = (low[i] <= stop) if side == SIDE_LONG else (high[i] >= stop)
+            if hit_stop:
+                exit_px = stop
+                pnl = (exit_px - entry) * qty if side == SIDE_LONG else (entry - exit_px) * qty
+                equity += pnl
+                bar_pnl += pnl
+                t_entry_idx[n_trades] = entry_at
+                t_idx[n_trades] = i
+                t_side[n_trades] = side
+                t_entry[n_trades] = entry
+                t_exit[n_trades] = exit_px
+                t_qty[n_trades] = qty
+                t_pnl[n_trades] = pnl
+                t_reason[n_trades] = REASON_STOP
+                n_trades += 1
+                in_pos = False
+                qty = 0.0
+
+            if in_pos and tp1_at_mid and (not tp1_taken):
+                hit_tp1 = (high[i] >= tp1) if side == SIDE_LONG else (low[i] <= tp1)
+                if hit_tp1:
+                    exit_qty = qty * tp1_frac
+                    exit_px = tp1
+                    pnl = (exit_px - entry) * exit_qty if side == SIDE_LONG else (entry - exit_px) * exit_qty
+                    equity += pnl
+                    bar_pnl += pnl
+                    qty = qty - exit_qty
+                    tp1_taken = True
+                    stop = entry
+
+            if in_pos and qty > 0:
+                hit_tp2 = (high[i] >= tp2) if side == SIDE_LONG else (low[i] <= tp2)
+                if hit_tp2:
+                    exit_px = tp2
+                    pnl = (exit_px - entry) * qty if side == SIDE_LONG else (entry - exit_px) * qty
+                    equity += pnl
+                    bar_pnl += pnl
+                    t_entry_idx[n_trades] = entry_at
+                    t_idx[n_trades] = i
+                    t_side[n_trades] = side
+                    t_entry[n_trades] = entry
+                    t_exit[n_trades] = exit_px
+                    t_qty[n_trades] = qty
+                    t_pnl[n_trades] = pnl
+                    t_reason[n_trades] = REASON_TP2
+                    n_trades += 1
+                    in_pos = False
+                    qty = 0.0
+
+            if in_pos and qty > 0 and exit_friday_close and is_last_friday_bar:
+                exit_px = close[i]
+                pnl = (exit_px - entry) * qty if side == SIDE_LONG else (entry - exit_px) * qty
+                equity += pnl
+                bar_pnl += pnl
+                t_entry_idx[n_trades] = entry_at
+                t_idx[n_trades] = i
+                t_side[n_trades] = side
+                t_entry[n_trades] = entry
+                t_exit[n_trades] = exit_px
+                t_qty[n_trades] = qty
+                t_pnl[n_trades] = pnl
+                t_reason[n_trades] = REASON_FRIDAY
+                n_trades += 1
+                in_pos = False
+                qty = 0.0
+
+        pos = qty if in_pos else 0.0
+        position_out[i] = pos * (1.0 if side == SIDE_LONG else (-1.0 if side == SIDE_SHORT else 0.0))
+        pnl_out[i] = bar_pnl
+        equity_out[i] = equity
+
+    state[S_EQUITY] = equity
+    state[S_IN_POS] = 1.0 if in_pos else 0.0
+    state[S_SIDE] = side
+    state[S_ENTRY] = entry
+    state[S_QTY] = qty
+    state[S_STOP] = stop
+    state[S_TP1] = tp1
+    state[S_TP2] = tp2
+    state[S_TP1_TAKEN] = 1.0 if tp1_taken else 0.0
+    state[S_WEEK_Y] = week_y
+    state[S_WEEK_W] = week_w
+    state[S_HAS_TRADED] = 1.0 if has_traded_week else 0.0
+    state[S_ENTRY_AT] = entry_at - n
+    return n_trades
+
+_sweep_fade_kernel_jit = njit(cache=True, nogil=True)(_sweep_fade_kernel) if HAS_NUMBA else None
+
+class _GrowList:
+    """Write-by-index list for the pure-Python kernel path (trades are appended in order)."""
+    __slots__ = ("data",)
+
+    def __init__(self):
+        self.data = []
+
+    def __setitem__(self, i, v):
+        if i == len(self.data):
+            self.data.append(v)
+        else:
+            self.data[i] = v
+
+    def __getitem__(self, i):
+        return self.data[i]
+
+def feature_arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Per-column arrays of the inputs the kernel reads.
+
+    Float columns are float64 and integer/bool columns keep their dtype, so for a
+    frame from add_monday_range these are views of its blocks rather than copies.
+    """
+    out = {}
+    for col in FEATURE_COLUMNS:
+        if col in ("weekday", "iso_year", "iso_week"):
+            arr = df[col].to_numpy()
+            out[col] = np.ascontiguousarray(arr if arr.dtype.kind in "iu" else arr.astype(np.int64))
+        elif col == "is_tradeable":
+            out[col] = np.ascontiguousarray(df[col].to_numpy(dtype=bool))
+        else:
+            out[col] = np.ascontiguousarray(df[col].to_numpy(dtype=np.float64))
+    return out
+
+def sweep_signals(arrays: Dict[str, np.ndarray], start: int = 0, stop: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Per-bar sweep-and-close-back flags shared by the research scan and the backtest.
+
+    long_sig[i]: bar i-1 traded below bar i's Monday low and closed back above it;
+    short_sig[i]: the mirror image at the Monday high. Only set on Tue+ bars whose
+    week has a usable Monday range (non-NaN, range > 0). start/stop restrict the
+    computation to bars [start, stop).
+    """
+    stop = len(arrays["close"]) if stop is None else stop
+    lo = max(start - 1, 0)
+    low, high, close = (arrays[c][lo:stop] for c in ("low", "high", "close"))
+    mh, ml, rng = (arrays[c][start:stop] for c in ("mon_high", "mon_low", "mon_range"))
+    if start == 0:
+        prev_low, prev_high, prev_close = (np.r_[np.nan, a[:-1]] for a in (low, high, close))
+    else:
+        prev_low, prev_high, prev_close = low[:-1], high[:-1], close[:-1]
+    usable = arrays["is_tradeable"][start:stop] & ~np.isnan(mh) & ~np.isnan(ml) & ~(rng <= 0)
+    long_sig = usable & (prev_low < ml) & (prev_close > ml)
+    short_sig = usable & (prev_high > mh) & (prev_close < mh)
+    return long_sig, short_sig
+
+def sweep_fade_chunk(
+    chunk: Dict[str, np.ndarray],
+    signals: list,
+    next_weekday: int,
+    params: tuple,
+    state: np.ndarray,
+    *,
+    use_numba: bool,
+    offset: int = 0,
+    out: tuple | None = None,
+):
+    """Run the kernel over one chunk of bars from `state` (updated in place).
+
+    chunk holds the FEATURE_COLUMNS arrays of the chunk, signals its [long_sig,
+    short_sig], next_weekday the weekday of the bar after it (-1 at the end of the
+    data) and offset the absolute index of its first bar. Chunks cut at any bar give
+    the same results as one call, as long as they are fed in order with one state.
+    Returns (equity, position, trade_pnl, trades); under numba the first three are
+    written into `out` buffers when given. trades is a TRADE_DTYPE array with
+    absolute entry_index/exit_index.
+    """
+    m = len(chunk["close"])
+    iso_year, iso_week = chunk["iso_year"], chunk["iso_week"]
+    # at most one trade can close per week (a carried position can close early in the next);
+    # weeks are (iso_year, iso_week), so the same week number a year apart still counts
+    week_key = np.asarray(iso_year, dtype=np.int64) * 100 + np.asarray(iso_week, dtype=np.int64)
+    cap = int(np.count_nonzero(week_key[1:] != week_key[:-1])) + 2
+
+    if use_numba:
+        inputs = [chunk[c] for c in FEATURE_COLUMNS] + list(signals)
+        eq, pos, pnl = out if out is not None else (np.empty(m), np.empty(m), np.empty(m))
+        t_entry_idx, t_idx = np.zeros(cap, dtype=np.int64), np.zeros(cap, dtype=np.int64)
+        t_side = np.zeros(cap, dtype=np.int64)
+        t_entry, t_exit, t_qty, t_pnl = (np.zeros(cap) for _ in range(4))
+        t_reason = np.zeros(cap, dtype=np.int64)
+        k = _sweep_fade_kernel_jit(*inputs, next_weekday, *params, state, eq, pos, pnl,
+                                   t_entry_idx, t_idx, t_side, t_entry, t_exit, t_qty, t_pnl, t_reason)
+        bufs = (t_entry_idx, t_idx, t_side, t_entry, t_exit, t_qty, t_pnl, t_reason)
+    else:
+        inputs = [np.asarray(a).tolist() for a in [chunk[c] for c in FEATURE_COLUMNS] + list(signals)]
+        eq, pos, pnl = [0.0] * m, [0.0] * m, [0.0] * m
+        py_state = state.tolist()
+        grow = [_GrowList() for _ in range(8)]
+        k = _sweep_fade_kernel(*inputs, next_weekday, *params, py_state, eq, pos, pnl, *grow)
+        state[:] = py_state
+        bufs = tuple(g.data for g in grow)
+
+    trades = np.zeros(k, dtype=TRADE_DTYPE)
+    if k:
+        local = np.asarray(bufs[1][:k], dtype=np.int64)
+        trades["entry_index"] = np.asarray(bufs[0][:k], dtype=np.int64) + offset
+        trades["exit_index"] = local + offset
+        for name, buf in zip(("side", "entry", "exit", "qty", "pnl", "reason"), bufs[2:]):
+            trades[name] = np.asarray(buf[:k])
+        trades["iso_year"] = iso_year[local]
+        trades["iso_week"] = iso_week[local]
+    return eq, pos, pnl, trades
+
+def iter_sweep_fade(
+    arrays: Dict[str, np.ndarray],
+    params: tuple,
+    state: np.ndarray,
+    *,
+    use_numba: bool,
+    chunk_bars: int,
+):
+    """Run the kernel chunk by chunk, yielding (start, equity, position, trade_pnl, trades).
+
+    Per-chunk outputs are scratch buffers reused for the next chunk (copy what you
+    keep); trades is a TRADE_DTYPE array with absolute entry_index/exit_index. Signals come from
+    arrays["long_sig"]/["short_sig"] when present, otherwise per chunk.
+    """
+    n = len(arrays["close"])
+    chunk_bars = max(int(chunk_bars), 1)
+    has_signals = "long_sig" in arrays
+    weekday = arrays["weekday"]
+
+    if use_numba:
+        m = min(chunk_bars, max(n, 1))
+        eq_buf, pos_buf, pnl_buf = np.empty(m), np.empty(m), np.empty(m)
+
+    for s in range(0, n, chunk_bars):
+        e = min(s + chunk_bars, n)
+        m = e - s
+        if has_signals:
+            signals = [arrays["long_sig"][s:e], arrays["short_sig"][s:e]]
+        else:
+            signals = list(sweep_signals(arrays, s, e))
+        next_wd = int(weekday[e]) if e < n else -1
+        chunk = {c: arrays[c][s:e] for c in FEATURE_COLUMNS}
+        out = (eq_buf[:m], pos_buf[:m], pnl_buf[:m]) if use_numba else None
+        eq, pos, pnl, trades = sweep_fade_chunk(chunk, signals, next_wd, params, state,
+                                                use_numba=use_numba, offset=s, out=out)
+        yield s, eq, pos, pnl, trades
+
+def _change_points(values: np.ndarray, prev: float | None) -> np.ndarray:
+    """Offsets where values differ from the preceding value (prev for offset 0)."""
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    changed = np.empty(len(values), dtype=bool)
+    changed[0] = prev is None or values[0] != prev
+    changed[1:] = values[1:] != values[:-1]
+    return np.flatnonzero(changed)
+
+def run_sweep_fade(
+    arrays: Dict[str, np.ndarray],
+    *,
+    initial_capital: float = 10_000.0,
+    risk_per_trade: float = 100.0,
+    stop_mult: float = 1.0,
+    tp1_at_mid: bool = True,
+    tp1_frac: float = 0.5,
+    tp2_to_full: float = 1.0,
+    exit_friday_close: bool = True,
+    use_numba: bool | None = None,
+    dtype: Any = np.float64,
+    sparse: bool = False,
+    chunk_bars: int | None = None,
+) -> Dict[str, Any]:
+    """Run the sweep-fade state machine over `feature_arrays` output.
+
+    Signals are taken from arrays["long_sig"]/["short_sig"] when present (e.g. shared
+    with the research scan), otherwise computed with `sweep_signals`.
+
+    The kernel runs in chunks of `chunk_bars` (default: one call under numba, 65,536
+    bars for the pure-Python path) so temporaries stay bounded. Outputs are written
+    into preallocated arrays of `dtype` (float32 halves their size; equity is still
+    accumulated in float64). With sparse=True only change points are kept: for each
+    of equity/position/trade_pnl, `<name>_at` holds the bar indices where the value
+    changes and `<name>` the values from there on (see `expand_sparse`).
+
+    Returns a dict with the equity/position/trade_pnl outputs, `trades` (TRADE_DTYPE
+    structured array) and, for compatibility, the per-field trade arrays
+    (trade_index, trade_side, trade_entry, trade_exit, trade_qty, trade_pnl_closed,
+    trade_reason).
+    """
+    n = len(arrays["close"])
+    if use_numba is None:
+        use_numba = HAS_NUMBA
+    if use_numba and not HAS_NUMBA:
+        raise ImportError("numba is not installed; use use_numba=False")
+    if chunk_bars is None:
+        chunk_bars = max(n, 1) if use_numba else 65_536
+
+    params = kernel_params(risk_per_trade=risk_per_trade, stop_mult=stop_mult, tp1_at_mid=tp1_at_mid,
+                           tp1_frac=tp1_frac, tp2_to_full=tp2_to_full, exit_friday_close=exit_friday_close)
+    state = initial_state(initial_capital)
+    names = ("equity", "position", "trade_pnl")
+
+    out: Dict[str, Any] = {}
+    if sparse:
+        points = {k: [] for k in names}
+        values = {k: [] for k in names}
+        last = {k: None for k in names}
+    else:
+        dense = {k: np.empty(n, dtype=dtype) for k in names}
+    trade_chunks = []
+
+    with stage("kernel", rows=n):
+        for s, eq, pos, pnl, trades in iter_sweep_fade(arrays, params, state, use_numba=use_numba, chunk_bars=chunk_bars):
+            trade_chunks.append(trades)
+            for name, chunk in zip(names, (eq, pos, pnl)):
+                chunk = np.asarray(chunk, dtype=np.float64)
+                if sparse:
+                    at = _change_points(chunk, last[name])
+                    points[name].append(at + s)
+                    values[name].append(chunk[at].astype(dtype))
+                    if len(chunk):
+                        last[name] = chunk[-1]
+                else:
+                    dense[name][s:s + len(chunk)] = chunk
+
+    if sparse:
+        for name in names:
+            out[name + "_at"] = np.concatenate(points[name]) if points[name] else np.zeros(0, dtype=np.int64)
+            out[name] = np.concatenate(values[name]) if values[name] else np.zeros(0, dtype=dtype)
+    else:
+        out.update(dense)
+
+    trades = np.concatenate(trade_chunks) if trade_chunks else np.zeros(0, dtype=TRADE_DTYPE)
+    out["num_trades"] = int(len(trades))
+    out["trades"] = trades
+    out["trade_index"] = trades["exit_index"]
+    out["trade_side"] = trades["side"].astype(np.int64)
+    out["trade_entry"] = trades["entry"]
+    out["trade_exit"] = trades["exit"]
+    out["trade_qty"] = trades["qty"]
+    out["trade_pnl_closed"] = trades["pnl"]
+    out["trade_reason"] = trades["reason"].astype(np.int64)
+    out["final_state"] = state
+    return out
+
+def expand_sparse(at: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """Dense length-n series from change points (value holds until the next point)."""
+    return np.repeat(values, np.diff(np.append(at, n)))
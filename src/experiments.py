@@ -0,0 +1,273 @@
+from __future__ import annotations
+import functools
+import glob
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import Callable, Dict, Any, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data import OHLC_COLUMNS
+
+# metrics copied into their own indexed columns so queries don't parse JSON
+METRIC_COLUMNS = ("total_return", "sharpe", "max_drawdown", "num_trades", "win_rate", "total_signals")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    symbol TEXT,
+    interval TEXT,
+    params TEXT NOT NULL,
+    data_hash TEXT NOT NULL,
+    code_version TEXT NOT NULL,
+    bars INTEGER,
+    metrics TEXT NOT NULL,
+    total_return REAL, sharpe REAL, max_drawdown REAL, num_trades INTEGER, win_rate REAL, total_signals INTEGER,
+    bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_key TEXT NOT NULL REFERENCES runs(run_key) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (run_key, name)
+);
+CREATE INDEX IF NOT EXISTS runs_kind_symbol ON runs(kind, symbol);
+CREATE INDEX IF NOT EXISTS runs_last_used ON runs(last_used);
+"""
+
+@functools.lru_cache(maxsize=None)
+def code_version(root: str | None = None) -> str:
+    """Hash of the library sources (src/*.py): any code change starts a fresh key space."""
+    root = root or os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(root, "*.py"))):
+        h.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+def ohlc_digest(df: pd.DataFrame, columns: Iterable[str] = OHLC_COLUMNS) -> str:
+    """Content hash of the bars a run reads: timestamps (with unit and tz) and `columns`."""
+    columns = list(columns)
+    h = hashlib.sha256(f"{','.join(columns)}/{df.index.unit}/{df.index.tz}/{len(df)}".encode())
+    h.update(np.ascontiguousarray(df.index.asi8))
+    for col in columns:
+        h.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)))
+    return h.hexdigest()[:32]
+
+def _canonical(params: Dict[str, Any]) -> str:
+    def plain(v):
+        if isinstance(v, np.generic):
+            return v.item()
+        return v
+    return json.dumps({k: plain(v) for k, v in params.items()}, sort_keys=True, separators=(",", ":"))
+
+def run_key(kind: str, params: Dict[str, Any], data_hash: str, version: str | None = None) -> str:
+    payload = f"{kind}\n{_canonical(params)}\n{data_hash}\n{version or code_version()}"
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def _pack_frame(obj) -> bytes:
+    buf = io.BytesIO()
+    pd.to_pickle(obj, buf, compression=None)
+    return zlib.compress(buf.getvalue(), 6)
+
+def _unpack_frame(blob: bytes):
+    return pd.read_pickle(io.BytesIO(zlib.decompress(blob)), compression=None)
+
+class StoredRun:
+    """A cached run: metrics dict plus artifacts (DataFrames/Series) loaded on demand."""
+
+    def __init__(self, store: "ExperimentStore", key: str, metrics: Dict[str, Any]):
+        self.store = store
+        self.key = key
+        self.metrics = metrics
+
+    def artifact(self, name: str):
+        return self.store._artifact(self.key, name)
+
+class ExperimentStore:
+    """Append-only SQLite store of backtest/research runs, keyed by what determines them.
+
+    A run's key hashes its kind, parameters, the input bars (ohlc_digest) and the
+    library code version, so a stored run is returned only when recomputing would
+    give the same result. Each run keeps its metrics (JSON, with headline metrics
+    in indexed columns for queries) and named artifacts (trade log, equity, ...)
+    as compressed blobs. Stored runs are never rewritten, only evicted.
+    """
+
+    def __init__(self, path: str = "results/experiments.sqlite"):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(_SCHEMA)
+        self.stats = {"hits": 0, "misses": 0, "stored": 0}
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get(self, kind: str, params: Dict[str, Any], data_hash: str) -> StoredRun | None:
+        found = self.get_many(kind, [params], data_hash)
+        return found[0]
+
+    def get_many(self, kind: str, params_list: List[Dict[str, Any]], data_hash: str) -> List[StoredRun | None]:
+        """Look up many parameter sets on the same data in one query (None where missing)."""
+        keys = [run_key(kind, p, data_hash) for p in params_list]
+        found: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(keys), 500):  # SQLite's bound-parameter limit
+            part = keys[i:i + 500]
+            q = f"SELECT run_key, metrics FROM runs WHERE run_key IN ({','.join('?' * len(part))})"
+            found.update({k: json.loads(m) for k, m in self.conn.execute(q, part)})
+        if found:
+            with self.conn:
+                self.conn.executemany("UPDATE runs SET last_used = ?, hits = hits + 1 WHERE run_key = ?",
+                                      [(time.time(), k) for k in found])
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(keys) - len(found)
+        return [StoredRun(self, k, found[k]) if k in found else None for k in keys]
+
+    def put(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        data_hash: str,
+        metrics: Dict[str, Any],
+        artifacts: Dict[str, Any] | None = None,
+        *,
+        symbol: str | None = None,
+        interval: str | None = None,
+        bars: int | None = None,
+    ) -> str:
+        """Store one run (ignored if its key exists); returns the key."""
+        return self.put_many(kind, [(params, metrics, artifacts)], data_hash, symbol=symbol, interval=interval, bars=bars)[0]
+
+    def put_many(
+        self,
+        kind: str,
+        runs: Iterable[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any] | None]],
+        data_hash: str,
+        *,
+        symbol: str | None = None,
+        interval: str | None = None,
+        bars: int | None = None,
+    ) -> List[str]:
+        version = code_version()
+        now = time.time()
+        keys, rows, blobs = [], [], []
+        for params, metrics, artifacts in runs:
+            key = run_key(kind, params, data_hash, version)
+            packed = {name: _pack_frame(obj) for name, obj in (artifacts or {}).items()}
+            metrics_json = json.dumps(metrics, default=_json_default)
+            flat = _flat_metrics(metrics)
+            size = len(metrics_json) + sum(len(b) for b in packed.values())
+            keys.append(key)
+            rows.append((key, kind, symbol, interval, _canonical(params), data_hash, version, bars, metrics_json,
+                         *(flat.get(c) for c in METRIC_COLUMNS), size, now, now))
+            blobs.extend((key, name, b) for name, b in packed.items())
+        with self.conn:
+            cur = self.conn.executemany(
+                f"INSERT OR IGNORE INTO runs VALUES ({','.join('?' * 18)}, 0)", rows)
+            self.conn.executemany("INSERT OR IGNORE INTO artifacts VALUES (?, ?, ?)", blobs)
+        self.stats["stored"] += cur.rowcount if cur.rowcount > 0 else 0
+        return keys
+
+    def _artifact(self, key: str, name: str):
+        row = self.conn.execute("SELECT data FROM artifacts WHERE run_key = ? AND name = ?", (key, name)).fetchone()
+        return None if row is None else _unpack_frame(row[0])
+
+    def runs(self, kind: str | None = None, symbol: str | None = None) -> pd.DataFrame:
+        """Stored runs (without artifacts): metadata, parameters and headline metrics."""
+        where, args = [], []
+        if kind is not None:
+            where.append("kind = ?")
+            args.append(kind)
+        if symbol is not None:
+            where.append("symbol = ?")
+            args.append(symbol)
+        cols = ["run_key", "kind", "symbol", "interval", "params", "data_hash", "code_version", "bars",
+                *METRIC_COLUMNS, "bytes", "created", "last_used", "hits"]
+        q = f"SELECT {', '.join(cols)} FROM runs" + (f" WHERE {' AND '.join(where)}" if where else "")
+        return pd.read_sql_query(q, self.conn, params=args)
+
+    def best(self, metric: str = "sharpe", *, by: str = "symbol", kind: str | None = None) -> pd.DataFrame:
+        """Top run per `by` group (e.g. best Sharpe per symbol), ranked in SQL."""
+        if metric not in METRIC_COLUMNS:
+            raise ValueError(f"metric must be one of {METRIC_COLUMNS}")
+        if by not in ("symbol", "interval", "kind", "data_hash", "code_version"):
+            raise ValueError(f"Cannot group by {by!r}")
+        where = f"WHERE {metric} IS NOT NULL" + (" AND kind = ?" if kind else "")
+        q = f"""
+            SELECT * FROM (
+                SELECT run_key, kind, symbol, interval, params, {metric}, created,
+                       ROW_NUMBER() OVER (PARTITION BY {by} ORDER BY {metric} DESC) AS rank
+                FROM runs {where}
+            ) WHERE rank = 1 ORDER BY {metric} DESC
+        """
+        return pd.read_sql_query(q, self.conn, params=[kind] if kind else [])
+
+    def evict(self, *, max_age_days: float | None = None, max_bytes: int | None = None) -> int:
+        """Delete runs unused for max_age_days, then least recently used runs until the
+        stored payload is under max_bytes. Returns the number of runs removed."""
+        removed = 0
+        with self.conn:
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 86_400
+                removed += self.conn.execute("DELETE FROM runs WHERE last_used < ?", (cutoff,)).rowcount
+            if max_bytes is not None:
+                total = self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM runs").fetchone()[0]
+                if total > max_bytes:
+                    drop, excess = [], total - max_bytes
+                    for key, size in self.conn.execute("SELECT run_key, bytes FROM runs ORDER BY last_used"):
+                        if excess <= 0:
+                            break
+                        drop.append((key,))
+                        excess -= size
+                    removed += self.conn.executemany("DELETE FROM runs WHERE run_key = ?", drop).rowcount
+        if removed:
+            self.conn.execute("VACUUM")
+        return removed
+
+    def memoize(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        bars: pd.DataFrame,
+        compute: Callable[[], Tuple[Dict[str, Any], Dict[str, Any]]],
+        *,
+        symbol: str | None = None,
+        interval: str | None = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any], bool]:
+        """(metrics, artifacts, hit): the stored run for these params and bars, or
+        compute() -> (metrics, artifacts), stored before returning."""
+        data_hash = ohlc_digest(bars)
+        found = self.get(kind, params, data_hash)
+        if found is not None:
+            names = [r[0] for r in self.conn.execute("SELECT name FROM artifacts WHERE run_key = ?", (found.key,))]
+            return found.metrics, {n: found.artifact(n) for n in names}, True
+        metrics, artifacts = compute()
+        self.put(kind, params, data_hash, metrics, artifacts, symbol=symbol, interval=interval, bars=len(bars))
+        return metrics, artifacts, False
+
+def _json_default(v):
+    if isinstance(v, np.generic):
+        return v.item()
+    raise TypeError(f"Not JSON serializable: {type(v).__name__}")
+
+def _flat_metrics(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """Headline metrics from a flat row or the CLIs' {"equity": ..., "trades": ...} layout."""
+    flat: Dict[str, Any] = {}
+    for part in (metrics, metrics.get("equity"), metrics.get("trades"), metrics.get("summary")):
+        if isinstance(part, dict):
+            flat.update({k: v for k, v in part.items() if k in METRIC_COLUMNS and not isinstance(v, dict)})
+    return flat
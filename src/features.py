@@ -1,4 +1,5 @@
 from __future__ import annotations
+import numpy as np
 import pandas as pd
 
 def add_calendar_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -9,8 +10,18 @@ def add_calendar_features(df: pd.DataFrame) -> pd.DataFrame:
     out["iso_week"] = iso.week.astype(int)
     return out
 
-def add_monday_range(df: pd.DataFrame) -> pd.DataFrame:
-    """Attach Monday high/low and derived features per ISO week."""
+# columns add_monday_range appends, in order
+MONDAY_COLUMNS = ("weekday", "iso_year", "iso_week", "mon_high", "mon_low", "mon_range", "mon_mid", "is_tradeable")
+
+def add_monday_range(df: pd.DataFrame, *, store=None) -> pd.DataFrame:
+    """Attach Monday high/low and derived features per ISO week.
+
+    With a `store` (src.cache.FeatureStore) the feature columns are served from, and
+    saved to, its on-disk cache; bars appended since a cached run only cost their own
+    ISO weeks.
+    """
+    if store is not None:
+        return store.add_monday_range(df)
     out = add_calendar_features(df)
 
     monday = out[out["weekday"] == 0]
@@ -24,3 +35,16 @@ def add_monday_range(df: pd.DataFrame) -> pd.DataFrame:
     out["mon_mid"] = (out["mon_high"] + out["mon_low"]) / 2.0
     out["is_tradeable"] = out["weekday"] > 0  # Tue+
     return out
+
+def week_offsets(iso_year: np.ndarray, iso_week: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start (inclusive) and end (exclusive) row offsets of each ISO week run.
+
+    Assumes rows are time-sorted, so every ISO week is one contiguous run.
+    """
+    n = len(iso_year)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    change = (iso_year[1:] != iso_year[:-1]) | (iso_week[1:] != iso_week[:-1])
+    starts = np.concatenate(([0], np.flatnonzero(change) + 1)).astype(np.int64)
+    ends = np.append(starts[1:], n).astype(np.int64)
+    return starts, ends
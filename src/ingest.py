@@ -0,0 +1,226 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+from typing import Dict, Iterator, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.data import OHLC_COLUMNS, period_start
+
+def interval_ns(interval: str) -> int:
+    """Bar size in nanoseconds for yfinance-style intervals ("1m", "15m", "4h", "1d") or pandas offsets."""
+    s = interval.lower().strip()
+    if s.endswith("m") and s[:-1].isdigit():
+        s = s + "in"  # "15m" means minutes, not months
+    step = pd.Timedelta(s)
+    if step <= pd.Timedelta(0) or pd.Timedelta(days=1) % step != pd.Timedelta(0):
+        raise ValueError(f"Interval must divide one day evenly: {interval!r}")
+    return int(step.value)
+
+def iter_file_chunks(path: str, columns: Sequence[str] | None = None, chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """Read a CSV (optionally compressed) or Parquet file in chunks of at most `chunk_rows` rows.
+
+    Parquet needs pyarrow, imported on first use.
+    """
+    if path.endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:  # pragma: no cover - depends on environment
+            raise ImportError("Reading Parquet files requires pyarrow (pip install pyarrow)") from e
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=list(columns) if columns else None):
+            yield batch.to_pandas()
+        return
+    yield from pd.read_csv(path, usecols=list(columns) if columns else None, chunksize=chunk_rows)
+
+def _match_columns(available: Sequence[str], wanted: Sequence[str]) -> Dict[str, str]:
+    """Map wanted lower-case names to the file's actual column names (case-insensitive)."""
+    lookup = {c.lower(): c for c in available}
+    missing = [w for w in wanted if w not in lookup]
+    if missing:
+        raise ValueError(f"Columns {missing} not found in file (has {list(available)})")
+    return {w: lookup[w] for w in wanted}
+
+def _file_columns(path: str) -> List[str]:
+    if path.endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def _timestamps(values: pd.Series, time_unit: str | None, time_format: str | None, tz: str | None) -> np.ndarray:
+    """int64 wall-clock nanoseconds, tz-naive as in normalize_ohlc (converted to `tz` first if given)."""
+    if time_unit is not None:
+        ts = pd.DatetimeIndex(pd.to_datetime(values.to_numpy(), unit=time_unit))
+        if tz is not None:
+            ts = ts.tz_localize("UTC")
+    else:
+        try:
+            ts = pd.DatetimeIndex(pd.to_datetime(values, format=time_format or "ISO8601"))
+        except ValueError:
+            # mixed UTC offsets (e.g. across DST changes): only meaningful in one target zone
+            if tz is None:
+                raise ValueError("Timestamps have mixed UTC offsets; pass tz= to convert them to one zone")
+            ts = pd.DatetimeIndex(pd.to_datetime(values, format=time_format or "ISO8601", utc=True))
+    if ts.tz is not None:
+        if tz is not None:
+            ts = ts.tz_convert(tz)
+        ts = ts.tz_localize(None)
+    return ts.as_unit("ns").asi8
+
+class OHLCResampler:
+    """Incremental OHLC aggregation into fixed buckets, fed chunk by chunk.
+
+    Rows must arrive in time order (within and across chunks). The last bucket of a
+    chunk is held back and merged with the next chunk's first bucket when they share
+    it, so results do not depend on where the chunks split. Memory: the finished bars
+    plus one chunk.
+    """
+
+    def __init__(self, interval: str):
+        self.step = interval_ns(interval)
+        self._done: List[Dict[str, np.ndarray]] = []
+        self._pending: Dict[str, float] | None = None  # bucket, open, high, low, close
+        self._last_ts: int | None = None
+        self.rows_in = 0
+
+    def update(self, ts: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> None:
+        n = len(ts)
+        if n == 0:
+            return
+        if (n > 1 and (np.diff(ts) < 0).any()) or (self._last_ts is not None and ts[0] < self._last_ts):
+            raise ValueError("Rows must be sorted by time")
+        self._last_ts = int(ts[-1])
+        self.rows_in += n
+
+        bucket = ts // self.step
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], n] - 1
+        bars = {
+            "bucket": bucket[starts],
+            "open": open_[starts],
+            "high": np.maximum.reduceat(high, starts),
+            "low": np.minimum.reduceat(low, starts),
+            "close": close[ends],
+        }
+
+        p = self._pending
+        if p is not None:
+            if bars["bucket"][0] == p["bucket"]:
+                bars["open"][0] = p["open"]
+                bars["high"][0] = max(bars["high"][0], p["high"])
+                bars["low"][0] = min(bars["low"][0], p["low"])
+            else:
+                self._done.append({k: np.array([v]) for k, v in p.items()})
+        self._pending = {k: v[-1].item() for k, v in bars.items()}
+        if len(starts) > 1:
+            self._done.append({k: v[:-1] for k, v in bars.items()})
+
+    def result(self) -> pd.DataFrame:
+        """Bars so far (including the open last bucket) as an OHLC frame indexed by bucket start."""
+        parts = list(self._done)
+        if self._pending is not None:
+            parts.append({k: np.array([v]) for k, v in self._pending.items()})
+        if not parts:
+            return pd.DataFrame(columns=OHLC_COLUMNS, dtype=np.float64, index=pd.DatetimeIndex([], name="Datetime"))
+        cols = {k: np.concatenate([p[k] for p in parts]) for k in ("bucket", *OHLC_COLUMNS)}
+        index = pd.DatetimeIndex((cols.pop("bucket").astype(np.int64) * self.step).view("M8[ns]"), name="Datetime")
+        return pd.DataFrame({c: cols[c].astype(np.float64) for c in OHLC_COLUMNS}, index=index)
+
+def stream_ohlc(
+    path: str,
+    interval: str,
+    *,
+    kind: str = "bars",
+    time_col: str | None = None,
+    price_col: str = "price",
+    time_unit: str | None = None,
+    time_format: str | None = None,
+    tz: str | None = None,
+    start: str | pd.Timestamp | None = None,
+    end: str | pd.Timestamp | None = None,
+    chunk_rows: int = 1_000_000,
+) -> pd.DataFrame:
+    """Stream a local CSV/Parquet file of bars or trades and resample it to `interval`.
+
+    - kind="bars": open/high/low/close columns (any case), e.g. 1m bars
+    - kind="trades": one `price_col` per row; each trade is a one-tick bar
+    - time_col: timestamp column (default: the first column); epoch numbers with time_unit ("s", "ms", "us", "ns"),
+      otherwise strings parsed as ISO 8601 (or `time_format`)
+    - tz: tz-aware timestamps are made tz-naive like download_ohlc (wall clock of
+      their own offset), or of `tz` if given; epoch numbers are UTC
+    - start/end: keep rows in [start, end) (reading stops at the first row past end)
+
+    The file is read `chunk_rows` at a time, so memory stays bounded by one chunk
+    plus the resampled bars. Rows must be in time order; rows with missing prices are
+    dropped. Returns open/high/low/close bars indexed by bucket start.
+    """
+    if kind not in ("bars", "trades"):
+        raise ValueError(f"Unknown kind: {kind!r} (expected 'bars' or 'trades')")
+    available = _file_columns(path)
+    time_col = time_col or available[0]
+    wanted = [time_col.lower()] + (OHLC_COLUMNS if kind == "bars" else [price_col.lower()])
+    names = _match_columns(available, wanted)
+    lo = pd.Timestamp(start).value if start is not None else None
+    hi = pd.Timestamp(end).value if end is not None else None
+
+    resampler = OHLCResampler(interval)
+    for chunk in iter_file_chunks(path, columns=list(names.values()), chunk_rows=chunk_rows):
+        ts = _timestamps(chunk[names[time_col.lower()]], time_unit, time_format, tz)
+        if kind == "bars":
+            o, h, l, c = (chunk[names[k]].to_numpy(dtype=np.float64) for k in OHLC_COLUMNS)
+        else:
+            o = h = l = c = chunk[names[price_col.lower()]].to_numpy(dtype=np.float64)
+        keep = ~(np.isnan(o) | np.isnan(h) | np.isnan(l) | np.isnan(c))
+        if lo is not None:
+            keep &= ts >= lo
+        stop = False
+        if hi is not None:
+            past = ts >= hi
+            stop = bool(past.any())
+            keep &= ~past
+        if not keep.all():
+            ts, o, h, l, c = ts[keep], o[keep], h[keep], l[keep], c[keep]
+        resampler.update(ts, o, h, l, c)
+        if stop:
+            break
+    return resampler.result()
+
+class FileProvider:
+    """OHLCProvider over local files, so download_ohlc / BarStore work on in-house data.
+
+    `paths` maps symbol -> file path, or is a format string with {symbol}
+    (e.g. "data/raw/{symbol}_1m.csv"). Options are passed to stream_ohlc. period is
+    applied relative to the last bar in the file. In a BarStore each file is cached
+    under its own cache_key, never under the bare symbol.
+    """
+
+    def __init__(self, paths: Dict[str, str] | str, **options):
+        self.paths = paths
+        self.options = options
+        self.calls: list[tuple] = []
+
+    def path(self, symbol: str) -> str:
+        if isinstance(self.paths, str):
+            return self.paths.format(symbol=symbol)
+        return self.paths[symbol]
+
+    def cache_key(self, symbol: str) -> str:
+        """BarStore key for the symbol's file: a different file, a rewrite of it (size or
+        mtime) or other resampling options give a different key, hence a fresh entry."""
+        path = self.path(symbol)
+        st = os.stat(path) if os.path.exists(path) else None
+        source = [os.path.abspath(path), st.st_size if st else None, st.st_mtime_ns if st else None, self.options]
+        digest = hashlib.sha1(json.dumps(source, sort_keys=True, default=str).encode()).hexdigest()[:12]
+        return f"{symbol}@file-{digest}"
+
+    def fetch(self, symbol, interval, period=None, start=None, end=None) -> pd.DataFrame:
+        self.calls.append((symbol, interval, period, start, end))
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        df = stream_ohlc(path, interval, start=start, end=end, **self.options)
+        if start is None and period is not None and len(df):
+            df = df[df.index >= period_start(df.index[-1], period)]
+        return df
@@ -0,0 +1,78 @@
+from __future__ import annotations
+from typing import Dict, Any
+
+import pandas as pd
+
+from src.backtest import backtest_sweep_fade
+from src.cache import BarStore
+from src.live import LiveSweepFade, replay
+
+class StoreResolver:
+    """Finer bars for one coarse bar, read lazily from a BarStore.
+
+    The fine-interval column files are memory-mapped on the first ambiguous bar, and
+    each call only slices [ts, ts + bar_interval), so only those pages are touched.
+    """
+
+    def __init__(self, store: BarStore, symbol: str, fine_interval: str, bar_interval: str | pd.Timedelta):
+        self.store = store
+        self.symbol = symbol
+        self.fine_interval = fine_interval
+        self.bar_interval = pd.Timedelta(bar_interval)
+        self.windows = 0
+        self.fine_bars = 0
+        self._bars: pd.DataFrame | None = None
+        self._opened = False
+
+    def __call__(self, ts: pd.Timestamp) -> pd.DataFrame | None:
+        if not self._opened:
+            self._bars = self.store.read(self.symbol, self.fine_interval)
+            self._opened = True
+        if self._bars is None:
+            return None
+        index = self._bars.index
+        lo = index.searchsorted(ts, side="left")
+        hi = index.searchsorted(ts + self.bar_interval, side="left")
+        self.windows += 1
+        self.fine_bars += hi - lo
+        return self._bars.iloc[lo:hi]
+
+def backtest_intrabar(df: pd.DataFrame, resolver, **params) -> tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
+    """backtest_sweep_fade with ambiguous bars resolved on finer data.
+
+    A bar is ambiguous when, with a position open, its range reaches both an adverse
+    level (stop, or entry while TP1 is pending) and a target, so the bar-level
+    stop-first rule decides the outcome. Only those bars are passed to `resolver`
+    (e.g. StoreResolver) and replayed over the finer bars it returns; every other
+    bar is handled exactly as in the batch backtest.
+
+    Returns df_out, trades and a report comparing against the unresolved backtest:
+    ambiguous/resolved/unresolved bar counts and total pnl before and after (final
+    equity minus initial capital, so TP1 partial fills, which are not in the trade
+    log, are included).
+    """
+    coarse_out, coarse_trades = backtest_sweep_fade(df, engine="array", **params)
+
+    engine = LiveSweepFade(resolver=resolver, **params)
+    df_out, trades = replay(engine, df)
+    initial_capital = float(params.get("initial_capital", 10_000.0))
+
+    def total(out: pd.DataFrame) -> float:
+        return float(out["equity"].iloc[-1]) - initial_capital if len(out) else 0.0
+
+    def reasons(t: pd.DataFrame) -> Dict[str, int]:
+        return {k: int(v) for k, v in t["reason"].value_counts().items()} if len(t) else {}
+
+    report = {
+        "bars": int(len(df)),
+        "ambiguous_bars": int(engine.ambiguous_bars),
+        "resolved_bars": int(engine.resolved_bars),
+        "unresolved_bars": int(engine.ambiguous_bars - engine.resolved_bars),
+        "fine_bars_read": int(getattr(resolver, "fine_bars", 0)),
+        "pnl_bar_level": total(coarse_out),
+        "pnl_resolved": total(df_out),
+        "pnl_change": total(df_out) - total(coarse_out),
+        "by_reason_bar_level": reasons(coarse_trades),
+        "by_reason_resolved": reasons(trades),
+    }
+    return df_out, trades, report
@@ -0,0 +1,419 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Sequence, Tuple
+
+import pandas as pd
+
+from src.cache import BarStore, FeatureStore
+from src.data import download_ohlc
+from src.engine import feature_arrays, sweep_signals
+from src.features import add_monday_range
+from src.research import signal_outcomes, summarize_research
+from src.sweep import evaluate_params, param_grid
+
+JOB_FILE = "job.json"
+
+# --- job layout ----------------------------------------------------------------
+#
+#   <job_dir>/job.json            study spec + shard list (written once)
+#   <job_dir>/claims/<id>         claim of a running shard (O_EXCL; mtime = heartbeat)
+#   <job_dir>/results/<id>.pkl    finished shard: one row per parameter combination
+#   <job_dir>/errors/<id>.json    failed shard (retried with retry_failed=True)
+#
+# Every file that marks progress is created atomically (O_EXCL or write + os.replace),
+# so any number of workers on any number of hosts can share the directory, and a
+# killed job resumes from the shards that have no result yet.
+
+def _spec_hash(spec: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+def plan_shards(
+    symbols: Sequence[str],
+    periods: Sequence[Tuple[str | None, str | None]],
+    combos: List[Dict[str, Any]],
+    shard_size: int,
+) -> List[Dict[str, Any]]:
+    """Split symbols x periods x combos into shards of at most shard_size combinations.
+
+    Shards of one (symbol, period) are adjacent, so a worker that claims them in order
+    loads and featurizes those bars once.
+    """
+    shard_size = max(1, int(shard_size))
+    shards = []
+    for sym in symbols:
+        for start, end in periods:
+            for i in range(0, len(combos), shard_size):
+                shards.append({"id": f"{len(shards):06d}", "symbol": sym, "start": start, "end": end,
+                               "combos": combos[i:i + shard_size]})
+    return shards
+
+def create_job(
+    job_dir: str,
+    symbols: Sequence[str],
+    grid: Dict[str, Sequence[Any]] | List[Dict[str, Any]],
+    *,
+    interval: str,
+    bars_per_year: float,
+    periods: Sequence[Tuple[str | None, str | None]] = ((None, None),),
+    period: str = "2y",
+    initial_capital: float = 10_000.0,
+    risk_per_trade: float = 100.0,
+    cache_dir: str | None = "data/bars",
+    shard_size: int = 64,
+) -> Dict[str, Any]:
+    """Write the study (symbols x periods x parameter grid) to job_dir/job.json.
+
+    If the job already exists with the same spec it is returned unchanged, so a
+    restarted driver resumes it; a different spec raises ValueError instead of
+    mixing results of two studies.
+    """
+    combos = param_grid(grid) if isinstance(grid, dict) else list(grid)
+    spec = dict(
+        symbols=list(symbols), periods=[list(p) for p in periods], combos=combos, interval=interval, period=period,
+        bars_per_year=bars_per_year, initial_capital=initial_capital, risk_per_trade=risk_per_trade,
+        cache_dir=cache_dir, shard_size=int(shard_size),
+    )
+    path = os.path.join(job_dir, JOB_FILE)
+    if not os.path.exists(path):
+        for sub in ("claims", "results", "errors"):
+            os.makedirs(os.path.join(job_dir, sub), exist_ok=True)
+        job = dict(spec=spec, spec_hash=_spec_hash(spec), created=time.time(),
+                   shards=plan_shards(symbols, [tuple(p) for p in periods], combos, shard_size))
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        try:
+            os.link(tmp, path)  # first writer wins if two drivers create the job at once
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp)
+    job = load_job(job_dir)
+    if job["spec_hash"] != _spec_hash(spec):
+        raise ValueError(f"{job_dir} holds a different study; use another directory or delete it")
+    return job
+
+def load_job(job_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(job_dir, JOB_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# --- claims ------------------------------------------------------------------------
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class ShardClaims:
+    """Exclusive shard claims as lock files under <job_dir>/claims.
+
+    A claim is created with O_CREAT | O_EXCL, which is atomic on local filesystems
+    and NFS alike (unlike flock). The owner refreshes its mtime every `heartbeat`
+    seconds; a claim is stale when its owner is a dead process on this host or its
+    heartbeat is older than `stale_after`, and is then taken over under a second
+    O_EXCL lock so that only one worker can reclaim it. A worker only refreshes or
+    deletes claim files that still name it, so one whose claim was taken over leaves
+    the new owner's alone (see `owns`).
+    """
+
+    def __init__(self, job_dir: str, *, worker: str | None = None, heartbeat: float = 30.0,
+                 stale_after: float = 300.0):
+        self.dir = os.path.join(job_dir, "claims")
+        self.worker = worker or _worker_id()
+        self.heartbeat = heartbeat
+        self.stale_after = stale_after
+        self._held: set[str] = set()
+        self._stop = threading.Event()
+        self._beat = threading.Thread(target=self._beat_loop, daemon=True)
+        self._beat.start()
+
+    def _path(self, shard_id: str) -> str:
+        return os.path.join(self.dir, shard_id)
+
+    def _create(self, path: str) -> bool:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"worker": self.worker, "claimed": time.time()}, f)
+        return True
+
+    def _owner(self, path: str) -> str | None:
+        """Worker named in a claim file: None if there is none, "" if it is unreadable."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("worker", "")
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            return ""  # still being written, or its owner died while writing it
+
+    def _is_stale(self, path: str) -> bool:
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False  # released meanwhile
+        owner = self._owner(path)
+        if owner is None:
+            return False
+        host, _, pid = owner.rpartition(":")
+        if host == socket.gethostname() and pid.isdigit() and not _pid_alive(int(pid)):
+            return True
+        return age > self.stale_after
+
+    def acquire(self, shard_id: str) -> bool:
+        path = self._path(shard_id)
+        if self._create(path):
+            self._held.add(shard_id)
+            return True
+        if not self._is_stale(path):
+            return False
+        lock = path + ".reclaim"
+        try:
+            if time.time() - os.stat(lock).st_mtime > self.stale_after:
+                os.unlink(lock)  # a reclaimer died between the two steps below
+        except FileNotFoundError:
+            pass
+        if not self._create(lock):
+            return False
+        try:
+            if not self._is_stale(path):
+                return False
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            if not self._create(path):
+                return False
+            self._held.add(shard_id)
+            return True
+        finally:
+            os.unlink(lock)
+
+    def owns(self, shard_id: str) -> bool:
+        """Whether this worker's claim on the shard is still in place (not taken over)."""
+        return self._owner(self._path(shard_id)) == self.worker
+
+    def release(self, shard_id: str) -> None:
+        self._held.discard(shard_id)
+        if not self.owns(shard_id):
+            return  # taken over: the claim file is the new owner's
+        try:
+            os.unlink(self._path(shard_id))
+        except FileNotFoundError:
+            pass
+
+    def _beat_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat):
+            for shard_id in list(self._held):
+                if not self.owns(shard_id):
+                    self._held.discard(shard_id)  # taken over; stop refreshing it
+                    continue
+                try:
+                    os.utime(self._path(shard_id))
+                except FileNotFoundError:
+                    pass
+
+    def close(self) -> None:
+        self._stop.set()
+        for shard_id in list(self._held):
+            self.release(shard_id)
+
+# --- workers -----------------------------------------------------------------------
+
+def _write_atomic(path: str, write) -> None:
+    tmp = f"{path}.tmp-{_worker_id().replace(':', '-')}"
+    write(tmp)
+    os.replace(tmp, path)
+
+def _write_json(path: str, obj: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+
+def _shard_done(job_dir: str, shard_id: str) -> bool:
+    return (os.path.exists(os.path.join(job_dir, "results", f"{shard_id}.pkl"))
+            or os.path.exists(os.path.join(job_dir, "errors", f"{shard_id}.json")))
+
+def run_shard(shard: Dict[str, Any], spec: Dict[str, Any], cache: Dict[str, Any] | None = None) -> pd.DataFrame:
+    """Research summary + one backtest per combination for one shard's symbol and period.
+
+    `cache` keeps the last (symbol, period) feature arrays across calls, so adjacent
+    shards of the same bars featurize once per worker. The key is set only once they
+    are ready (or with a download error), so a shard that fails while featurizing
+    leaves the next one to start over.
+    """
+    cache = {} if cache is None else cache
+    key = (shard["symbol"], shard["start"], shard["end"])
+    if cache.get("key") == key and "error" in cache:
+        raise cache["error"]
+    if cache.get("key") != key:
+        cache.clear()
+        store = BarStore(spec["cache_dir"]) if spec.get("cache_dir") else None
+        try:
+            df = download_ohlc(shard["symbol"], interval=spec["interval"], period=spec["period"],
+                               start=shard["start"], end=shard["end"], store=store)
+        except Exception as exc:
+            # the symbol's other shards fail without asking the provider again
+            cache.update(key=key, error=exc)
+            raise
+        features = FeatureStore(os.path.join(spec["cache_dir"], "_features")) if store is not None else None
+        df = add_monday_range(df, store=features)
+        arrays = feature_arrays(df)
+        arrays["long_sig"], arrays["short_sig"] = sweep_signals(arrays)
+        summary = summarize_research(signal_outcomes(df.index, arrays))
+        cache.update(key=key, arrays=arrays, bars=len(df),
+                     research={f"research_{k}": v for k, v in summary.items()})
+
+    settings = dict(initial_capital=spec["initial_capital"], risk_per_trade=spec["risk_per_trade"],
+                    bars_per_year=spec["bars_per_year"])
+    head = {"symbol": shard["symbol"], "start": shard["start"], "end": shard["end"], "bars": cache["bars"]}
+    rows = [{**head, **evaluate_params(cache["arrays"], p, **settings), **cache["research"]} for p in shard["combos"]]
+    return pd.DataFrame(rows)
+
+def run_worker(
+    job_dir: str,
+    *,
+    worker: str | None = None,
+    heartbeat: float = 30.0,
+    stale_after: float = 300.0,
+    poll: float = 5.0,
+    wait: bool = True,
+    max_shards: int | None = None,
+    verbose: bool = True,
+) -> Dict[str, Any]:
+    """Claim and run shards of the job in job_dir until none are left.
+
+    Shards are visited in order; one that has a result or an error file, or a live
+    claim, is skipped. With `wait`, the worker then keeps polling until the other
+    claims finish, taking over any that go stale (killed workers). Each shard's result
+    is written atomically before its claim is released, and only while the claim is
+    still this worker's: one that was taken over (e.g. after a long stall) is left to
+    its new owner. Stops after `max_shards`.
+
+    Returns the worker's counters: shards done / failed, combinations and seconds.
+    """
+    job = load_job(job_dir)
+    spec, shards = job["spec"], job["shards"]
+    claims = ShardClaims(job_dir, worker=worker, heartbeat=heartbeat, stale_after=stale_after)
+    stats = {"worker": claims.worker, "done": 0, "failed": 0, "combos": 0, "seconds": 0.0}
+    cache: Dict[str, Any] = {}
+    t_start = time.perf_counter()
+    try:
+        while True:
+            pending = 0
+            for shard in shards:
+                sid = shard["id"]
+                if _shard_done(job_dir, sid):
+                    continue
+                if max_shards is not None and stats["done"] + stats["failed"] >= max_shards:
+                    return stats
+                if not claims.acquire(sid):
+                    pending += 1
+                    continue
+                try:
+                    if _shard_done(job_dir, sid):  # finished between the check and the claim
+                        continue
+                    t = time.perf_counter()
+                    try:
+                        table = run_shard(shard, spec, cache)
+                    except Exception as exc:  # one bad symbol or period must not stop the job
+                        if not claims.owns(sid):
+                            continue  # taken over while running; the new owner records it
+                        error = {"shard": sid, "symbol": shard["symbol"], "worker": claims.worker,
+                                 "error": traceback.format_exception_only(type(exc), exc)[-1].strip()}
+                        _write_atomic(os.path.join(job_dir, "errors", f"{sid}.json"),
+                                      lambda p: _write_json(p, error))
+                        stats["failed"] += 1
+                        if verbose:
+                            print(f"[{claims.worker}] shard {sid} {shard['symbol']:<12} error  {error['error']}", flush=True)
+                        continue
+                    if not claims.owns(sid):
+                        if verbose:
+                            print(f"[{claims.worker}] shard {sid} {shard['symbol']:<12} claim taken over, "
+                                  f"result dropped", flush=True)
+                        continue
+                    _write_atomic(os.path.join(job_dir, "results", f"{sid}.pkl"),
+                                  lambda p: table.to_pickle(p, compression=None))
+                    stats["done"] += 1
+                    stats["combos"] += len(table)
+                    if verbose:
+                        print(f"[{claims.worker}] shard {sid} {shard['symbol']:<12} {len(table)} combos "
+                              f"in {time.perf_counter() - t:.2f}s", flush=True)
+                finally:
+                    claims.release(sid)
+            if not pending or not wait:
+                return stats
+            time.sleep(poll)
+    finally:
+        claims.close()
+        stats["seconds"] = time.perf_counter() - t_start
+
+def _run_worker_process(job_dir: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    return run_worker(job_dir, **kwargs)
+
+def run_job(job_dir: str, *, workers: int | None = None, retry_failed: bool = False, **worker_kwargs) -> pd.DataFrame:
+    """Run `workers` local worker processes on job_dir (more may join from other hosts).
+
+    Returns one row of counters per local worker. retry_failed first removes the
+    error files of failed shards so they are attempted again.
+    """
+    if retry_failed:
+        err_dir = os.path.join(job_dir, "errors")
+        for name in os.listdir(err_dir):
+            os.unlink(os.path.join(err_dir, name))
+    workers = max(1, workers or os.cpu_count() or 1)
+    if workers == 1:
+        return pd.DataFrame([run_worker(job_dir, **worker_kwargs)])
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = [ex.submit(_run_worker_process, job_dir, worker_kwargs) for _ in range(workers)]
+        return pd.DataFrame([f.result() for f in futures])
+
+def job_status(job_dir: str) -> Dict[str, int]:
+    """Shard counts: total, done, failed, claimed (running or stale) and pending."""
+    shards = load_job(job_dir)["shards"]
+    done = {n[:-4] for n in os.listdir(os.path.join(job_dir, "results")) if n.endswith(".pkl")}
+    failed = {n[:-5] for n in os.listdir(os.path.join(job_dir, "errors")) if n.endswith(".json")}
+    claimed = {n for n in os.listdir(os.path.join(job_dir, "claims")) if "." not in n}
+    ids = [s["id"] for s in shards]
+    status = {
+        "shards": len(ids),
+        "done": sum(i in done for i in ids),
+        "failed": sum(i in failed and i not in done for i in ids),
+        "claimed": sum(i in claimed and i not in done and i not in failed for i in ids),
+    }
+    status["pending"] = status["shards"] - status["done"] - status["failed"] - status["claimed"]
+    return status
+
+def collect_results(job_dir: str) -> pd.DataFrame:
+    """Concatenate the finished shards (in shard order) into one table."""
+    shards = load_job(job_dir)["shards"]
+    parts = []
+    for s in shards:
+        path = os.path.join(job_dir, "results", f"{s['id']}.pkl")
+        if os.path.exists(path):
+            parts.append(pd.read_pickle(path, compression=None))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def collect_errors(job_dir: str) -> pd.DataFrame:
+    err_dir = os.path.join(job_dir, "errors")
+    rows = []
+    for name in sorted(os.listdir(err_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(err_dir, name), "r", encoding="utf-8") as f:
+                rows.append(json.load(f))
+    return pd.DataFrame(rows, columns=["shard", "symbol", "worker", "error"])
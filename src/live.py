@@ -0,0 +1,296 @@
+from __future__ import annotations
+import datetime as dt
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import Trade
+
+@dataclass
+class Event:
+    time: pd.Timestamp
+    kind: str          # ENTRY / TP1 / EXIT
+    side: str
+    price: float
+    qty: float
+    pnl: float = 0.0
+    reason: str = ""   # EXIT only: STOP / TP2 / FRIDAY
+
+class LiveSweepFade:
+    """Incremental sweep-and-fade engine: feed bars one at a time via `on_bar`.
+
+    Keeps only the current ISO week's Monday high/low, the previous bar and the
+    position state, so each bar costs O(1) time and memory. Trading rules and
+    arithmetic are the same as `backtest_sweep_fade`.
+
+    Differences from the batch backtest, which sees the whole history:
+      - Monday range: on Monday bars the running Monday high/low is used (the batch
+        uses the completed Monday). This only matters for a position still open on
+        a Monday, and only if the running range is still zero on that bar.
+      - Friday close: the batch closes on the last Friday bar by peeking at the next
+        bar. Live, a Friday bar counts as last if the caller says so
+        (`last_friday_bar=True`), otherwise if the bar ends (ts + bar_interval) at or
+        after `friday_cutoff` on that Friday (default midnight, i.e. Saturday 00:00).
+        Without bar_interval, the smallest gap between consecutive bars seen so far is
+        used. `replay_sweep_fade` passes the flag from the next bar, reproducing the batch.
+
+    With a `resolver`, bars whose range spans both an adverse level and a target are
+    replayed over finer bars: resolver(ts) returns the finer OHLC bars covering that
+    bar (or None to keep the stop-first rule). See src.intrabar.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_capital: float = 10_000.0,
+        risk_per_trade: float = 100.0,
+        stop_mult: float = 1.0,
+        tp1_at_mid: bool = True,
+        tp1_frac: float = 0.5,
+        tp2_to_full: float = 1.0,
+        exit_friday_close: bool = True,
+        bar_interval: str | pd.Timedelta | None = None,
+        friday_cutoff: dt.time | None = None,
+        resolver: Optional[Callable[[pd.Timestamp], Optional[pd.DataFrame]]] = None,
+    ):
+        self.risk_per_trade = float(risk_per_trade)
+        self.stop_mult = float(stop_mult)
+        self.tp1_at_mid = bool(tp1_at_mid)
+        self.tp1_frac = float(tp1_frac)
+        self.tp2_to_full = float(tp2_to_full)
+        self.exit_friday_close = bool(exit_friday_close)
+        self.bar_interval = pd.Timedelta(bar_interval) if bar_interval is not None else None
+        self.inferred_interval: Optional[pd.Timedelta] = None  # smallest bar-to-bar gap seen
+        self.last_ts: Optional[pd.Timestamp] = None
+        self.friday_cutoff = friday_cutoff
+        self.resolver = resolver
+        self.ambiguous_bars = 0
+        self.resolved_bars = 0
+
+        self.equity = float(initial_capital)
+        self.trades: List[Trade] = []
+        self.bars_seen = 0
+        self.bar_active = False  # False when the bar had no usable Monday range
+
+        # current week
+        self.week_id: Optional[tuple[int, int]] = None
+        self.mon_high = np.nan
+        self.mon_low = np.nan
+        self.has_traded_week = False
+
+        # previous bar
+        self.prev_high = np.nan
+        self.prev_low = np.nan
+        self.prev_close = np.nan
+
+        # position
+        self.in_pos = False
+        self.side: Optional[str] = None
+        self.entry = 0.0
+        self.entry_time: Optional[pd.Timestamp] = None
+        self.qty = 0.0
+        self.stop = 0.0
+        self.tp1 = 0.0
+        self.tp2 = 0.0
+        self.tp1_taken = False
+
+    @property
+    def position(self) -> float:
+        return (self.qty if self.in_pos else 0.0) * (1 if self.side == "LONG" else (-1 if self.side == "SHORT" else 0))
+
+    def _is_last_friday_bar(self, ts: pd.Timestamp, weekday: int, flag: Optional[bool]) -> bool:
+        if weekday != 4:
+            return False
+        if flag is not None:
+            return bool(flag)
+        step = self.bar_interval if self.bar_interval is not None else self.inferred_interval
+        if step is None:
+            return False
+        cutoff = ts.normalize() + (
+            pd.Timedelta(days=1) if self.friday_cutoff is None
+            else pd.Timedelta(hours=self.friday_cutoff.hour, minutes=self.friday_cutoff.minute)
+        )
+        return ts + step >= cutoff
+
+    def _close(self, ts: pd.Timestamp, exit_px: float, reason: str, events: List[Event]) -> float:
+        side, qty, entry = self.side, self.qty, self.entry
+        pnl = (exit_px - entry) * qty if side == "LONG" else (entry - exit_px) * qty
+        self.equity += pnl
+        # same layout as the batch trade log (entry_time is the exit bar there too)
+        self.trades.append(Trade(entry_time=ts, exit_time=ts, side=side, entry=entry, exit=exit_px,
+                                 qty=qty, pnl=pnl, reason=reason, week_id=self.week_id))
+        events.append(Event(ts, "EXIT", side, exit_px, qty, pnl, reason))
+        self.in_pos = False
+        self.qty = 0.0
+        return pnl
+
+    def _is_ambiguous(self, high: float, low: float) -> bool:
+        """True if the bar reaches both an adverse level and a target, so the order matters.
+
+        Adverse levels are the stop and, while TP1 is pending, the entry (the stop moves
+        there once TP1 fills).
+        """
+        tp1_pending = self.tp1_at_mid and not self.tp1_taken
+        if self.side == "LONG":
+            hits_target = high >= (self.tp1 if tp1_pending else self.tp2)
+            return hits_target and (low <= self.stop or (tp1_pending and low <= self.entry))
+        hits_target = low <= (self.tp1 if tp1_pending else self.tp2)
+        return hits_target and (high >= self.stop or (tp1_pending and high >= self.entry))
+
+    def _manage_exits(self, ts: pd.Timestamp, high: float, low: float, events: List[Event]) -> None:
+        """Stop, then TP1 (moving the stop to breakeven), then TP2 against one bar's range."""
+        if not (self.in_pos and self.qty > 0):
+            return
+        long = self.side == "LONG"
+        if (low <= self.stop) if long else (high >= self.stop):
+            self.bar_pnl += self._close(ts, self.stop, "STOP", events)
+
+        if self.in_pos and self.tp1_at_mid and (not self.tp1_taken):
+            if (high >= self.tp1) if long else (low <= self.tp1):
+                exit_qty = self.qty * self.tp1_frac
+                pnl = (self.tp1 - self.entry) * exit_qty if long else (self.entry - self.tp1) * exit_qty
+                self.equity += pnl
+                self.bar_pnl += pnl
+                self.qty = self.qty - exit_qty
+                self.tp1_taken = True
+                self.stop = self.entry  # breakeven after TP1
+                events.append(Event(ts, "TP1", self.side, self.tp1, exit_qty, pnl))
+
+        if self.in_pos and self.qty > 0:
+            if (high >= self.tp2) if long else (low <= self.tp2):
+                self.bar_pnl += self._close(ts, self.tp2, "TP2", events)
+
+    def on_bar(
+        self,
+        ts,
+        open: float,
+        high: float,
+        low: float,
+        close: float,
+        last_friday_bar: Optional[bool] = None,
+    ) -> List[Event]:
+        """Process one completed bar; returns the entry/exit events it produced.
+
+        After the call, `equity`, `position` and `bar_pnl` reflect the bar's close.
+        """
+        ts = pd.Timestamp(ts)
+        iso = ts.isocalendar()
+        weekday = ts.weekday()
+        events: List[Event] = []
+        self.bar_pnl = 0.0
+        if self.last_ts is not None and ts > self.last_ts:
+            gap = ts - self.last_ts
+            if self.inferred_interval is None or gap < self.inferred_interval:
+                self.inferred_interval = gap
+        self.last_ts = ts
+
+        curr_week = (int(iso[0]), int(iso[1]))
+        if curr_week != self.week_id:
+            self.week_id = curr_week
+            self.has_traded_week = False
+            self.mon_high = np.nan
+            self.mon_low = np.nan
+        if weekday == 0:
+            self.mon_high = high if not (self.mon_high >= high) else self.mon_high
+            self.mon_low = low if not (self.mon_low <= low) else self.mon_low
+
+        first_bar = self.bars_seen == 0
+        self.bars_seen += 1
+        mon_high, mon_low = self.mon_high, self.mon_low
+        rng = mon_high - mon_low
+        self.bar_active = not (first_bar or np.isnan(mon_high) or np.isnan(mon_low) or rng <= 0)
+
+        if self.bar_active:
+            mon_mid = (mon_high + mon_low) / 2.0
+            is_last_friday_bar = self._is_last_friday_bar(ts, weekday, last_friday_bar)
+
+            # --- Entry: first valid signal, Tue-Thu only ---
+            if (not self.in_pos) and weekday > 0 and (not self.has_traded_week) and weekday < 4:
+                long_signal = (self.prev_low < mon_low) and (self.prev_close > mon_low)
+                short_signal = (self.prev_high > mon_high) and (self.prev_close < mon_high)
+
+                if long_signal or short_signal:
+                    side = "LONG" if long_signal else "SHORT"
+                    entry = float(open)
+                    if side == "LONG":
+                        stop = float(mon_low - self.stop_mult * rng)
+                        tp2 = float(mon_high if self.tp2_to_full >= 1.0 else mon_mid + self.tp2_to_full * (mon_high - mon_mid))
+                        dist = abs(entry - stop)
+                    else:
+                        stop = float(mon_high + self.stop_mult * rng)
+                        tp2 = float(mon_low if self.tp2_to_full >= 1.0 else mon_mid - self.tp2_to_full * (mon_mid - mon_low))
+                        dist = abs(stop - entry)
+                    self.side, self.entry, self.stop, self.tp1, self.tp2 = side, entry, stop, float(mon_mid), tp2
+
+                    self.qty = (self.risk_per_trade / dist) if dist > 0 else 0.0
+                    if self.qty > 0:
+                        self.in_pos = True
+                        self.tp1_taken = False
+                        self.has_traded_week = True
+                        self.entry_time = ts
+                        events.append(Event(ts, "ENTRY", side, entry, self.qty))
+
+            # --- Manage exits ---
+            if self.in_pos and self.qty > 0:
+                path = None
+                if self.resolver is not None and self._is_ambiguous(high, low):
+                    self.ambiguous_bars += 1
+                    path = self.resolver(ts)
+                    if path is not None and len(path):
+                        self.resolved_bars += 1
+                    else:
+                        path = None
+                if path is None:
+                    self._manage_exits(ts, high, low, events)
+                else:
+                    # walk the finer bars in order; each one uses the usual stop-first rule
+                    for sub_high, sub_low in zip(path["high"].to_numpy(dtype=np.float64).tolist(),
+                                                 path["low"].to_numpy(dtype=np.float64).tolist()):
+                        if not (self.in_pos and self.qty > 0):
+                            break
+                        self._manage_exits(ts, sub_high, sub_low, events)
+
+                if self.in_pos and self.qty > 0 and self.exit_friday_close and is_last_friday_bar:
+                    self.bar_pnl += self._close(ts, float(close), "FRIDAY", events)
+
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+        return events
+
+def replay_sweep_fade(df: pd.DataFrame, **params) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Feed historical OHLC bars through LiveSweepFade.
+
+    The Friday flag is taken from the next bar's weekday, exactly as the batch
+    backtest does, so the trade log matches `backtest_sweep_fade` on the same bars.
+
+    Returns:
+      - df_out: df plus equity/position/trade_pnl columns (position is 0 on bars
+        without a usable Monday range, as in the batch output)
+      - trades: trade log
+    """
+    return replay(LiveSweepFade(**params), df)
+
+def replay(engine: LiveSweepFade, df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """replay_sweep_fade with a caller-built engine (so its counters stay inspectable)."""
+    n = len(df)
+    equity = np.full(n, np.nan)
+    position = np.zeros(n)
+    trade_pnl = np.zeros(n)
+
+    index = df.index
+    weekday = index.weekday
+    cols = [df[c].to_numpy(dtype=np.float64).tolist() for c in ("open", "high", "low", "close")]
+    for i, (o, h, l, c) in enumerate(zip(*cols)):
+        last_friday = weekday[i] == 4 and (i == n - 1 or weekday[i + 1] != 4)
+        engine.on_bar(index[i], o, h, l, c, last_friday_bar=bool(last_friday))
+        equity[i] = engine.equity
+        if engine.bar_active:
+            position[i] = engine.position
+            trade_pnl[i] = engine.bar_pnl
+
+    out = df.copy()
+    out["equity"] = equity
+    out["position"] = position
+    out["trade_pnl"] = trade_pnl
+    return out, pd.DataFrame([t.__dict__ for t in engine.trades])
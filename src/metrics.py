@@ -1,7 +1,20 @@
 from __future__ import annotations
+from typing import Dict, Sequence
+
 import pandas as pd
 import numpy as np
 
+def bars_per_year_from_interval(interval: str) -> float:
+    # crude mapping for Sharpe annualisation
+    interval = interval.lower().strip()
+    if interval.endswith("h"):
+        hours = float(interval[:-1])
+        return 365.0 * 24.0 / hours
+    if interval.endswith("d"):
+        days = float(interval[:-1])
+        return 365.0 / days
+    return 365.0 * 24.0 / 4.0  # fallback
+
 def equity_metrics(equity: pd.Series, bars_per_year: float) -> dict:
     eq = equity.dropna()
     if len(eq) < 3:
@@ -23,6 +36,141 @@ def equity_metrics(equity: pd.Series, bars_per_year: float) -> dict:
         "max_drawdown": max_dd,
     }
 
+CURVE_STATS = (
+    "final_equity", "total_return", "sharpe", "sortino", "max_drawdown",
+    "max_drawdown_duration", "calmar", "ulcer_index",
+)
+
+def _curve_stats(eq: np.ndarray, bars_per_year: float) -> Dict[str, np.ndarray]:
+    """CURVE_STATS along the last axis of `eq` (no NaNs, >= 3 bars) for every leading index.
+
+    final_equity, total_return, sharpe and max_drawdown follow equity_metrics operation
+    for operation (same summation order), so they match it exactly. Additionally:
+      - sortino: mean return over downside deviation sqrt(mean(min(r, 0)^2)), annualised
+      - max_drawdown_duration: longest run of bars below the running peak
+      - calmar: annualised growth rate over |max_drawdown| (NaN without a drawdown)
+      - ulcer_index: root mean square drawdown (a fraction, like max_drawdown)
+    """
+    n = eq.shape[-1]
+    rets = np.zeros(eq.shape)
+    rets[..., 1:] = eq[..., 1:] / eq[..., :-1] - 1.0
+
+    mean = rets.sum(axis=-1, dtype=np.float64) / n
+    vol = np.sqrt(((mean[..., None] - rets) ** 2).sum(axis=-1, dtype=np.float64) / (n - 1))
+    ann = np.sqrt(bars_per_year)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(vol > 0, (mean / vol) * ann, 0.0)
+        downside = np.sqrt((np.minimum(rets, 0.0) ** 2).sum(axis=-1, dtype=np.float64) / n)
+        sortino = np.where(downside > 0, (mean / downside) * ann, 0.0)
+
+    peak = np.maximum.accumulate(eq.T, axis=0).T  # along the strided axis: same result, faster
+    dd = (eq - peak) / peak
+    max_dd = dd.min(axis=-1)
+    ulcer = np.sqrt((dd ** 2).sum(axis=-1, dtype=np.float64) / n)
+
+    idx = np.arange(n)
+    last_peak = np.maximum.accumulate(np.where(eq >= peak, idx, 0).T, axis=0).T
+    duration = (idx - last_peak).max(axis=-1)
+
+    first, last = eq[..., 0], eq[..., -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = (last / first) ** (bars_per_year / (n - 1)) - 1.0
+        calmar = np.where(max_dd < 0, cagr / -max_dd, np.nan)
+
+    return {
+        "final_equity": last.astype(np.float64),
+        "total_return": last / first - 1.0,
+        "sharpe": sharpe,
+        "sortino": sortino,
+        "max_drawdown": max_dd,
+        "max_drawdown_duration": duration,
+        "calmar": calmar,
+        "ulcer_index": ulcer,
+    }
+
+def curve_metrics(equity: np.ndarray, bars_per_year: float) -> dict:
+    """CURVE_STATS of one equity array as plain floats ({} if fewer than 3 non-NaN bars)."""
+    eq = np.asarray(equity, dtype=np.float64)
+    eq = eq[~np.isnan(eq)]
+    if len(eq) < 3:
+        return {}
+    stats = _curve_stats(eq, bars_per_year)
+    out = {k: float(v) for k, v in stats.items()}
+    out["max_drawdown_duration"] = int(stats["max_drawdown_duration"])
+    return out
+
+def batch_equity_metrics(
+    curves,
+    *,
+    bars_per_year: float,
+    index: Sequence | None = None,
+    max_cells: int = 1 << 18,
+) -> pd.DataFrame:
+    """CURVE_STATS for many equity curves at once: one row per curve (runs x bars input).
+
+    Rows are processed in blocks of about `max_cells` values to bound temporaries.
+    Curves containing NaNs (e.g. a warm-up) are handled one by one after dropping them;
+    curves with fewer than 3 bars get NaN rows. Shared fields equal equity_metrics.
+    """
+    curves = np.asarray(curves, dtype=np.float64)
+    if curves.ndim == 1:
+        curves = curves[None, :]
+    runs, n = curves.shape
+    out = {k: np.full(runs, np.nan) for k in CURVE_STATS}
+
+    has_nan = np.isnan(curves).any(axis=1)
+    clean = np.flatnonzero(~has_nan)
+    if n >= 3 and len(clean):
+        step = max(max_cells // max(n, 1), 1)
+        for lo in range(0, len(clean), step):
+            rows = clean[lo:lo + step]
+            block = np.ascontiguousarray(curves[rows])
+            for k, v in _curve_stats(block, bars_per_year).items():
+                out[k][rows] = v
+    for r in np.flatnonzero(has_nan):
+        for k, v in curve_metrics(curves[r], bars_per_year).items():
+            out[k][r] = v
+
+    table = pd.DataFrame(out, index=index)
+    if table["max_drawdown_duration"].notna().all():
+        table["max_drawdown_duration"] = table["max_drawdown_duration"].astype(np.int64)
+    return table
+
+def rolling_equity_metrics(
+    curves,
+    *,
+    window: int,
+    bars_per_year: float,
+    step: int = 1,
+    max_cells: int = 1 << 18,
+) -> pd.DataFrame:
+    """CURVE_STATS over trailing windows of `window` returns, evaluated every `step` bars.
+
+    Each window spans window + 1 equity values ending at bar `end`. Windows are strided
+    views of the input, computed in blocks of about `max_cells` values. Returns a long
+    table indexed by (run, end). Curves must not contain NaNs.
+    """
+    curves = np.asarray(curves, dtype=np.float64)
+    if curves.ndim == 1:
+        curves = curves[None, :]
+    if window < 2:
+        raise ValueError("window must be >= 2")
+    runs, n = curves.shape
+    views = np.lib.stride_tricks.sliding_window_view(curves, window + 1, axis=1)[:, ::step]
+    n_windows = views.shape[1]
+    ends = np.arange(n_windows) * step + window
+
+    out = {k: np.empty((runs, n_windows)) for k in CURVE_STATS}
+    per_block = max(max_cells // ((window + 1) * max(runs, 1)), 1)
+    for lo in range(0, n_windows, per_block):
+        for k, v in _curve_stats(views[:, lo:lo + per_block], bars_per_year).items():
+            out[k][:, lo:lo + per_block] = v
+
+    index = pd.MultiIndex.from_product([np.arange(runs), ends], names=["run", "end"])
+    table = pd.DataFrame({k: v.ravel() for k, v in out.items()}, index=index)
+    table["max_drawdown_duration"] = table["max_drawdown_duration"].astype(np.int64)
+    return table
+
 def trade_metrics(trades: pd.DataFrame) -> dict:
     if trades is None or trades.empty:
         return {"num_trades": 0}
@@ -36,3 +184,11 @@ def trade_metrics(trades: pd.DataFrame) -> dict:
         "profit_factor": float(pnl[pnl > 0].sum() / abs(pnl[pnl < 0].sum())) if (pnl[pnl < 0].sum() != 0) else float("inf"),
         "by_reason": trades["reason"].value_counts().to_dict(),
     }
+
+def flatten_trade_metrics(tm: dict, reasons=("STOP", "TP2", "FRIDAY")) -> dict:
+    """trade_metrics with by_reason expanded into n_stop/n_tp2/n_friday columns (for tables)."""
+    flat = {k: v for k, v in tm.items() if k != "by_reason"}
+    by_reason = tm.get("by_reason", {})
+    for reason in reasons:
+        flat[f"n_{reason.lower()}"] = int(by_reason.get(reason, 0))
+    return flat
@@ -0,0 +1,240 @@
+from __future__ import annotations
+import datetime as dt
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import trades_from_arrays
+from src.cache import BarStore
+from src.engine import HAS_NUMBA, initial_state, sweep_fade_chunk, sweep_signals
+from src.features import week_offsets
+from src.metrics import trade_metrics
+from src.profiling import stage
+from src.research import signal_outcomes, summarize_research
+
+_DAY_NS = 86_400 * 10**9
+
+@dataclass
+class WeekChunk:
+    """Whole ISO weeks of bars with their Monday range features, read from the bar cache."""
+    start: int                    # row of the chunk's first bar within the streamed window
+    index: pd.DatetimeIndex
+    arrays: Dict[str, np.ndarray]  # engine.FEATURE_COLUMNS + long_sig/short_sig
+    next_weekday: int             # weekday of the bar after the chunk (-1 at the end)
+
+def week_features(ts: np.ndarray, ohlc: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """add_monday_range for whole ISO weeks, as feature_arrays output.
+
+    ts is int64 ns. Weeks are Monday 00:00 based, so the weekday and ISO week follow
+    from the day number; the Monday high/low is a per-week reduction over Monday bars
+    (NaN for a week without any).
+    """
+    day = ts // _DAY_NS
+    weekday = (day + 3) % 7  # 1970-01-01 was a Thursday
+    week = (day + 3) // 7
+    starts, ends = week_offsets(week, week)
+    counts = ends - starts
+
+    iso = [(dt.date(1970, 1, 1) + dt.timedelta(days=int(w) * 7 - 3)).isocalendar() for w in week[starts]]
+    iso_year = np.repeat(np.array([i[0] for i in iso], dtype=np.int64), counts)
+    iso_week = np.repeat(np.array([i[1] for i in iso], dtype=np.int64), counts)
+
+    monday = weekday == 0
+    with np.errstate(invalid="ignore"):
+        mon_high = np.repeat(np.fmax.reduceat(np.where(monday, ohlc["high"], np.nan), starts), counts)
+        mon_low = np.repeat(np.fmin.reduceat(np.where(monday, ohlc["low"], np.nan), starts), counts)
+    out = {c: np.ascontiguousarray(ohlc[c], dtype=np.float64) for c in ("open", "high", "low", "close")}
+    out.update(
+        weekday=weekday, iso_year=iso_year, iso_week=iso_week,
+        mon_high=mon_high, mon_low=mon_low,
+        mon_mid=(mon_high + mon_low) / 2.0, mon_range=mon_high - mon_low,
+        is_tradeable=weekday > 0,
+    )
+    return out
+
+def iter_week_chunks(
+    store: BarStore,
+    symbol: str,
+    interval: str,
+    *,
+    start: str | pd.Timestamp | None = None,
+    end: str | pd.Timestamp | None = None,
+    weeks: int = 1,
+) -> Iterator[WeekChunk]:
+    """Stream cached bars in [start, end) as chunks of `weeks` whole ISO weeks.
+
+    Only the memory-mapped index is searched to find week boundaries; each chunk's
+    columns are copied out of the files when it is produced, so memory holds one
+    chunk at a time regardless of history length. Monday range features and sweep
+    signals only look within their ISO week, so per-chunk values equal those of
+    add_monday_range + sweep_signals over the whole frame.
+    """
+    cols = store.columns(symbol, interval)
+    if cols is None:
+        raise FileNotFoundError(f"No cached {interval} bars for {symbol} under {store.root}")
+    ts = cols["index"]
+    lo = 0 if start is None else int(np.searchsorted(ts, pd.Timestamp(start).value, side="left"))
+    hi = len(ts) if end is None else int(np.searchsorted(ts, pd.Timestamp(end).value, side="left"))
+    week_ns = 7 * _DAY_NS
+    weeks = max(int(weeks), 1)
+
+    s = lo
+    while s < hi:
+        # the first bar at or after Monday 00:00 `weeks` weeks after this bar's week
+        week = (int(ts[s]) // _DAY_NS + 3) // 7
+        boundary = (week + weeks) * week_ns - 3 * _DAY_NS
+        e = min(int(np.searchsorted(ts, boundary, side="left")), hi)
+        chunk_ts = np.array(ts[s:e])
+        arrays = week_features(chunk_ts, {c: np.array(cols[c][s:e]) for c in ("open", "high", "low", "close")})
+        arrays["long_sig"], arrays["short_sig"] = sweep_signals(arrays)
+        next_weekday = int((int(ts[e]) // _DAY_NS + 3) % 7) if e < hi else -1
+        yield WeekChunk(s - lo, pd.DatetimeIndex(chunk_ts.view("M8[ns]")), arrays, next_weekday)
+        s = e
+
+class _EquityStats:
+    """equity_metrics accumulated chunk by chunk (pairwise-merged mean/variance of returns)."""
+
+    def __init__(self):
+        self.first = self.last = self.peak = None
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.max_dd = 0.0
+
+    def update(self, eq: np.ndarray) -> None:
+        if not len(eq):
+            return
+        prev = np.r_[eq[0] if self.last is None else self.last, eq[:-1]]
+        rets = eq / prev - 1.0
+        if self.first is None:
+            self.first = float(eq[0])
+            self.peak = float(eq[0])
+        m = len(rets)
+        mean = float(rets.mean())
+        m2 = float(((rets - mean) ** 2).sum())
+        total = self.n + m
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.n * m / total
+        self.mean += delta * m / total
+        self.n = total
+        peak = np.maximum.accumulate(np.r_[self.peak, eq])[1:]
+        self.max_dd = min(self.max_dd, float(((eq - peak) / peak).min()))
+        self.peak = float(peak[-1])
+        self.last = float(eq[-1])
+
+    def metrics(self, bars_per_year: float) -> Dict[str, float]:
+        if self.n < 3:
+            return {}
+        vol = math.sqrt(self.m2 / (self.n - 1))
+        return {
+            "final_equity": self.last,
+            "total_return": self.last / self.first - 1.0,
+            "sharpe": (self.mean / vol) * math.sqrt(bars_per_year) if vol > 0 else 0.0,
+            "max_drawdown": self.max_dd,
+        }
+
+@dataclass
+class OutOfCoreResult:
+    signals: pd.DataFrame             # analyze_weekly_sweep_signals table
+    summary: Dict[str, Any]           # summarize_research
+    trades: pd.DataFrame              # backtest trade log
+    weekly_equity: pd.Series          # equity at the last bar of each chunk
+    metrics: Dict[str, Any] = field(default_factory=dict)  # {"equity": ..., "trades": ...}
+    bars: int = 0
+    equity_path: str | None = None    # per-bar equity .npy, when requested
+
+def run_out_of_core(
+    chunks: Iterator[WeekChunk],
+    *,
+    bars_per_year: float,
+    initial_capital: float = 10_000.0,
+    risk_per_trade: float = 100.0,
+    stop_mult: float = 1.0,
+    tp1_at_mid: bool = True,
+    tp1_frac: float = 0.5,
+    tp2_to_full: float = 1.0,
+    exit_friday_close: bool = True,
+    use_numba: bool | None = None,
+    equity_path: str | None = None,
+    total_bars: int | None = None,
+) -> OutOfCoreResult:
+    """Research + backtest over a stream of week chunks (see iter_week_chunks) in one pass.
+
+    Per chunk, the research outcome rows are computed and the kernel continues from the
+    state left by the previous chunk (equity, open position, current week), so the
+    signals, trade log and equity equal the in-memory run_pipeline. Only the outputs
+    grow with history: the signal and trade rows, one equity point per chunk and the
+    streaming equity metrics. With equity_path (and total_bars) the per-bar equity is
+    also written to a .npy file through a memory map.
+    """
+    if use_numba is None:
+        use_numba = HAS_NUMBA
+    params = (
+        float(risk_per_trade), float(stop_mult), bool(tp1_at_mid),
+        float(tp1_frac), float(tp2_to_full), bool(exit_friday_close),
+    )
+    state = initial_state(initial_capital)
+    equity_out = None
+    if equity_path is not None:
+        if total_bars is None:
+            raise ValueError("equity_path needs total_bars to size the file")
+        equity_out = np.lib.format.open_memmap(equity_path, mode="w+", dtype=np.float64, shape=(total_bars,))
+
+    signal_rows: List[Dict[str, Any]] = []
+    trade_parts: List[pd.DataFrame] = []
+    week_ends: List[pd.Timestamp] = []
+    week_equity: List[float] = []
+    stats = _EquityStats()
+    bars = 0
+    with stage("out_of_core") as st:
+        for chunk in chunks:
+            a = chunk.arrays
+            outcomes = signal_outcomes(chunk.index, a)
+            signal_rows.extend(outcomes.to_dict("records"))
+
+            eq, _, _, trades = sweep_fade_chunk(a, [a["long_sig"], a["short_sig"]], chunk.next_weekday, params,
+                                                state, use_numba=use_numba)
+            eq = np.asarray(eq, dtype=np.float64)
+            if len(trades):
+                res = {
+                    "num_trades": len(trades), "trade_index": trades["exit_index"], "trade_side": trades["side"],
+                    "trade_entry": trades["entry"], "trade_exit": trades["exit"], "trade_qty": trades["qty"],
+                    "trade_pnl_closed": trades["pnl"], "trade_reason": trades["reason"],
+                }
+                trade_parts.append(trades_from_arrays(chunk.index, res, a["iso_year"], a["iso_week"]))
+            stats.update(eq)
+            if equity_out is not None:
+                equity_out[chunk.start:chunk.start + len(eq)] = eq
+            if len(eq):
+                week_ends.append(chunk.index[-1])
+                week_equity.append(float(eq[-1]))
+            bars += len(eq)
+        st.rows = bars
+    if equity_out is not None:
+        equity_out.flush()
+        del equity_out
+
+    signals = pd.DataFrame(signal_rows)  # built like signal_outcomes, so dtypes match
+    trades = pd.concat(trade_parts, ignore_index=True) if trade_parts else pd.DataFrame()
+    return OutOfCoreResult(
+        signals=signals,
+        summary=summarize_research(signals),
+        trades=trades,
+        weekly_equity=pd.Series(week_equity, index=pd.DatetimeIndex(week_ends), name="equity"),
+        metrics={"equity": stats.metrics(bars_per_year), "trades": trade_metrics(trades)},
+        bars=bars,
+        equity_path=equity_path,
+    )
+
+def cached_rows(store: BarStore, symbol: str, interval: str, start=None, end=None) -> int:
+    """Number of cached bars in [start, end) (from the memory-mapped index only)."""
+    cols = store.columns(symbol, interval)
+    if cols is None:
+        return 0
+    ts = cols["index"]
+    lo = 0 if start is None else int(np.searchsorted(ts, pd.Timestamp(start).value, side="left"))
+    hi = len(ts) if end is None else int(np.searchsorted(ts, pd.Timestamp(end).value, side="left"))
+    return max(hi - lo, 0)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterable, List
+
+import pandas as pd
+
+from src.anchors import Anchor, anchor_ranges
+from src.backtest import trades_from_arrays
+from src.engine import feature_arrays, run_sweep_fade, sweep_signals
+from src.metrics import equity_metrics, trade_metrics, flatten_trade_metrics
+from src.profiling import stage
+from src.research import signal_outcomes, summarize_research
+
+@dataclass
+class PipelineResult:
+    signals: pd.DataFrame             # analyze_weekly_sweep_signals table
+    summary: Dict[str, Any]           # summarize_research
+    equity: pd.Series                 # backtest equity per bar
+    trades: pd.DataFrame              # backtest trade log
+    metrics: Dict[str, Any] = field(default_factory=dict)  # {"equity": ..., "trades": ...}
+
+def run_pipeline(
+    df: pd.DataFrame,
+    *,
+    bars_per_year: float,
+    initial_capital: float = 10_000.0,
+    risk_per_trade: float = 100.0,
+    stop_mult: float = 1.0,
+    tp1_at_mid: bool = True,
+    tp1_frac: float = 0.5,
+    tp2_to_full: float = 1.0,
+    exit_friday_close: bool = True,
+) -> PipelineResult:
+    """Research + backtest from one set of feature arrays (df: output of add_monday_range).
+
+    The frame is converted to arrays once and sweep signals are detected once; the
+    research outcome table and the backtest state machine both consume them. The
+    backtest does not copy the feature frame, only the equity curve is kept.
+    Results equal analyze_weekly_sweep_signals + backtest_sweep_fade on the same frame.
+    """
+    n = len(df)
+    with stage("signals", rows=n):
+        arrays = feature_arrays(df)
+        arrays["long_sig"], arrays["short_sig"] = sweep_signals(arrays)
+    return _run_arrays(
+        df.index, arrays,
+        bars_per_year=bars_per_year,
+        initial_capital=initial_capital,
+        risk_per_trade=risk_per_trade,
+        stop_mult=stop_mult,
+        tp1_at_mid=tp1_at_mid,
+        tp1_frac=tp1_frac,
+        tp2_to_full=tp2_to_full,
+        exit_friday_close=exit_friday_close,
+    )
+
+def _run_arrays(index: pd.Index, arrays: Dict[str, Any], *, bars_per_year: float, **params) -> PipelineResult:
+    """Research, backtest and metrics from feature arrays that already carry the signals."""
+    n = len(index)
+    with stage("research", rows=n):
+        signals = signal_outcomes(index, arrays)
+        summary = summarize_research(signals)
+
+    with stage("backtest", rows=n):
+        res = run_sweep_fade(arrays, **params)
+        trades = trades_from_arrays(index, res, arrays["iso_year"], arrays["iso_week"])
+        equity = pd.Series(res["equity"], index=index, name="equity")
+
+    with stage("metrics", rows=n):
+        metrics = {
+            "equity": equity_metrics(equity, bars_per_year=bars_per_year),
+            "trades": trade_metrics(trades),
+        }
+    return PipelineResult(signals=signals, summary=summary, equity=equity, trades=trades, metrics=metrics)
+
+def compare_anchors(
+    df: pd.DataFrame,
+    anchors: Iterable[str | Anchor],
+    *,
+    bars_per_year: float,
+    **params,
+) -> pd.DataFrame:
+    """Research + backtest once per anchor definition (see src.anchors), one row each.
+
+    df is an add_monday_range frame. All anchor ranges come from one anchor_ranges
+    pass and share the frame's arrays; per anchor only the range columns, signals,
+    research scan and backtest are recomputed. params go to run_sweep_fade.
+
+    Columns: anchor, research_* (summarize_research), equity metrics and flattened
+    trade metrics.
+    """
+    n = len(df)
+    with stage("anchors", rows=n):
+        ranges = anchor_ranges(df, anchors)
+        base = feature_arrays(df)
+    rows: List[Dict[str, Any]] = []
+    for name in ranges.names:
+        with stage(f"anchor_{name}", rows=n):
+            result = _run_arrays(df.index, ranges.arrays(base, name), bars_per_year=bars_per_year, **params)
+        row: Dict[str, Any] = {"anchor": name}
+        row.update({f"research_{k}": v for k, v in result.summary.items()})
+        row.update(result.metrics["equity"])
+        row.update(flatten_trade_metrics(result.metrics["trades"]))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def write_outputs(
+    result: PipelineResult,
+    *,
+    out_csv: str,
+    out_json: str,
+    out_trades: str,
+    out_metrics: str,
+) -> None:
+    """Write the same files research_monday_range.py and backtest_monday_range.py produce."""
+    result.signals.to_csv(out_csv, index=False)
+    with open(out_json, "w", encoding="utf-8") as f:
+        json.dump(result.summary, f, indent=2)
+    result.trades.to_csv(out_trades, index=False)
+    with open(out_metrics, "w", encoding="utf-8") as f:
+        json.dump(result.metrics, f, indent=2)
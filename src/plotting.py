@@ -0,0 +1,182 @@
+from __future__ import annotations
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+from matplotlib.figure import Figure
+from matplotlib.ticker import AutoLocator, ScalarFormatter
+
+_NS_PER_DAY = 86_400 * 10**9
+
+def minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Indices of the first, min, max and last point of each of `n_buckets` equal buckets.
+
+    Keeps every extreme, so drawdowns and spikes survive at any zoom-out; at most
+    4 * n_buckets points. NaNs are ignored.
+    """
+    n = len(y)
+    if n <= 4 * n_buckets:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    pad = n_buckets * size - n
+    lo = np.concatenate([np.where(np.isnan(y), np.inf, y), np.full(pad, np.inf)]).reshape(n_buckets, size)
+    hi = np.concatenate([np.where(np.isnan(y), -np.inf, y), np.full(pad, -np.inf)]).reshape(n_buckets, size)
+    starts = np.arange(n_buckets) * size
+    idx = np.concatenate([
+        starts,
+        starts + lo.argmin(axis=1),
+        starts + hi.argmax(axis=1),
+        np.minimum(starts + size, n) - 1,
+    ])
+    return np.unique(idx)
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: `n_out` indices that best preserve the visual shape.
+
+    Loops over output buckets (not bars); each bucket is scored with array operations.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nxt_lo, nxt_hi = hi, (edges[b + 2] if b + 2 < len(edges) else n)
+        cx = x[nxt_lo:nxt_hi].mean()
+        cy = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    return out
+
+def decimate(series: pd.Series, max_points: int = 4000, method: str = "minmax") -> Tuple[np.ndarray, np.ndarray]:
+    """(x, y) with at most ~max_points points: x in matplotlib date units (days since 1970)
+    for a DatetimeIndex, else positions; NaNs dropped."""
+    s = series.dropna()
+    if isinstance(s.index, pd.DatetimeIndex):
+        idx = s.index.tz_localize(None) if s.index.tz is not None else s.index
+        x = idx.as_unit("ns").asi8 / _NS_PER_DAY
+    else:
+        x = np.arange(len(s), dtype=np.float64)
+    y = s.to_numpy(dtype=np.float64)
+    if method == "minmax":
+        keep = minmax_indices(y, max(max_points // 4, 1))
+    elif method == "lttb":
+        keep = lttb_indices(x, y, max_points)
+    elif method == "none":
+        return x, y
+    else:
+        raise ValueError(f"Unknown method: {method!r} (expected 'minmax', 'lttb' or 'none')")
+    return x[keep], y[keep]
+
+class EquityRenderer:
+    """Reusable Agg figure for equity curves (no pyplot state, safe in worker processes).
+
+    Successive render() calls update the same line and axes instead of building a
+    new figure, so the per-plot cost is the PNG encode plus the decimated points.
+    """
+
+    def __init__(self, figsize: Tuple[float, float] = (6.4, 4.8), dpi: int = 150):
+        self.dpi = dpi
+        self.fig = Figure(figsize=figsize)
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        (self.line,) = self.ax.plot([], [])
+        self.ax.set_xlabel("Time")
+        self.ax.set_ylabel("Equity")
+        self._dates = None
+
+    def render(self, x: np.ndarray, y: np.ndarray, path, *, title: str = "", dates: bool = True):
+        """Draw (x, y) and save a PNG to `path` (a file name or binary file object)."""
+        if dates != self._dates:
+            if dates:
+                locator = AutoDateLocator()
+                self.ax.xaxis.set_major_locator(locator)
+                self.ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+            else:
+                self.ax.xaxis.set_major_locator(AutoLocator())
+                self.ax.xaxis.set_major_formatter(ScalarFormatter())
+            self._dates = dates
+        self.line.set_data(x, y)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.ax.set_title(title)
+        self.fig.tight_layout()
+        if isinstance(path, str):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.fig.savefig(path, dpi=self.dpi)
+        return path
+
+def render_equity(
+    equity: pd.Series,
+    path,
+    *,
+    title: str = "",
+    max_points: int = 4000,
+    method: str = "minmax",
+    renderer: EquityRenderer | None = None,
+):
+    """Decimate `equity` and save it as a PNG.
+
+    Draws at most ~max_points points whatever the bar count; reuses this process's
+    shared renderer unless one is given.
+    """
+    x, y = decimate(equity, max_points=max_points, method=method)
+    renderer = renderer or _shared_renderer()
+    return renderer.render(x, y, path, title=title, dates=isinstance(equity.index, pd.DatetimeIndex))
+
+# one reused figure per process (the CLI, or each worker of render_many / run_universe)
+_RENDERER: Dict[str, Any] = {}
+
+def _shared_renderer() -> EquityRenderer:
+    renderer = _RENDERER.get("fig")
+    if renderer is None:
+        renderer = _RENDERER["fig"] = EquityRenderer()
+    return renderer
+
+def _render_chunk(jobs: List[Tuple[np.ndarray, np.ndarray, str, str, bool]]) -> List[str]:
+    renderer = _shared_renderer()
+    return [renderer.render(x, y, path, title=title, dates=dates) for x, y, path, title, dates in jobs]
+
+def render_many(
+    curves: Dict[str, pd.Series] | Iterable[Tuple[str, pd.Series]],
+    out_dir: str,
+    *,
+    title: str = "Equity curve: {name}",
+    max_points: int = 4000,
+    method: str = "minmax",
+    workers: int | None = None,
+    chunksize: int = 16,
+) -> List[str]:
+    """Render one PNG per named equity curve into out_dir/<name>.png.
+
+    Curves are decimated in the calling process (so only a few thousand points per
+    curve are sent to workers), then rendered on `workers` processes, each reusing
+    one figure. workers=1 renders in-process. Returns the written paths in input order.
+    """
+    items = list(curves.items()) if isinstance(curves, dict) else list(curves)
+    jobs = []
+    for name, eq in items:
+        x, y = decimate(eq, max_points=max_points, method=method)
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", str(name))
+        jobs.append((x, y, os.path.join(out_dir, f"{safe}.png"), title.format(name=name),
+                     isinstance(eq.index, pd.DatetimeIndex)))
+    os.makedirs(out_dir, exist_ok=True)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    chunks = [jobs[i:i + chunksize] for i in range(0, len(jobs), chunksize)]
+    if workers == 1:
+        return [p for chunk in chunks for p in _render_chunk(chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return [p for paths in ex.map(_render_chunk, chunks) for p in paths]
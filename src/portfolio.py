@@ -0,0 +1,286 @@
+from __future__ import annotations
+import heapq
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.engine import feature_arrays, run_sweep_fade, SIDES, REASONS, SIDE_LONG, S_ENTRY, S_ENTRY_AT, S_IN_POS, S_SIDE
+from src.features import add_monday_range
+from src.metrics import equity_metrics, trade_metrics
+from src.profiling import stage
+
+# event kinds; at equal timestamps entries (bar open) are processed before P&L legs
+EV_ENTRY, EV_LEG = 0, 1
+
+@dataclass
+class SymbolTrades:
+    """One symbol's stand-alone trades at unit risk ($1 at the stop), as arrays.
+
+    Entries, partial (TP1) legs and closes are what the portfolio replays; bars in
+    between carry no events. A trade still open at the end of the data has exit_index
+    len(ts) (no closing leg) and stays out of the trade log.
+    """
+    symbol: str
+    ts: np.ndarray           # int64 ns per bar (for the portfolio timeline)
+    entry_index: np.ndarray  # per trade
+    exit_index: np.ndarray
+    side: np.ndarray
+    entry: np.ndarray
+    exit: np.ndarray
+    unit_qty: np.ndarray     # initial quantity per $1 of risk
+    reason: np.ndarray
+    leg_index: np.ndarray    # per P&L leg: bar index, trade number, P&L per $1 risk
+    leg_trade: np.ndarray
+    leg_pnl: np.ndarray
+
+    def events(self, sym: int) -> Iterator[Tuple[int, int, int, int]]:
+        """(ts, kind, sym, k) in time order; k is the trade (entries) or leg number."""
+        ts = np.concatenate([self.ts[self.entry_index], self.ts[self.leg_index]])
+        kind = np.concatenate([np.full(len(self.entry_index), EV_ENTRY), np.full(len(self.leg_index), EV_LEG)])
+        k = np.concatenate([np.arange(len(self.entry_index)), np.arange(len(self.leg_index))])
+        order = np.lexsort((k, kind, ts))
+        return zip(ts[order].tolist(), kind[order].tolist(), [sym] * len(order), k[order].tolist())
+
+def symbol_trades(symbol: str, df: pd.DataFrame, *, stop_mult: float = 1.0, tp1_at_mid: bool = True,
+                  tp1_frac: float = 0.5, tp2_to_full: float = 1.0, exit_friday_close: bool = True,
+                  use_numba: bool | None = None) -> SymbolTrades:
+    """Run the single-symbol state machine at unit risk and extract its trade events."""
+    if "mon_high" not in df.columns:
+        df = add_monday_range(df)
+    arrays = feature_arrays(df)
+    res = run_sweep_fade(arrays, initial_capital=0.0, risk_per_trade=1.0, stop_mult=stop_mult,
+                         tp1_at_mid=tp1_at_mid, tp1_frac=tp1_frac, tp2_to_full=tp2_to_full,
+                         exit_friday_close=exit_friday_close, use_numba=use_numba)
+    t = res["trades"]
+    n = len(df)
+    exit_index = t["exit_index"].astype(np.int64)
+    entry_index = t["entry_index"].astype(np.int64)
+    side = t["side"].astype(np.int64)
+    entry = t["entry"]
+    exit_ = t["exit"]
+    reason = t["reason"].astype(np.int64)
+    state = res["final_state"]
+    if state[S_IN_POS] != 0.0:
+        exit_index = np.append(exit_index, n)
+        entry_index = np.append(entry_index, n + int(state[S_ENTRY_AT]))
+        side = np.append(side, int(state[S_SIDE]))
+        entry = np.append(entry, state[S_ENTRY])
+        exit_ = np.append(exit_, np.nan)
+        reason = np.append(reason, -1)
+    is_long = side == SIDE_LONG
+    ml, mh, rng = arrays["mon_low"][entry_index], arrays["mon_high"][entry_index], arrays["mon_range"][entry_index]
+    stop = np.where(is_long, ml - stop_mult * rng, mh + stop_mult * rng)
+    unit_qty = 1.0 / np.abs(entry - stop)
+
+    # legs: non-zero P&L bars inside a trade (TP1 partials) plus every closing bar
+    pnl = res["trade_pnl"]
+    trade_of = np.searchsorted(entry_index, np.arange(len(pnl)), side="right") - 1
+    inside = np.zeros(len(pnl), dtype=bool)
+    if len(exit_index):
+        k = np.maximum(trade_of, 0)
+        inside = (trade_of >= 0) & (np.arange(len(pnl)) < exit_index[k]) & (pnl != 0)
+    closed = np.flatnonzero(exit_index < n)
+    leg_index = np.concatenate([np.flatnonzero(inside), exit_index[closed]])
+    order = np.argsort(leg_index, kind="stable")
+    leg_index = leg_index[order]
+    leg_trade = np.concatenate([trade_of[inside], closed])[order]
+    return SymbolTrades(
+        symbol=symbol,
+        ts=pd.DatetimeIndex(df.index).as_unit("ns").asi8,
+        entry_index=entry_index, exit_index=exit_index, side=side, entry=entry.copy(),
+        exit=exit_.copy(), unit_qty=unit_qty, reason=reason,
+        leg_index=leg_index, leg_trade=leg_trade, leg_pnl=pnl[leg_index],
+    )
+
+@dataclass
+class PortfolioResult:
+    equity: pd.Series          # portfolio equity on the union of all symbols' bar times
+    open_positions: pd.Series  # concurrent positions
+    open_risk: pd.Series       # summed initial $ risk of open positions
+    trades: pd.DataFrame       # accepted trades (qty: initial size; pnl: including partial exits)
+    skipped: pd.DataFrame      # entries refused by a limit
+    attribution: pd.DataFrame  # per symbol
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+def backtest_portfolio(
+    frames: Dict[str, pd.DataFrame],
+    *,
+    bars_per_year: float,
+    initial_capital: float = 100_000.0,
+    risk_per_trade: float = 100.0,
+    risk_frac: float | None = None,
+    max_positions: int | None = None,
+    max_open_risk: float | None = None,
+    max_leverage: float | None = None,
+    stop_mult: float = 1.0,
+    tp1_at_mid: bool = True,
+    tp1_frac: float = 0.5,
+    tp2_to_full: float = 1.0,
+    exit_friday_close: bool = True,
+    use_numba: bool | None = None,
+) -> PortfolioResult:
+    """Sweep-fade on many symbols sharing one capital pool and risk limits.
+
+    Each symbol's strategy runs on its own bars (frames: raw OHLC or add_monday_range
+    output) and proposes trades; their entry and P&L events are heap-merged into one
+    time-ordered stream, where the portfolio sizes or refuses each entry:
+
+    - size: risk_per_trade dollars at the stop, or risk_frac x current equity if set
+    - max_positions: concurrent open positions
+    - max_open_risk: summed initial risk of open positions, as a fraction of equity
+    - max_leverage: summed entry notional of open positions, as a multiple of equity
+
+    A refused entry skips that trade (the symbol stays out until its next signal
+    week). Equity is realized P&L, as in backtest_sweep_fade. Memory is the
+    symbols' bar timestamps plus their trades; only events pass through Python.
+    """
+    params = dict(stop_mult=stop_mult, tp1_at_mid=tp1_at_mid, tp1_frac=tp1_frac,
+                  tp2_to_full=tp2_to_full, exit_friday_close=exit_friday_close, use_numba=use_numba)
+    total_bars = sum(len(df) for df in frames.values())
+    with stage("signals", rows=total_bars):
+        books = [symbol_trades(sym, df, **params) for sym, df in frames.items()]
+
+    with stage("replay", rows=total_bars):
+        equity = float(initial_capital)
+        open_: Dict[Tuple[int, int], Tuple[float, float]] = {}  # (sym, trade) -> (risk, notional)
+        open_risk = gross = 0.0
+        ev_ts: List[int] = []
+        ev_equity: List[float] = []
+        ev_open: List[int] = []
+        ev_risk: List[float] = []
+        taken: List[Tuple[int, int, float]] = []
+        skipped: List[Dict[str, Any]] = []
+        trade_pnl: Dict[Tuple[int, int], float] = {}
+        sym_pnl = np.zeros(len(books))
+        leg_events: List[Tuple[int, int, float]] = []  # (ts, sym, pnl) for drawdown attribution
+
+        for ts, kind, s, k in heapq.merge(*(b.events(i) for i, b in enumerate(books))):
+            book = books[s]
+            if kind == EV_ENTRY:
+                risk = risk_frac * equity if risk_frac is not None else risk_per_trade
+                notional = book.unit_qty[k] * risk * book.entry[k]
+                refused = None
+                if risk <= 0:
+                    refused = "no_capital"
+                elif max_positions is not None and len(open_) >= max_positions:
+                    refused = "max_positions"
+                elif max_open_risk is not None and open_risk + risk > max_open_risk * equity:
+                    refused = "max_open_risk"
+                elif max_leverage is not None and gross + notional > max_leverage * equity:
+                    refused = "max_leverage"
+                if refused is not None:
+                    skipped.append({"symbol": book.symbol, "time": ts, "side": SIDES[int(book.side[k])], "reason": refused})
+                    continue
+                open_[(s, k)] = (risk, notional)
+                open_risk += risk
+                gross += notional
+                trade_pnl[(s, k)] = 0.0
+                taken.append((s, k, risk))
+            else:
+                key = (s, int(book.leg_trade[k]))
+                pos = open_.get(key)
+                if pos is None:
+                    continue  # leg of a refused trade
+                pnl = float(book.leg_pnl[k]) * pos[0]
+                equity += pnl
+                sym_pnl[s] += pnl
+                trade_pnl[key] += pnl
+                leg_events.append((ts, s, pnl))
+                if book.leg_index[k] == book.exit_index[key[1]]:
+                    del open_[key]
+                    open_risk = open_risk - pos[0] if open_ else 0.0
+                    gross = gross - pos[1] if open_ else 0.0
+            ev_ts.append(ts)
+            ev_equity.append(equity)
+            ev_open.append(len(open_))
+            ev_risk.append(open_risk)
+
+    with stage("timeline", rows=total_bars):
+        times = np.unique(np.concatenate([b.ts for b in books])) if books else np.zeros(0, dtype=np.int64)
+        index = pd.DatetimeIndex(times.view("M8[ns]"))
+        ev_ts_a = np.asarray(ev_ts, dtype=np.int64)
+        at = np.searchsorted(ev_ts_a, times, side="right") - 1  # last event at or before each time
+        before = at < 0
+        at = np.maximum(at, 0)
+
+        def on_timeline(values, start):
+            v = np.asarray(values, dtype=np.float64)
+            out = v[at] if len(v) else np.full(len(times), float(start))
+            out[before] = start
+            return out
+
+        equity_s = pd.Series(on_timeline(ev_equity, initial_capital), index=index, name="equity")
+        open_s = pd.Series(on_timeline(ev_open, 0).astype(np.int64), index=index, name="open_positions")
+        risk_s = pd.Series(on_timeline(ev_risk, 0.0), index=index, name="open_risk")
+
+    trades = _trade_log(books, taken, trade_pnl)
+    skipped_df = pd.DataFrame(skipped, columns=["symbol", "time", "side", "reason"])
+    skipped_df["time"] = pd.to_datetime(skipped_df["time"].astype(np.int64), unit="ns")
+    attribution = _attribution(books, trades, skipped_df, sym_pnl, equity_s, leg_events)
+    metrics = {
+        "equity": equity_metrics(equity_s, bars_per_year=bars_per_year),
+        "trades": trade_metrics(trades),
+        "max_open_positions": int(open_s.max()) if len(open_s) else 0,
+        "max_open_risk": float(risk_s.max()) if len(risk_s) else 0.0,
+        "skipped": skipped_df["reason"].value_counts().to_dict(),
+    }
+    return PortfolioResult(equity=equity_s, open_positions=open_s, open_risk=risk_s, trades=trades,
+                           skipped=skipped_df, attribution=attribution, metrics=metrics)
+
+def _trade_log(books: List[SymbolTrades], taken: List[Tuple[int, int, float]], trade_pnl) -> pd.DataFrame:
+    rows = []
+    for s, k, risk in taken:
+        b = books[s]
+        if b.exit_index[k] >= len(b.ts):
+            continue  # still open at the end of the data
+        rows.append({
+            "symbol": b.symbol,
+            "entry_time": b.ts[b.entry_index[k]],
+            "exit_time": b.ts[b.exit_index[k]],
+            "side": SIDES[int(b.side[k])],
+            "entry": float(b.entry[k]),
+            "exit": float(b.exit[k]),
+            "qty": float(b.unit_qty[k] * risk),
+            "risk": float(risk),
+            "pnl": trade_pnl[(s, k)],
+            "reason": REASONS[int(b.reason[k])],
+        })
+    cols = ["symbol", "entry_time", "exit_time", "side", "entry", "exit", "qty", "risk", "pnl", "reason"]
+    out = pd.DataFrame(rows, columns=cols)
+    for c in ("entry_time", "exit_time"):
+        out[c] = pd.to_datetime(out[c].astype(np.int64), unit="ns")
+    return out
+
+def _attribution(books, trades, skipped, sym_pnl, equity, leg_events) -> pd.DataFrame:
+    """Per symbol: proposed/taken/skipped trades, P&L, its share of the total and the
+    P&L realized inside the portfolio's maximum drawdown (peak to trough)."""
+    dd_pnl = np.zeros(len(books))
+    if len(equity):
+        eq = equity.to_numpy()
+        trough = int(np.argmin(eq - np.maximum.accumulate(eq)))
+        peak = int(np.argmax(eq[:trough + 1]))
+        lo, hi = equity.index.asi8[peak], equity.index.asi8[trough]
+        for ts, s, pnl in leg_events:
+            if lo < ts <= hi:
+                dd_pnl[s] += pnl
+    total = float(sym_pnl.sum())
+    taken = trades.groupby("symbol")["pnl"].agg(["size", lambda p: float((p > 0).mean())]) if len(trades) else None
+    n_skipped = skipped["symbol"].value_counts() if len(skipped) else pd.Series(dtype=np.int64)
+    rows = []
+    for i, b in enumerate(books):
+        n_taken = int(taken.loc[b.symbol].iloc[0]) if taken is not None and b.symbol in taken.index else 0
+        rows.append({
+            "symbol": b.symbol,
+            "bars": int(len(b.ts)),
+            "proposed": int(len(b.entry_index)),
+            "taken": n_taken,
+            "skipped": int(n_skipped.get(b.symbol, 0)),
+            "win_rate": float(taken.loc[b.symbol].iloc[1]) if n_taken else None,
+            "pnl": float(sym_pnl[i]),
+            "pnl_share": float(sym_pnl[i] / total) if total else None,
+            "drawdown_pnl": float(dd_pnl[i]),
+        })
+    cols = ["symbol", "bars", "proposed", "taken", "skipped", "win_rate", "pnl", "pnl_share", "drawdown_pnl"]
+    return pd.DataFrame(rows, columns=cols)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from typing import Dict, Any, List, Optional
+
+try:  # not available on Windows
+    import resource
+except ImportError:  # pragma: no cover - depends on platform
+    resource = None
+
+PROFILE_MODES = ("stages", "memory", "cprofile")
+
+# profiler receiving stage() records; None keeps instrumentation to a no-op
+_ACTIVE: Optional["Profiler"] = None
+
+def _max_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KiB on Linux
+
+class _Stage:
+    __slots__ = ("profiler", "name", "rows", "path", "t0", "c0", "mem0")
+
+    def __init__(self, profiler: "Profiler", name: str, rows: int | None):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows  # may be set inside the with-block once known
+
+    def __enter__(self) -> "_Stage":
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.profiler._exit(self)
+
+class _NullStage:
+    """Stand-in when profiling is off: accepts `rows` and does nothing."""
+    __slots__ = ("rows",)
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+_NULL = _NullStage()
+
+def stage(name: str, rows: int | None = None):
+    """Instrumentation hook for library code: `with stage("backtest", rows=len(df)):`.
+
+    Records into the active Profiler (see Profiler.activate); otherwise costs one
+    function call and returns a shared no-op context.
+    """
+    if _ACTIVE is None:
+        return _NULL
+    return _Stage(_ACTIVE, name, rows)
+
+class Profiler:
+    """Per-stage wall time, CPU time, memory and row counts.
+
+    Stages nest; records are keyed by their path ("backtest/kernel") and repeated
+    stages are summed. Modes:
+      - "stages": wall/CPU time, rows, bars/sec and the process peak RSS after each stage
+      - "memory": also the peak traced Python allocation per stage (tracemalloc; slows
+        pure-Python code considerably, so timings in this mode are inflated)
+      - "cprofile": also collects a cProfile profile (written by save)
+    """
+
+    def __init__(self, mode: str = "stages"):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode!r} (expected one of {PROFILE_MODES})")
+        self.mode = mode
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._stack: List[_Stage] = []
+        self._peaks: List[int] = []
+        self._cprofile: cProfile.Profile | None = None
+        self._t_start: float | None = None
+        self._t_total = 0.0
+
+    def activate(self):
+        """Context manager making this the profiler stage() records into."""
+        return _Activation(self)
+
+    def stage(self, name: str, rows: int | None = None) -> _Stage:
+        return _Stage(self, name, rows)
+
+    def _enter(self, st: _Stage) -> None:
+        st.path = "/".join([s.name for s in self._stack] + [st.name])
+        # created on entry so the report lists parents before their children
+        self.records.setdefault(st.path, {"stage": st.path, "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows": None})
+        if self.mode == "memory":
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            st.mem0 = current
+            self._peaks.append(current)
+        self._stack.append(st)
+        st.c0 = time.process_time()
+        st.t0 = time.perf_counter()
+
+    def _exit(self, st: _Stage) -> None:
+        wall = time.perf_counter() - st.t0
+        cpu = time.process_time() - st.c0
+        self._stack.pop()
+        rec = self.records[st.path]
+        rec["calls"] += 1
+        rec["wall_s"] += wall
+        rec["cpu_s"] += cpu
+        if st.rows is not None:
+            rec["rows"] = (rec["rows"] or 0) + int(st.rows)
+            rec["bars_per_s"] = rec["rows"] / rec["wall_s"] if rec["wall_s"] > 0 else None
+        rec["max_rss_mb"] = _max_rss_mb()
+        if self.mode == "memory":
+            peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+            rec["peak_mb"] = max(rec.get("peak_mb", 0.0), (peak - st.mem0) / 2**20)
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+
+    def report(self) -> Dict[str, Any]:
+        """JSON-serialisable report: mode, total wall time and one record per stage path."""
+        return {
+            "mode": self.mode,
+            "total_wall_s": self._t_total,
+            "max_rss_mb": _max_rss_mb(),
+            "stages": list(self.records.values()),
+        }
+
+    def save(self, path: str) -> List[str]:
+        """Write the JSON report to `path` (plus <path stem>.prof in cprofile mode); returns the paths."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        saved = [path]
+        if self._cprofile is not None:
+            prof = os.path.splitext(path)[0] + ".prof"  # pstats / snakeviz
+            self._cprofile.dump_stats(prof)
+            saved.append(prof)
+        return saved
+
+    def summary(self) -> str:
+        lines = [f"{'stage':<28}{'calls':>6}{'wall_s':>10}{'cpu_s':>10}{'rows':>12}{'bars/s':>14}"]
+        for rec in self.records.values():
+            rows = "" if rec["rows"] is None else f"{rec['rows']:,}"
+            rate = "" if rec.get("bars_per_s") is None else f"{rec['bars_per_s']:,.0f}"
+            lines.append(f"{rec['stage']:<28}{rec['calls']:>6}{rec['wall_s']:>10.4f}{rec['cpu_s']:>10.4f}{rows:>12}{rate:>14}")
+        return "\n".join(lines)
+
+class _Activation:
+    def __init__(self, profiler: Profiler):
+        self.profiler = profiler
+        self.previous: Profiler | None = None
+        self.started_tracing = False
+
+    def __enter__(self) -> Profiler:
+        global _ACTIVE
+        p = self.profiler
+        self.previous = _ACTIVE
+        _ACTIVE = p
+        if p.mode == "memory" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        if p.mode == "cprofile":
+            p._cprofile = p._cprofile or cProfile.Profile()
+            p._cprofile.enable()
+        p._t_start = time.perf_counter()
+        return p
+
+    def __exit__(self, *exc) -> None:
+        global _ACTIVE
+        p = self.profiler
+        p._t_total += time.perf_counter() - p._t_start
+        if p._cprofile is not None:
+            p._cprofile.disable()
+        if self.started_tracing:
+            tracemalloc.stop()
+        _ACTIVE = self.previous
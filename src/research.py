@@ -4,6 +4,10 @@ import numpy as np
 from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
 
+from src.features import add_monday_range, week_offsets
+from src.engine import feature_arrays, sweep_signals
+from src.profiling import stage
+
 @dataclass
 class SignalOutcome:
     iso_year: int
@@ -22,14 +26,25 @@ class SignalOutcome:
     reward_ratio: float       # (full target - entry)/range in "R" units
     sweep_retest: bool
 
-def analyze_weekly_sweep_signals(df: pd.DataFrame) -> pd.DataFrame:
+def analyze_weekly_sweep_signals(df: pd.DataFrame, engine: str = "loop") -> pd.DataFrame:
     """Scan each ISO week and measure what happens after the first sweep signal.
 
     - Entry: next bar open after a sweep-and-close-back bar.
     - Mid target: Monday mid.
     - Full target: opposite side of Monday range (Mon high for long, Mon low for short).
     - MAE: maximum adverse excursion before target, in units of Monday range.
+
+    engine="array" computes the same table from week offsets and segment min/max
+    reductions instead of per-week masks and iterrows (expects a time-sorted frame).
     """
+    if engine not in ("loop", "array"):
+        raise ValueError(f"Unknown engine: {engine!r} (expected 'loop' or 'array')")
+    with stage(f"scan_{engine}", rows=len(df)):
+        if engine == "array":
+            return _analyze_weekly_sweep_signals_array(df)
+        return _analyze_weekly_sweep_signals_loop(df)
+
+def _analyze_weekly_sweep_signals_loop(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return pd.DataFrame()
 
@@ -164,6 +179,129 @@ def analyze_weekly_sweep_signals(df: pd.DataFrame) -> pd.DataFrame:
 
     return pd.DataFrame(out_rows)
 
+def _segment_reduce(ufunc: np.ufunc, values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """ufunc reduction of values[lo[k]:hi[k] + 1] for every k (requires lo <= hi)."""
+    if len(lo) == 0:
+        return np.zeros(0, dtype=values.dtype)
+    padded = np.append(values, values[-1])  # hi + 1 may equal len(values)
+    idx = np.empty(2 * len(lo), dtype=np.int64)
+    idx[0::2] = lo
+    idx[1::2] = hi + 1
+    return ufunc.reduceat(padded, idx)[0::2]
+
+def _first_per_slot(mask: np.ndarray, slot: np.ndarray, n_slots: int) -> np.ndarray:
+    """Row index of the first True in mask for each slot, or -1."""
+    rows = np.flatnonzero(mask)
+    first = np.full(n_slots, -1, dtype=np.int64)
+    uniq, pos = np.unique(slot[rows], return_index=True)
+    first[uniq] = rows[pos]
+    return first
+
+def _analyze_weekly_sweep_signals_array(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame()
+    if "mon_high" not in df.columns:
+        df = add_monday_range(df[["open", "high", "low", "close"]])
+    arrays = feature_arrays(df)
+    arrays["long_sig"], arrays["short_sig"] = sweep_signals(arrays)
+    return signal_outcomes(df.index, arrays)
+
+def signal_outcomes(index: pd.Index, arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Outcome table (same columns as analyze_weekly_sweep_signals) from feature arrays.
+
+    `arrays` is `engine.feature_arrays` output plus the long_sig/short_sig flags from
+    `engine.sweep_signals`, so the same signal detection can feed the backtest.
+    """
+    o, h, l = arrays["open"], arrays["high"], arrays["low"]
+    years, weeks = arrays["iso_year"], arrays["iso_week"]
+    long_sig, short_sig = arrays["long_sig"], arrays["short_sig"]
+    n = len(o)
+    if n == 0:
+        return pd.DataFrame()
+
+    starts, ends = week_offsets(years, weeks)
+    week_of_bar = np.repeat(np.arange(len(starts)), ends - starts)
+
+    # Monday range is constant within a week; read it at the week's first bar
+    mon_high = arrays["mon_high"][starts]
+    mon_low = arrays["mon_low"][starts]
+    mon_mid = arrays["mon_mid"][starts]
+    rng = arrays["mon_range"][starts]
+
+    sig_first = _first_per_slot(long_sig | short_sig, week_of_bar, len(starts))
+    sig_weeks = np.flatnonzero(sig_first >= 0)
+    entry_idx = sig_first[sig_weeks]
+    week_end = ends[sig_weeks]
+    has_forward = entry_idx + 1 < week_end
+    sig_weeks, entry_idx, week_end = sig_weeks[has_forward], entry_idx[has_forward], week_end[has_forward]
+    if len(sig_weeks) == 0:
+        return pd.DataFrame([])
+
+    is_long = long_sig[entry_idx]
+    entry_price = o[entry_idx]
+    sweep_extreme = np.where(is_long, l[entry_idx - 1], h[entry_idx - 1])
+    s_high, s_low, s_mid, s_rng = mon_high[sig_weeks], mon_low[sig_weeks], mon_mid[sig_weeks], rng[sig_weeks]
+    target_full = np.where(is_long, s_high, s_low)
+    reward_ratio = np.where(is_long, (target_full - entry_price) / s_rng, (entry_price - target_full) / s_rng)
+
+    # forward path: bars after the entry bar, up to the end of the week
+    slot_of_week = np.full(len(starts), -1, dtype=np.int64)
+    slot_of_week[sig_weeks] = np.arange(len(sig_weeks))
+    bar_slot = slot_of_week[week_of_bar]
+    in_slot = bar_slot >= 0
+    safe_slot = np.where(in_slot, bar_slot, 0)
+    forward = in_slot & (np.arange(n) > entry_idx[safe_slot])
+    long_bar = is_long[safe_slot]
+
+    def first_hit(target: np.ndarray) -> np.ndarray:
+        t = target[safe_slot]
+        hit = forward & np.where(long_bar, h >= t, l <= t)
+        return _first_per_slot(hit, safe_slot, len(sig_weeks))
+
+    def mae(hit_idx: np.ndarray) -> np.ndarray:
+        lo = entry_idx + 1
+        hi = np.where(hit_idx >= 0, hit_idx, lo)
+        worst_low = _segment_reduce(np.fmin, l, lo, hi)
+        worst_high = _segment_reduce(np.fmax, h, lo, hi)
+        dd = np.where(is_long, entry_price - worst_low, worst_high - entry_price)
+        return np.where(dd > 0.0, dd, 0.0) / s_rng
+
+    hit_mid_idx = first_hit(s_mid)
+    hit_full_idx = first_hit(target_full)
+    mae_mid = mae(hit_mid_idx)
+    mae_full = mae(hit_full_idx)
+
+    # sweep retest: beyond the sweep extreme on the path up to the full target (or week end)
+    retest_end = np.where(hit_full_idx >= 0, hit_full_idx, week_end - 1)
+    path_low = _segment_reduce(np.fmin, l, entry_idx + 1, retest_end)
+    path_high = _segment_reduce(np.fmax, h, entry_idx + 1, retest_end)
+    sweep_retest = np.where(is_long, path_low < sweep_extreme, path_high > sweep_extreme)
+
+    out_rows: List[Dict[str, Any]] = []
+    for k in range(len(sig_weeks)):
+        w = sig_weeks[k]
+        hm = bool(hit_mid_idx[k] >= 0)
+        hf = bool(hit_full_idx[k] >= 0)
+        out_rows.append(dict(
+            iso_year=int(years[starts[w]]),
+            iso_week=int(weeks[starts[w]]),
+            side="LONG" if is_long[k] else "SHORT",
+            entry_time=index[entry_idx[k]],
+            entry_price=float(entry_price[k]),
+            mon_high=float(s_high[k]),
+            mon_low=float(s_low[k]),
+            mon_mid=float(s_mid[k]),
+            mon_range=float(s_rng[k]),
+            hit_mid=hm,
+            hit_full=hf,
+            mae_mid=float(mae_mid[k]) if hm else None,
+            mae_full=float(mae_full[k]) if hf else None,
+            reward_ratio=float(reward_ratio[k]),
+            sweep_retest=bool(sweep_retest[k]),
+        ))
+
+    return pd.DataFrame(out_rows)
+
 def summarize_research(signals: pd.DataFrame) -> dict:
     if signals.empty:
         return {"total_signals": 0}
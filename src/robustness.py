@@ -0,0 +1,166 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Sequence
+
+DEFAULT_QUANTILES = (0.05, 0.5, 0.95)
+
+def _bootstrap_indices(n: int, n_resamples: int, rng: np.random.Generator, block: int = 1) -> np.ndarray:
+    """(n_resamples, n) row indices: iid when block == 1, else circular moving blocks."""
+    if block <= 1:
+        return rng.integers(0, n, size=(n_resamples, n))
+    n_blocks = -(-n // block)
+    starts = rng.integers(0, n, size=(n_resamples, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block)[None, None, :]) % n
+    return idx.reshape(n_resamples, -1)[:, :n]
+
+def _summarize(samples: Dict[str, np.ndarray], point: Dict[str, float], quantiles: Sequence[float]) -> pd.DataFrame:
+    rows = []
+    for name, vals in samples.items():
+        finite = vals[np.isfinite(vals)]
+        row = {"metric": name, "point": point.get(name, np.nan), "mean": float(finite.mean()) if len(finite) else np.nan}
+        qs = np.quantile(finite, quantiles) if len(finite) else [np.nan] * len(quantiles)
+        for q, v in zip(quantiles, qs):
+            row[f"q{int(round(q * 100)):02d}"] = float(v)
+        row["n_finite"] = int(len(finite))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def _pnl_stats(pnl: np.ndarray, initial_capital: float) -> Dict[str, np.ndarray]:
+    """Row-wise trade statistics for a (runs x trades) pnl matrix."""
+    pnl = np.atleast_2d(pnl)
+    wins = np.where(pnl > 0, pnl, 0.0).sum(axis=1)
+    losses = -np.where(pnl < 0, pnl, 0.0).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        profit_factor = np.where(losses != 0, wins / losses, np.inf)
+        std = pnl.std(axis=1, ddof=1) if pnl.shape[1] > 1 else np.zeros(len(pnl))
+        sharpe = np.where(std > 0, pnl.mean(axis=1) / std, 0.0)
+
+    equity = initial_capital + np.cumsum(pnl, axis=1)
+    equity = np.concatenate([np.full((len(pnl), 1), float(initial_capital)), equity], axis=1)
+    peak = np.maximum.accumulate(equity, axis=1)
+    max_dd = ((equity - peak) / peak).min(axis=1)
+
+    return {
+        "win_rate": (pnl > 0).mean(axis=1),
+        "avg_pnl": pnl.mean(axis=1),
+        "profit_factor": profit_factor,
+        "sharpe_per_trade": sharpe,
+        "total_pnl": pnl.sum(axis=1),
+        "max_drawdown": max_dd,
+    }
+
+def bootstrap_trades(
+    trades: pd.DataFrame,
+    *,
+    n_resamples: int = 10_000,
+    block: int = 1,
+    initial_capital: float = 10_000.0,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    seed: int | None = 0,
+) -> pd.DataFrame:
+    """Bootstrap confidence intervals for trade_metrics-style statistics.
+
+    Resamples the trade pnl sequence with replacement (iid when block == 1, circular
+    block bootstrap of `block` consecutive trades otherwise) into a
+    (n_resamples x num_trades) matrix and computes win rate, avg pnl, profit factor,
+    per-trade Sharpe, total pnl and max drawdown (of initial_capital + cumulative pnl)
+    for all resamples at once.
+
+    Returns one row per metric: point estimate, bootstrap mean and quantiles.
+    """
+    if trades is None or trades.empty:
+        return pd.DataFrame()
+    pnl = trades["pnl"].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    idx = _bootstrap_indices(len(pnl), n_resamples, rng, block)
+    samples = _pnl_stats(pnl[idx], initial_capital)
+    point = {k: float(v[0]) for k, v in _pnl_stats(pnl[None, :], initial_capital).items()}
+    return _summarize(samples, point, quantiles)
+
+def shuffle_drawdowns(
+    trades: pd.DataFrame,
+    *,
+    n_resamples: int = 10_000,
+    initial_capital: float = 10_000.0,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    seed: int | None = 0,
+) -> pd.DataFrame:
+    """Max drawdown distribution under random reorderings of the same trades.
+
+    Total pnl is unchanged by a shuffle; the spread of max drawdown shows how much of
+    the realised drawdown is down to trade order.
+    """
+    if trades is None or trades.empty:
+        return pd.DataFrame()
+    pnl = trades["pnl"].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    idx = rng.permuted(np.broadcast_to(np.arange(len(pnl)), (n_resamples, len(pnl))), axis=1)
+    stats = _pnl_stats(pnl[idx], initial_capital)
+    point = _pnl_stats(pnl[None, :], initial_capital)
+    return _summarize({"max_drawdown": stats["max_drawdown"]}, {"max_drawdown": float(point["max_drawdown"][0])}, quantiles)
+
+def bootstrap_research(
+    signals: pd.DataFrame,
+    *,
+    n_resamples: int = 10_000,
+    block: int = 1,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    seed: int | None = 0,
+) -> pd.DataFrame:
+    """Bootstrap confidence intervals for summarize_research hit rates.
+
+    Each row of `signals` is one week, so this resamples whole weeks (iid or in
+    blocks of consecutive weeks) and recomputes p_hit_mid, p_hit_full,
+    p_sweep_retest, avg_reward_ratio and the mean MAE of hits.
+    """
+    if signals is None or signals.empty:
+        return pd.DataFrame()
+    rng = np.random.default_rng(seed)
+    idx = _bootstrap_indices(len(signals), n_resamples, rng, block)
+
+    hit_mid = signals["hit_mid"].to_numpy(dtype=bool)
+    hit_full = signals["hit_full"].to_numpy(dtype=bool)
+    retest = signals["sweep_retest"].to_numpy(dtype=bool)
+    reward = signals["reward_ratio"].to_numpy(dtype=np.float64)
+    mae_mid = pd.to_numeric(signals["mae_mid"], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+    mae_full = pd.to_numeric(signals["mae_full"], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+
+    def stats(ix: np.ndarray) -> Dict[str, np.ndarray]:
+        hm, hf = hit_mid[ix], hit_full[ix]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg_mae_mid = (mae_mid[ix] * hm).sum(axis=1) / hm.sum(axis=1)
+            avg_mae_full = (mae_full[ix] * hf).sum(axis=1) / hf.sum(axis=1)
+        return {
+            "p_hit_mid": hm.mean(axis=1),
+            "p_hit_full": hf.mean(axis=1),
+            "avg_mae_mid": avg_mae_mid,
+            "avg_mae_full": avg_mae_full,
+            "avg_reward_ratio": reward[ix].mean(axis=1),
+            "p_sweep_retest": retest[ix].mean(axis=1),
+        }
+
+    point = {k: float(v[0]) for k, v in stats(np.arange(len(signals))[None, :]).items()}
+    return _summarize(stats(idx), point, quantiles)
+
+def robustness_report(
+    trades: pd.DataFrame,
+    signals: pd.DataFrame | None = None,
+    *,
+    n_resamples: int = 10_000,
+    block: int = 4,
+    initial_capital: float = 10_000.0,
+    seed: int | None = 0,
+) -> Dict[str, Any]:
+    """iid + block bootstrap of trades, trade-order shuffles and (optionally) week bootstrap, as records."""
+    out: Dict[str, Any] = {}
+    for name, frame in (
+        ("trades_iid", bootstrap_trades(trades, n_resamples=n_resamples, initial_capital=initial_capital, seed=seed)),
+        ("trades_block", bootstrap_trades(trades, n_resamples=n_resamples, block=block, initial_capital=initial_capital, seed=seed)),
+        ("shuffle_drawdown", shuffle_drawdowns(trades, n_resamples=n_resamples, initial_capital=initial_capital, seed=seed)),
+    ):
+        out[name] = frame.to_dict(orient="records")
+    if signals is not None:
+        out["weeks_iid"] = bootstrap_research(signals, n_resamples=n_resamples, seed=seed).to_dict(orient="records")
+        out["weeks_block"] = bootstrap_research(signals, n_resamples=n_resamples, block=block, seed=seed).to_dict(orient="records")
+    return out
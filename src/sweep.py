@@ -0,0 +1,161 @@
+from __future__ import annotations
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.experiments import ohlc_digest
+from src.engine import feature_arrays, run_sweep_fade, sweep_signals, REASONS
+from src.metrics import curve_metrics, trade_metrics, flatten_trade_metrics
+
+SWEEP_PARAMS = ("stop_mult", "tp1_frac", "tp2_to_full", "tp1_at_mid", "exit_friday_close")
+# what a sweep row depends on besides the parameters (the bars and the anchor range)
+SWEEP_DATA_COLUMNS = ("open", "high", "low", "close", "mon_high", "mon_low", "is_tradeable")
+
+def param_grid(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of a {param: values} grid, in key order."""
+    unknown = set(grid) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    keys = list(grid)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+def evaluate_params(
+    arrays: Dict[str, np.ndarray],
+    params: Dict[str, Any],
+    *,
+    initial_capital: float,
+    risk_per_trade: float,
+    bars_per_year: float,
+) -> Dict[str, Any]:
+    """Run one backtest on feature arrays and flatten equity + trade metrics into a row."""
+    res = run_sweep_fade(arrays, initial_capital=initial_capital, risk_per_trade=risk_per_trade, **params)
+
+    trades = pd.DataFrame({
+        "pnl": res["trade_pnl_closed"],
+        "reason": [REASONS[r] for r in res["trade_reason"]],
+    })
+    em = curve_metrics(res["equity"], bars_per_year=bars_per_year)
+    tm = flatten_trade_metrics(trade_metrics(trades), REASONS)
+
+    row = dict(params)
+    row.update(em)
+    row.update(tm)
+    return row
+
+# --- shared-memory plumbing: one block holding every feature array ---
+
+_WORKER: Dict[str, Any] = {}
+
+def pack_shared(arrays: Dict[str, np.ndarray]) -> Tuple[shared_memory.SharedMemory, Dict[str, Tuple[int, str, int]]]:
+    """Copy `arrays` into one new shared-memory block; returns it and the layout for attach_shared.
+    The caller closes and unlinks the block."""
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = (offset, arr.dtype.str, len(arr))
+        offset += -(-arr.nbytes // 8) * 8  # keep every column 8-byte aligned
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, arr in arrays.items():
+        off, dtype, n = layout[name]
+        np.ndarray(n, dtype=dtype, buffer=shm.buf, offset=off)[:] = arr
+    return shm, layout
+
+def attach_shared(name: str, layout: Dict[str, Tuple[int, str, int]]) -> Dict[str, np.ndarray]:
+    """Read-only views of a pack_shared block (in a worker process)."""
+    shm = shared_memory.SharedMemory(name=name)
+    _WORKER["shm"] = shm  # keep the mapping alive for the worker's lifetime
+    arrays = {}
+    for col, (off, dtype, n) in layout.items():
+        arr = np.ndarray(n, dtype=dtype, buffer=shm.buf, offset=off)
+        arr.flags.writeable = False
+        arrays[col] = arr
+    return arrays
+
+def _init_worker(shm_name: str, layout: Dict[str, Tuple[int, str, int]], settings: Dict[str, float]) -> None:
+    _WORKER["arrays"] = attach_shared(shm_name, layout)
+    _WORKER["settings"] = settings
+
+def _run_chunk(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    arrays = _WORKER["arrays"]
+    settings = _WORKER["settings"]
+    return [evaluate_params(arrays, p, **settings) for p in chunk]
+
+def run_sweep(
+    df: pd.DataFrame,
+    grid: Dict[str, Sequence[Any]] | List[Dict[str, Any]],
+    *,
+    bars_per_year: float,
+    initial_capital: float = 10_000.0,
+    risk_per_trade: float = 100.0,
+    workers: int | None = None,
+    chunksize: int | None = None,
+    store=None,
+    symbol: str | None = None,
+    interval: str | None = None,
+) -> pd.DataFrame:
+    """Backtest every parameter combination over a feature frame (output of add_monday_range).
+
+    The feature columns are extracted once and placed in a single shared-memory block;
+    worker processes map it read-only, so only small parameter dicts and result rows
+    cross process boundaries. workers=1 runs in-process.
+
+    With a `store` (src.experiments.ExperimentStore), combinations already run on the
+    same bars and range columns are read back instead of recomputed, and new rows are
+    added to it.
+
+    Returns one row per combination: the parameters, curve_metrics and trade_metrics
+    (by_reason expanded into n_stop/n_tp2/n_friday).
+    """
+    combos = param_grid(grid) if isinstance(grid, dict) else list(grid)
+    if not combos:
+        return pd.DataFrame()
+    settings = dict(initial_capital=initial_capital, risk_per_trade=risk_per_trade, bars_per_year=bars_per_year)
+
+    if store is not None:
+        data_hash = ohlc_digest(df, SWEEP_DATA_COLUMNS)
+        keyed = [{**p, **settings} for p in combos]
+        cached = store.get_many("sweep", keyed, data_hash)
+        todo = [p for p, c in zip(combos, cached) if c is None]
+        fresh = iter(_run_combos(df, todo, settings, workers, chunksize)) if todo else iter(())
+        rows = []
+        new = []
+        for p, key_params, c in zip(combos, keyed, cached):
+            if c is None:
+                row = next(fresh)
+                new.append((key_params, row, None))
+            else:
+                row = c.metrics
+            rows.append(row)
+        if new:
+            store.put_many("sweep", new, data_hash, symbol=symbol, interval=interval, bars=len(df))
+        return pd.DataFrame(rows)
+    return pd.DataFrame(_run_combos(df, combos, settings, workers, chunksize))
+
+def _run_combos(df: pd.DataFrame, combos: List[Dict[str, Any]], settings: Dict[str, float],
+                workers: int | None, chunksize: int | None) -> List[Dict[str, Any]]:
+    arrays = feature_arrays(df)
+    arrays["long_sig"], arrays["short_sig"] = sweep_signals(arrays)
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(combos))
+
+    if workers <= 1:
+        return [evaluate_params(arrays, p, **settings) for p in combos]
+
+    # a few chunks per worker balances load without per-combination IPC overhead
+    chunksize = chunksize or max(1, len(combos) // (workers * 4))
+    chunks = [combos[i:i + chunksize] for i in range(0, len(combos), chunksize)]
+
+    shm, layout = pack_shared(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shm.name, layout, settings)) as ex:
+            rows = [row for chunk_rows in ex.map(_run_chunk, chunks) for row in chunk_rows]
+    finally:
+        shm.close()
+        shm.unlink()
+    return rows
@@ -0,0 +1,81 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+def synthetic_ohlc(
+    n_bars: int | None = None,
+    *,
+    years: float | None = None,
+    interval: str = "1h",
+    start: str = "2015-01-05",
+    seed: int = 0,
+    price: float = 100.0,
+    annual_vol: float = 0.6,
+    weekends: bool = True,
+    holiday_rate: float = 0.0,
+    gap_rate: float = 0.0,
+    session: tuple[int, int] | None = None,
+) -> pd.DataFrame:
+    """Seeded random-walk OHLC bars with calendar structure, for benchmarks and offline runs.
+
+    - n_bars or years: length (n_bars wins; counts bars after calendar filtering)
+    - interval: bar size, anything pd.Timedelta accepts ("1m", "15min", "1h", "4h", "1d")
+    - weekends=False drops Saturday/Sunday bars (equity/FX-like calendars)
+    - holiday_rate: fraction of weekdays removed entirely (holidays)
+    - gap_rate: fraction of remaining bars dropped at random (missing data)
+    - session=(start_hour, end_hour): keep only bars inside those hours
+
+    Returns open/high/low/close with a tz-naive DatetimeIndex, like download_ohlc.
+    Same arguments and seed give the same bars.
+    """
+    rng = np.random.default_rng(seed)
+    step = pd.Timedelta(interval)
+    if n_bars is None:
+        if years is None:
+            raise ValueError("Pass n_bars or years")
+        span = pd.Timedelta(days=365.25 * years)
+        raw = int(span / step)
+    else:
+        # oversample so the calendar filters still leave n_bars
+        keep = 1.0
+        if not weekends:
+            keep *= 5 / 7
+        if session is not None:
+            keep *= max(session[1] - session[0], 1) / 24 if step < pd.Timedelta(days=1) else 1.0
+        keep *= (1 - holiday_rate) * (1 - gap_rate)
+        raw = int(n_bars / max(keep, 1e-3) * 1.05) + 16
+
+    index = pd.date_range(start, periods=raw, freq=step)
+    mask = np.ones(len(index), dtype=bool)
+    if not weekends:
+        mask &= index.weekday < 5
+    if session is not None and step < pd.Timedelta(days=1):
+        mask &= (index.hour >= session[0]) & (index.hour < session[1])
+    if holiday_rate > 0:
+        days = index.normalize()
+        unique_days = days.unique()
+        holidays = unique_days[rng.random(len(unique_days)) < holiday_rate]
+        mask &= ~days.isin(holidays)
+    if gap_rate > 0:
+        mask &= rng.random(len(index)) >= gap_rate
+    index = index[mask]
+    if n_bars is not None:
+        index = index[:n_bars]
+    n = len(index)
+
+    bars_per_year = pd.Timedelta(days=365.25) / step
+    sigma = annual_vol / np.sqrt(bars_per_year)
+    rets = rng.normal(0.0, sigma, n)
+    close = price * np.exp(np.cumsum(rets))
+    open_ = np.empty(n)
+    open_[0] = price
+    open_[1:] = close[:-1]
+    # small open gaps after missing time (weekends, holidays, dropped bars)
+    if n > 1:
+        gapped = np.diff(index.asi8) > step.value
+        open_[1:][gapped] *= np.exp(rng.normal(0.0, sigma, gapped.sum()))
+    wick = np.abs(rng.normal(0.0, sigma * 0.5, (2, n)))
+    high = np.maximum(open_, close) * np.exp(wick[0])
+    low = np.minimum(open_, close) * np.exp(-wick[1])
+
+    return pd.DataFrame({"open": open_, "high": high, "low": low, "close": close}, index=index)
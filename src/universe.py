@@ -0,0 +1,207 @@
+from __future__ import annotations
+import itertools
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Iterable
+
+import pandas as pd
+
+from src.backtest import trades_from_arrays
+from src.cache import BarStore, FeatureStore
+from src.data import download_ohlc, OHLCProvider
+from src.engine import feature_arrays, run_sweep_fade, sweep_signals
+from src.features import add_monday_range
+from src.metrics import equity_metrics, trade_metrics, flatten_trade_metrics
+from src.plotting import render_equity
+from src.research import signal_outcomes, summarize_research
+
+STAGES = ("load", "features", "research", "backtest", "plot")
+
+def read_symbols(path: str) -> List[str]:
+    """One symbol per line; blank lines and '#' comments are ignored, duplicates dropped."""
+    out: List[str] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            sym = line.split("#", 1)[0].strip()
+            if sym and sym not in out:
+                out.append(sym)
+    return out
+
+def _file_key(symbol: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", symbol)
+
+def run_symbol(symbol: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """load -> add_monday_range -> research -> backtest for one symbol; never raises.
+
+    Returns one metrics row with per-stage durations (`<stage>_s`), `status` ("ok" or
+    "error") and `error` (last line of the exception) on failure.
+    """
+    row: Dict[str, Any] = {"symbol": symbol, "status": "ok", "error": ""}
+    t_start = time.perf_counter()
+    stage = STAGES[0]
+    try:
+        t = time.perf_counter()
+        store = BarStore(settings["cache_dir"]) if settings.get("cache_dir") else None
+        df = download_ohlc(symbol, interval=settings["interval"], period=settings["period"],
+                           start=settings.get("start"), end=settings.get("end"),
+                           provider=settings.get("provider"), store=store)
+        row["load_s"] = time.perf_counter() - t
+        row["bars"] = int(len(df))
+
+        stage = "features"
+        t = time.perf_counter()
+        features = FeatureStore(os.path.join(settings["cache_dir"], "_features")) if store is not None else None
+        df = add_monday_range(df, store=features)
+        arrays = feature_arrays(df)
+        arrays["long_sig"], arrays["short_sig"] = sweep_signals(arrays)
+        row["features_s"] = time.perf_counter() - t
+
+        stage = "research"
+        t = time.perf_counter()
+        summary = summarize_research(signal_outcomes(df.index, arrays))
+        row.update({f"research_{k}": v for k, v in summary.items()})
+        row["research_s"] = time.perf_counter() - t
+
+        stage = "backtest"
+        t = time.perf_counter()
+        res = run_sweep_fade(arrays, **settings["params"])
+        trades = trades_from_arrays(df.index, res, arrays["iso_year"], arrays["iso_week"])
+        row.update(equity_metrics(pd.Series(res["equity"], index=df.index), bars_per_year=settings["bars_per_year"]))
+        row.update(flatten_trade_metrics(trade_metrics(trades)))
+        trades_dir = settings.get("trades_dir")
+        if trades_dir:
+            trades.to_csv(os.path.join(trades_dir, f"{_file_key(symbol)}.csv"), index=False)
+        row["backtest_s"] = time.perf_counter() - t
+
+        plots_dir = settings.get("plots_dir")
+        if plots_dir:
+            stage = "plot"
+            t = time.perf_counter()
+            render_equity(pd.Series(res["equity"], index=df.index), os.path.join(plots_dir, f"{_file_key(symbol)}.png"),
+                          title=f"Equity curve: {symbol} ({settings['interval']})")
+            row["plot_s"] = time.perf_counter() - t
+    except Exception as exc:  # one bad symbol must not stop the universe
+        row["status"] = "error"
+        row["error"] = f"{stage}: {traceback.format_exception_only(type(exc), exc)[-1].strip()}"
+    row["total_s"] = time.perf_counter() - t_start
+    return row
+
+def _progress_line(i: int, total: int, row: Dict[str, Any]) -> str:
+    timings = " ".join(f"{s}={row[f'{s}_s']:.2f}s" for s in STAGES if f"{s}_s" in row)
+    tail = row["error"] if row["status"] != "ok" else timings
+    return f"[{i}/{total}] {row['symbol']:<12} {row['status']:<5} {row['total_s']:.2f}s  {tail}"
+
+def run_universe(
+    symbols: Iterable[str],
+    *,
+    interval: str,
+    period: str,
+    bars_per_year: float,
+    params: Dict[str, Any] | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    cache_dir: str | None = "data/bars",
+    provider: OHLCProvider | None = None,
+    trades_dir: str | None = None,
+    plots_dir: str | None = None,
+    workers: int | None = None,
+    max_in_flight: int | None = None,
+    max_tasks_per_child: int | None = 50,
+    verbose: bool = True,
+) -> pd.DataFrame:
+    """Run every symbol through load -> features -> research -> backtest on a process pool.
+
+    At most `max_in_flight` symbols are submitted at once (default 2 x workers), so
+    queued work and pending results stay bounded, and workers are recycled after
+    `max_tasks_per_child` symbols to cap per-process memory growth. Failures are
+    recorded per symbol; if a worker process dies, the symbols in flight on the
+    broken pool are recorded as failed and the rest run on a new pool. `provider` must be picklable when workers > 1. With
+    `plots_dir`, each worker also renders the symbol's decimated equity curve there,
+    reusing one figure per process.
+
+    Returns one row per symbol (in input order): status, stage durations, research
+    summary (research_*), equity and trade metrics.
+    """
+    symbols = list(symbols)
+    for d in (trades_dir, plots_dir):
+        if d:
+            os.makedirs(d, exist_ok=True)
+    settings = dict(
+        interval=interval, period=period, start=start, end=end, cache_dir=cache_dir, provider=provider,
+        trades_dir=trades_dir, plots_dir=plots_dir, bars_per_year=bars_per_year, params=dict(params or {}),
+    )
+    workers = max(1, min(workers or os.cpu_count() or 1, len(symbols) or 1))
+    max_in_flight = max_in_flight or 2 * workers
+
+    rows: Dict[str, Dict[str, Any]] = {}
+
+    def record(row: Dict[str, Any]) -> None:
+        rows[row["symbol"]] = row
+        if verbose:
+            print(_progress_line(len(rows), len(symbols), row), flush=True)
+
+    if workers == 1:
+        for sym in symbols:
+            record(run_symbol(sym, settings))
+    else:
+        def new_pool() -> ProcessPoolExecutor:
+            return ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=max_tasks_per_child)
+
+        pending = {}
+        queue = iter(symbols)
+        broken = False
+        ex = new_pool()
+        try:
+            while True:
+                while not broken and len(pending) < max_in_flight:
+                    sym = next(queue, None)
+                    if sym is None:
+                        break
+                    try:
+                        pending[ex.submit(run_symbol, sym, settings)] = sym
+                    except BrokenProcessPool:  # a worker died since the last wait
+                        queue = itertools.chain([sym], queue)
+                        broken = True
+                if pending:
+                    # once the pool is broken every in-flight future fails; collect them all
+                    done, _ = wait(pending, return_when=ALL_COMPLETED if broken else FIRST_COMPLETED)
+                    for fut in done:
+                        sym = pending.pop(fut)
+                        try:
+                            record(fut.result())
+                        except Exception as exc:  # worker died (e.g. out of memory, hard exit)
+                            broken = broken or isinstance(exc, BrokenProcessPool)
+                            record({"symbol": sym, "status": "error", "error": f"worker: {exc!r}", "total_s": 0.0})
+                elif not broken:
+                    break
+                if broken and not pending:
+                    # the in-flight symbols are recorded as failed; go on with a fresh pool
+                    ex.shutdown(wait=True)
+                    ex = new_pool()
+                    broken = False
+        finally:
+            ex.shutdown(wait=True)
+
+    return pd.DataFrame([rows[s] for s in symbols])
+
+def timing_report(table: pd.DataFrame) -> Dict[str, Any]:
+    """Aggregate stage durations over successful symbols (sum, mean, max per stage)."""
+    ok = table[table["status"] == "ok"] if len(table) else table
+    report: Dict[str, Any] = {
+        "symbols": int(len(table)),
+        "ok": int(len(ok)),
+        "failed": int(len(table) - len(ok)),
+    }
+    for stage in (*STAGES, "total"):
+        col = f"{stage}_s"
+        if col in ok.columns and len(ok):
+            report[stage] = {
+                "sum_s": float(ok[col].sum()),
+                "mean_s": float(ok[col].mean()),
+                "max_s": float(ok[col].max()),
+            }
+    return report
@@ -0,0 +1,342 @@
+from __future__ import annotations
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import trades_from_arrays
+from src.engine import (
+    FEATURE_COLUMNS, HAS_NUMBA, S_ENTRY, S_IN_POS, S_QTY, S_SIDE, SIDE_LONG, SIDES,
+    feature_arrays, initial_state, kernel_params, run_sweep_fade, sweep_fade_chunk, sweep_signals,
+)
+from src.metrics import CURVE_STATS, curve_metrics, equity_metrics, trade_metrics
+from src.sweep import attach_shared, pack_shared, param_grid
+
+# objectives where smaller is better; every other CURVE_STATS field is maximized
+_MINIMIZE = ("max_drawdown_duration", "ulcer_index")
+
+# trade log reason of a position closed because its window ended
+WINDOW_END = "WINDOW_END"
+
+@dataclass(frozen=True)
+class Fold:
+    """Bar positions [lo, hi) of one fold's train and test windows (whole ISO weeks)."""
+    fold: int
+    train_lo: int
+    train_hi: int
+    test_lo: int
+    test_hi: int
+
+def walk_forward_folds(
+    iso_year: np.ndarray,
+    iso_week: np.ndarray,
+    *,
+    train_weeks: int,
+    test_weeks: int | None = None,
+    n_folds: int | None = None,
+    anchored: bool = False,
+) -> List[Fold]:
+    """Consecutive test windows of test_weeks ISO weeks, each preceded by its train window.
+
+    Rolling: the train window is the train_weeks weeks before the test window.
+    Anchored: it starts at the first week and grows. With n_folds instead of
+    test_weeks, the weeks after the first train window are split into at most
+    n_folds test windows (n_folds takes precedence). The last test window ends with
+    the data (may be shorter).
+    """
+    key = np.asarray(iso_year, dtype=np.int64) * 100 + np.asarray(iso_week, dtype=np.int64)
+    n = len(key)
+    bounds = np.r_[0, np.flatnonzero(np.diff(key) != 0) + 1, n] if n else np.zeros(1, dtype=np.int64)
+    weeks = len(bounds) - 1
+    if train_weeks < 1 or weeks <= train_weeks:
+        raise ValueError(f"Need more than train_weeks={train_weeks} weeks of data, have {weeks}")
+    if n_folds:
+        test_weeks = math.ceil((weeks - train_weeks) / n_folds)
+    elif test_weeks is None:
+        raise ValueError("Pass test_weeks or n_folds")
+    test_weeks = max(int(test_weeks), 1)
+
+    folds = []
+    for k in range(train_weeks, weeks, test_weeks):
+        first = 0 if anchored else k - train_weeks
+        folds.append(Fold(len(folds), int(bounds[first]), int(bounds[k]),
+                          int(bounds[k]), int(bounds[min(k + test_weeks, weeks)])))
+    return folds
+
+def _rebased(equity: np.ndarray, lo: int, hi: int, initial_capital: float) -> np.ndarray:
+    # sizing is a fixed $ risk, so a run started flat at `lo` with initial_capital has
+    # the same P&L path; only the level differs
+    before = equity[lo - 1] if lo > 0 else initial_capital
+    return equity[lo:hi] - before + initial_capital
+
+def _end_trade(state: np.ndarray, close: np.ndarray) -> Dict[str, Any] | None:
+    """The trade closing a position still open in `state` at the last bar's close (None when flat)."""
+    if state[S_IN_POS] == 0.0 or state[S_QTY] <= 0 or not len(close):
+        return None
+    side = int(state[S_SIDE])
+    entry, qty, exit_px = float(state[S_ENTRY]), float(state[S_QTY]), float(close[-1])
+    pnl = (exit_px - entry) * qty if side == SIDE_LONG else (entry - exit_px) * qty
+    return {"index": len(close) - 1, "side": SIDES[side], "entry": entry, "exit": exit_px, "qty": qty, "pnl": pnl}
+
+def run_window(
+    arrays: Dict[str, np.ndarray],
+    lo: int,
+    hi: int,
+    params: Dict[str, Any],
+    *,
+    initial_capital: float,
+    risk_per_trade: float,
+) -> Dict[str, Any]:
+    """Fresh run of `params` on bars [lo, hi): flat at the start, and a position still
+    open at the end is closed at the last bar's close (res["end_trade"], else None)."""
+    window = {k: v[lo:hi] for k, v in arrays.items()}
+    res = run_sweep_fade(window, initial_capital=initial_capital, risk_per_trade=risk_per_trade, **params)
+    end = res["end_trade"] = _end_trade(res["final_state"], window["close"])
+    if end is not None:
+        res["equity"][-1] += end["pnl"]
+        res["trade_pnl"][-1] += end["pnl"]
+        res["position"][-1] = 0.0
+    return res
+
+def score_params(
+    arrays: Dict[str, np.ndarray],
+    params: Dict[str, Any],
+    folds: Sequence[Fold],
+    *,
+    initial_capital: float,
+    risk_per_trade: float,
+    bars_per_year: float,
+) -> Dict[str, Any]:
+    """One full-history run of `params`, scored on every fold's train window and on all bars.
+
+    A train window where that run is flat at both edges is scored on its slice
+    (rebased to initial_capital), which equals run_window on it. Where a position is
+    carried in or out (e.g. exit_friday_close=False), the window is run fresh with
+    run_window instead, so train scores never include trades from outside the window.
+    Returns {"folds": [CURVE_STATS + num_trades per train window], "full": the same
+    over the whole history, with a position open at the end closed at the last close}.
+    """
+    # the run is split at every train window edge to read the kernel state there: the
+    # position output is 0 on bars without a Monday range even while one is carried
+    n = len(arrays["close"])
+    edges = sorted({0, n, *(f.train_lo for f in folds), *(f.train_hi for f in folds)})
+    state = initial_state(initial_capital)
+    kernel = kernel_params(risk_per_trade=risk_per_trade, **params)
+    eq = np.empty(n)
+    exits, open_at = [], {}
+    for s, e in zip(edges, edges[1:]):
+        open_at[s] = state[S_IN_POS] != 0.0
+        chunk = {c: arrays[c][s:e] for c in FEATURE_COLUMNS}
+        next_wd = int(arrays["weekday"][e]) if e < n else -1
+        out, _, _, trades = sweep_fade_chunk(chunk, [arrays["long_sig"][s:e], arrays["short_sig"][s:e]], next_wd,
+                                             kernel, state, use_numba=HAS_NUMBA, offset=s)
+        eq[s:e] = out
+        exits.append(trades["exit_index"])
+    open_at[n] = state[S_IN_POS] != 0.0
+    exits = np.concatenate(exits)
+
+    def window(lo: int, hi: int) -> Dict[str, Any]:
+        # a run flat at `lo` equals a fresh one from there: bar `lo` starts an ISO week,
+        # so it is a Monday (no entries) or the week has no Monday range
+        if open_at[lo] or open_at[hi]:
+            fresh = run_window(arrays, lo, hi, params, initial_capital=initial_capital,
+                               risk_per_trade=risk_per_trade)
+            row = curve_metrics(fresh["equity"], bars_per_year=bars_per_year)
+            row["num_trades"] = fresh["num_trades"] + (fresh["end_trade"] is not None)
+            return row
+        row = curve_metrics(_rebased(eq, lo, hi, initial_capital), bars_per_year=bars_per_year)
+        row["num_trades"] = int(np.searchsorted(exits, hi) - np.searchsorted(exits, lo))
+        return row
+
+    scores = [window(f.train_lo, f.train_hi) for f in folds]
+    end = _end_trade(state, arrays["close"])
+    if end is not None:
+        eq[-1] += end["pnl"]
+    full = curve_metrics(eq, bars_per_year=bars_per_year)
+    full["num_trades"] = len(exits) + (end is not None)
+    return {"folds": scores, "full": full}
+
+def run_fold(
+    arrays: Dict[str, np.ndarray],
+    fold: Fold,
+    params: Dict[str, Any],
+    *,
+    initial_capital: float,
+    risk_per_trade: float,
+) -> Dict[str, Any]:
+    """run_window on the fold's test window (flat at both ends)."""
+    return run_window(arrays, fold.test_lo, fold.test_hi, params, initial_capital=initial_capital,
+                      risk_per_trade=risk_per_trade)
+
+# --- worker plumbing: feature arrays in one shared-memory block, as in src.sweep ---
+
+_WORKER: Dict[str, Any] = {}
+
+def _init_worker(shm_name: str, layout, settings: Dict[str, Any]) -> None:
+    _WORKER["arrays"] = attach_shared(shm_name, layout)
+    _WORKER["settings"] = settings
+
+def _score_chunk(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    s = _WORKER["settings"]
+    return [score_params(_WORKER["arrays"], p, s["folds"], initial_capital=s["initial_capital"],
+                         risk_per_trade=s["risk_per_trade"], bars_per_year=s["bars_per_year"]) for p in chunk]
+
+def _fold_task(task) -> Dict[str, Any]:
+    fold, params = task
+    s = _WORKER["settings"]
+    res = run_fold(_WORKER["arrays"], fold, params, initial_capital=s["initial_capital"],
+                   risk_per_trade=s["risk_per_trade"])
+    res.pop("trades")  # the per-field trade arrays carry the same data
+    return res
+
+@dataclass
+class WalkForwardResult:
+    folds: pd.DataFrame               # one row per fold: windows, chosen params, train score, test metrics
+    scores: pd.DataFrame              # every (fold, combination) train-window score
+    equity: pd.Series                 # stitched out-of-sample equity (test bars only)
+    trades: pd.DataFrame              # out-of-sample trade log with its fold
+    metrics: Dict[str, Any] = field(default_factory=dict)  # {"equity", "trades", "in_sample", ...}
+
+def walk_forward(
+    df: pd.DataFrame,
+    grid: Dict[str, Sequence[Any]] | List[Dict[str, Any]],
+    *,
+    bars_per_year: float,
+    train_weeks: int = 104,
+    test_weeks: int | None = 13,
+    n_folds: int | None = None,
+    anchored: bool = False,
+    objective: str = "sharpe",
+    min_trades: int = 0,
+    initial_capital: float = 10_000.0,
+    risk_per_trade: float = 100.0,
+    workers: int | None = None,
+    chunksize: int | None = None,
+) -> WalkForwardResult:
+    """Walk-forward optimization of the sweep-fade parameters over a feature frame
+    (output of add_monday_range, computed once for the whole history).
+
+    Every combination is run once over the full history, and each fold's train window
+    is scored on the slice of that run (rebased to initial_capital), so the number of
+    folds barely changes the cost; windows a position is carried into or out of are
+    run fresh instead (see score_params). Per fold, the combination with the best
+    `objective` among those with at least `min_trades` train trades (all, if none
+    qualify) is run fresh on the test window. A position still open at the end of a
+    train or test window is closed at that bar's close (reason WINDOW_END), and the
+    test equity curves are chained into one out-of-sample curve.
+
+    Combinations and then folds are spread over `workers` processes that map the
+    feature arrays from one shared-memory block; workers=1 runs in-process.
+    """
+    if objective not in CURVE_STATS:
+        raise ValueError(f"objective must be one of {CURVE_STATS}")
+    combos = param_grid(grid) if isinstance(grid, dict) else list(grid)
+    if not combos:
+        raise ValueError("Empty parameter grid")
+    arrays = feature_arrays(df)
+    arrays["long_sig"], arrays["short_sig"] = sweep_signals(arrays)
+    folds = walk_forward_folds(arrays["iso_year"], arrays["iso_week"], train_weeks=train_weeks,
+                               test_weeks=test_weeks, n_folds=n_folds, anchored=anchored)
+    settings = dict(folds=folds, initial_capital=initial_capital, risk_per_trade=risk_per_trade,
+                    bars_per_year=bars_per_year)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(combos)))
+    if workers == 1:
+        scored = [score_params(arrays, p, folds, initial_capital=initial_capital, risk_per_trade=risk_per_trade,
+                               bars_per_year=bars_per_year) for p in combos]
+        chosen = _choose(combos, scored, folds, objective, min_trades)
+        tests = [run_fold(arrays, f, combos[c], initial_capital=initial_capital, risk_per_trade=risk_per_trade)
+                 for f, c in zip(folds, chosen)]
+    else:
+        chunksize = chunksize or max(1, len(combos) // (workers * 4))
+        chunks = [combos[i:i + chunksize] for i in range(0, len(combos), chunksize)]
+        shm, layout = pack_shared(arrays)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shm.name, layout, settings)) as ex:
+                scored = [r for part in ex.map(_score_chunk, chunks) for r in part]
+                chosen = _choose(combos, scored, folds, objective, min_trades)
+                tests = list(ex.map(_fold_task, [(f, combos[c]) for f, c in zip(folds, chosen)]))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    return _assemble(df.index, arrays, combos, scored, folds, chosen, tests, settings, objective)
+
+def _choose(combos, scored, folds, objective: str, min_trades: int) -> List[int]:
+    sign = -1.0 if objective in _MINIMIZE else 1.0
+    chosen = []
+    for f in range(len(folds)):
+        rows = [s["folds"][f] for s in scored]
+        value = np.array([sign * r.get(objective, np.nan) for r in rows], dtype=np.float64)
+        value[np.isnan(value)] = -np.inf
+        ok = np.array([r["num_trades"] >= min_trades for r in rows])
+        if ok.any():
+            value[~ok] = -np.inf
+        chosen.append(int(np.argmax(value)))  # ties: first in grid order
+    return chosen
+
+def _assemble(index, arrays, combos, scored, folds, chosen, tests, settings, objective) -> WalkForwardResult:
+    cap = settings["initial_capital"]
+    bars_per_year = settings["bars_per_year"]
+
+    equity_parts, trade_parts, fold_rows = [], [], []
+    level = cap
+    for f, c, res in zip(folds, chosen, tests):
+        eq = np.asarray(res["equity"], dtype=np.float64)
+        test_index = index[f.test_lo:f.test_hi]
+        equity_parts.append(pd.Series(eq - cap + level, index=test_index))
+        iso_year, iso_week = arrays["iso_year"][f.test_lo:f.test_hi], arrays["iso_week"][f.test_lo:f.test_hi]
+        trades = trades_from_arrays(test_index, res, iso_year, iso_week)
+        end = res["end_trade"]
+        if end is not None:
+            i = end["index"]
+            closing = pd.DataFrame([{
+                "entry_time": test_index[i], "exit_time": test_index[i], "side": end["side"],
+                "entry": end["entry"], "exit": end["exit"], "qty": end["qty"], "pnl": end["pnl"],
+                "reason": WINDOW_END, "week_id": (int(iso_year[i]), int(iso_week[i])),
+            }])
+            trades = pd.concat([trades, closing], ignore_index=True) if len(trades) else closing
+        if len(trades):
+            trade_parts.append(trades.assign(fold=f.fold))
+        train = scored[c]["folds"][f.fold]
+        test = curve_metrics(eq, bars_per_year=bars_per_year)
+        fold_rows.append({
+            "fold": f.fold,
+            "train_start": index[f.train_lo], "train_end": index[f.train_hi - 1],
+            "test_start": index[f.test_lo], "test_end": index[f.test_hi - 1],
+            **combos[c],
+            f"train_{objective}": train.get(objective, np.nan),
+            "train_num_trades": train["num_trades"],
+            **{f"test_{k}": v for k, v in test.items()},
+            "test_num_trades": int(res["num_trades"]) + (end is not None),
+            "test_pnl": float(eq[-1] - cap) if len(eq) else 0.0,
+        })
+        level += float(eq[-1] - cap) if len(eq) else 0.0
+
+    equity = pd.concat(equity_parts).rename("equity")
+    trades = pd.concat(trade_parts, ignore_index=True) if trade_parts else pd.DataFrame()
+
+    scores = pd.DataFrame([
+        {"fold": f.fold, "combo": c, **combos[c], **scored[c]["folds"][f.fold]}
+        for f in folds for c in range(len(combos))
+    ])
+
+    sign = -1.0 if objective in _MINIMIZE else 1.0
+    full = [s["full"].get(objective, np.nan) for s in scored]
+    best_full = int(np.nanargmax(sign * np.array(full, dtype=np.float64)))
+    metrics = {
+        "equity": equity_metrics(equity, bars_per_year=bars_per_year),
+        "trades": trade_metrics(trades),
+        "folds": len(folds),
+        "combinations": len(combos),
+        "objective": objective,
+        # what a single optimization over all bars would have reported
+        "in_sample": {"params": combos[best_full], **scored[best_full]["full"]},
+    }
+    return WalkForwardResult(folds=pd.DataFrame(fold_rows), scores=scores, equity=equity, trades=trades,
+                             metrics=metrics)
@@ -0,0 +1,115 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import time
+
+from src.jobs import JOB_FILE, collect_errors, collect_results, create_job, job_status, run_job
+from src.metrics import bars_per_year_from_interval
+from src.universe import read_symbols
+
+def _floats(s: str) -> list[float]:
+    return [float(x) for x in s.split(",") if x.strip()]
+
+def _bools(s: str) -> list[bool]:
+    return [x.strip().lower() in ("1", "true", "yes", "y") for x in s.split(",") if x.strip()]
+
+def _periods(s: str) -> list[tuple[str, str]]:
+    out = []
+    for part in s.split(","):
+        if part.strip():
+            start, sep, end = part.strip().partition(":")
+            if not sep:
+                raise argparse.ArgumentTypeError(f"period {part!r} is not <start>:<end>")
+            out.append((start or None, end or None))
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Sharded, resumable parameter x symbol x period study: Monday range sweep-and-fade. "
+                    "Rerun the same command to resume; start more copies (on this or other hosts sharing "
+                    "--job_dir) to add workers.")
+    ap.add_argument("--job_dir", required=True, help="job directory: spec, shard claims and per-shard results")
+    ap.add_argument("--symbols_file", default=None,
+                    help="text file, one symbol per line (omit to join or inspect an existing job)")
+    ap.add_argument("--interval", default="4h")
+    ap.add_argument("--period", default="2y")
+    ap.add_argument("--periods", type=_periods, default=None,
+                    help="comma-separated <start>:<end> windows, each run separately (default: --start/--end)")
+    ap.add_argument("--start", default=None)
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--cache_dir", default="data/bars", help="local bar cache (memory-mapped .npy per column)")
+    ap.add_argument("--initial_capital", type=float, default=10_000.0)
+    ap.add_argument("--risk_per_trade", type=float, default=100.0)
+    ap.add_argument("--stop_mult", type=_floats, default=[0.5, 1.0, 1.5])
+    ap.add_argument("--tp1_frac", type=_floats, default=[0.25, 0.5, 0.75])
+    ap.add_argument("--tp2_to_full", type=_floats, default=[0.5, 1.0])
+    ap.add_argument("--tp1_at_mid", type=_bools, default=[True, False])
+    ap.add_argument("--exit_friday_close", type=_bools, default=[True, False])
+    ap.add_argument("--shard_size", type=int, default=64, help="parameter combinations per shard")
+    ap.add_argument("--workers", type=int, default=None, help="local worker processes (default: all cores)")
+    ap.add_argument("--heartbeat", type=float, default=30.0, help="seconds between claim refreshes")
+    ap.add_argument("--stale_after", type=float, default=300.0,
+                    help="take over claims whose heartbeat is older than this (killed workers on other hosts)")
+    ap.add_argument("--no_wait", action="store_true", help="exit when no shard is claimable instead of waiting")
+    ap.add_argument("--retry_failed", action="store_true", help="run failed shards again")
+    ap.add_argument("--status", action="store_true", help="print shard counts and exit")
+    ap.add_argument("--out_csv", default=None, help="combined results (default: <job_dir>/study.csv)")
+    ap.add_argument("--sort_by", default="sharpe")
+    args = ap.parse_args()
+
+    if args.symbols_file:
+        create_job(
+            args.job_dir,
+            read_symbols(args.symbols_file),
+            {
+                "stop_mult": args.stop_mult,
+                "tp1_frac": args.tp1_frac,
+                "tp2_to_full": args.tp2_to_full,
+                "tp1_at_mid": args.tp1_at_mid,
+                "exit_friday_close": args.exit_friday_close,
+            },
+            interval=args.interval,
+            bars_per_year=bars_per_year_from_interval(args.interval),
+            periods=args.periods or [(args.start, args.end)],
+            period=args.period,
+            initial_capital=args.initial_capital,
+            risk_per_trade=args.risk_per_trade,
+            cache_dir=args.cache_dir,
+            shard_size=args.shard_size,
+        )
+    elif not os.path.exists(os.path.join(args.job_dir, JOB_FILE)):
+        ap.error(f"no job in {args.job_dir}; pass --symbols_file to create one")
+
+    print(f"Job {args.job_dir}: {job_status(args.job_dir)}")
+    if args.status:
+        return
+
+    t0 = time.perf_counter()
+    workers = run_job(args.job_dir, workers=args.workers, retry_failed=args.retry_failed,
+                      heartbeat=args.heartbeat, stale_after=args.stale_after, wait=not args.no_wait)
+    elapsed = time.perf_counter() - t0
+    status = job_status(args.job_dir)
+    combos = int(workers["combos"].sum())
+    print(f"\n=== {int(workers['done'].sum())} shards, {combos} combinations in {elapsed:.2f}s "
+          f"({combos / max(elapsed, 1e-9):.1f}/s) across {len(workers)} local workers ===")
+    print(f"Job {args.job_dir}: {json.dumps(status)}")
+
+    errors = collect_errors(args.job_dir)
+    if len(errors):
+        print(f"\n{len(errors)} failed shards (rerun with --retry_failed):")
+        print(errors.drop_duplicates("symbol").to_string(index=False))
+
+    table = collect_results(args.job_dir)
+    if status["done"] < status["shards"]:
+        print(f"\nPartial results: {status['done']}/{status['shards']} shards")
+    if len(table):
+        if args.sort_by in table.columns:
+            table = table.sort_values(args.sort_by, ascending=False)
+        out_csv = args.out_csv or os.path.join(args.job_dir, "study.csv")
+        table.to_csv(out_csv, index=False)
+        print(table.head(10).to_string(index=False))
+        print(f"\nSaved: {out_csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+import argparse
+import os
+import time
+
+from src.data import download_ohlc
+from src.ingest import FileProvider
+from src.cache import BarStore, FeatureStore
+from src.experiments import ExperimentStore
+from src.features import add_monday_range
+from src.metrics import bars_per_year_from_interval
+from src.sweep import run_sweep
+
+def _floats(s: str) -> list[float]:
+    return [float(x) for x in s.split(",") if x.strip()]
+
+def _bools(s: str) -> list[bool]:
+    return [x.strip().lower() in ("1", "true", "yes", "y") for x in s.split(",") if x.strip()]
+
+def main():
+    ap = argparse.ArgumentParser(description="Parameter sweep: Monday range sweep-and-fade strategy.")
+    ap.add_argument("--symbol", default="BTC-USD")
+    ap.add_argument("--interval", default="4h")
+    ap.add_argument("--period", default="2y")
+    ap.add_argument("--start", default=None)
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--cache_dir", default="data/bars", help="local bar cache (memory-mapped .npy per column)")
+    ap.add_argument("--no_cache", action="store_true", help="always download, bypassing the local cache")
+    ap.add_argument("--refresh", action="store_true", help="fetch bars newer than the last cached one")
+    ap.add_argument("--data_file", default=None,
+                    help="local CSV/Parquet of bars or trades to resample to --interval instead of yfinance")
+    ap.add_argument("--data_kind", choices=["bars", "trades"], default="bars",
+                    help="bars: open/high/low/close columns; trades: one price column")
+    ap.add_argument("--initial_capital", type=float, default=10_000.0)
+    ap.add_argument("--risk_per_trade", type=float, default=100.0)
+    ap.add_argument("--stop_mult", type=_floats, default=[0.5, 1.0, 1.5])
+    ap.add_argument("--tp1_frac", type=_floats, default=[0.25, 0.5, 0.75])
+    ap.add_argument("--tp2_to_full", type=_floats, default=[0.5, 1.0])
+    ap.add_argument("--tp1_at_mid", type=_bools, default=[True, False])
+    ap.add_argument("--exit_friday_close", type=_bools, default=[True, False])
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--experiments", default="results/experiments.sqlite",
+                    help="experiment store: combinations already run on these bars are read back, not recomputed")
+    ap.add_argument("--no_memo", action="store_true", help="always recompute, bypassing the experiment store")
+    ap.add_argument("--sort_by", default="sharpe")
+    ap.add_argument("--out_csv", default="results/sweep.csv")
+    args = ap.parse_args()
+
+    store = None if args.no_cache else BarStore(args.cache_dir)
+    provider = FileProvider({args.symbol: args.data_file}, kind=args.data_kind) if args.data_file else None
+    df = download_ohlc(args.symbol, interval=args.interval, period=args.period, start=args.start, end=args.end,
+                       provider=provider, store=store, refresh=args.refresh)
+    if store is not None:
+        print(f"Bar cache: {store.stats}")
+    features = None if store is None else FeatureStore(os.path.join(args.cache_dir, "_features"))
+    df = add_monday_range(df, store=features)
+    if features is not None:
+        print(f"Feature cache: {features.stats}")
+
+    grid = {
+        "stop_mult": args.stop_mult,
+        "tp1_frac": args.tp1_frac,
+        "tp2_to_full": args.tp2_to_full,
+        "tp1_at_mid": args.tp1_at_mid,
+        "exit_friday_close": args.exit_friday_close,
+    }
+
+    experiments = None if args.no_memo else ExperimentStore(args.experiments)
+    t0 = time.perf_counter()
+    table = run_sweep(
+        df,
+        grid,
+        bars_per_year=bars_per_year_from_interval(args.interval),
+        initial_capital=args.initial_capital,
+        risk_per_trade=args.risk_per_trade,
+        workers=args.workers,
+        store=experiments,
+        symbol=args.symbol,
+        interval=args.interval,
+    )
+    elapsed = time.perf_counter() - t0
+    if experiments is not None:
+        print(f"Experiment store: {experiments.stats}")
+        experiments.close()
+
+    if args.sort_by in table.columns:
+        table = table.sort_values(args.sort_by, ascending=False)
+    table.to_csv(args.out_csv, index=False)
+
+    print(f"\n=== Sweep: {len(table)} combinations over {len(df)} bars in {elapsed:.2f}s ===")
+    print(table.head(10).to_string(index=False))
+    print(f"\nSaved: {args.out_csv}")
+
+if __name__ == "__main__":
+    main()
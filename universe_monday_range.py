@@ -0,0 +1,93 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import time
+
+from src.cache import BarStore
+from src.download import download_many
+from src.metrics import bars_per_year_from_interval
+from src.universe import read_symbols, run_universe, timing_report
+
+def main():
+    ap = argparse.ArgumentParser(description="Universe run: Monday range research + backtest per symbol.")
+    ap.add_argument("--symbols_file", required=True, help="text file, one symbol per line")
+    ap.add_argument("--interval", default="4h")
+    ap.add_argument("--period", default="2y")
+    ap.add_argument("--start", default=None)
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--cache_dir", default="data/bars", help="local bar cache (memory-mapped .npy per column)")
+    ap.add_argument("--no_cache", action="store_true", help="always download, bypassing the local cache")
+    ap.add_argument("--initial_capital", type=float, default=10_000.0)
+    ap.add_argument("--risk_per_trade", type=float, default=100.0)
+    ap.add_argument("--stop_mult", type=float, default=1.0)
+    ap.add_argument("--tp1_frac", type=float, default=0.5)
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--max_in_flight", type=int, default=None, help="symbols queued at once (default: 2 x workers)")
+    ap.add_argument("--download_workers", type=int, default=0,
+                    help="prefetch all symbols into the cache with this many concurrent downloads (0: off)")
+    ap.add_argument("--rate", type=float, default=None, help="max download requests per second (token bucket)")
+    ap.add_argument("--retries", type=int, default=3, help="retries per request, with exponential backoff")
+    ap.add_argument("--plots", action="store_true", help="save each symbol's equity curve to <out_dir>/plots/")
+    ap.add_argument("--out_dir", default="results/universe")
+    args = ap.parse_args()
+
+    symbols = read_symbols(args.symbols_file)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    t0 = time.perf_counter()
+    if args.download_workers > 0:
+        if args.no_cache:
+            ap.error("--download_workers prefetches into the local cache; drop --no_cache")
+        _, downloads = download_many(
+            symbols, interval=args.interval, period=args.period, start=args.start, end=args.end,
+            store=BarStore(args.cache_dir), workers=args.download_workers, rate=args.rate,
+            retries=args.retries, verbose=True,
+        )
+        out_downloads = os.path.join(args.out_dir, "universe_downloads.csv")
+        downloads.to_csv(out_downloads, index=False)
+        ok = int((downloads["status"] == "ok").sum())
+        print(f"Prefetched {ok}/{len(symbols)} symbols in {time.perf_counter() - t0:.2f}s; saved {out_downloads}\n")
+
+    table = run_universe(
+        symbols,
+        interval=args.interval,
+        period=args.period,
+        start=args.start,
+        end=args.end,
+        bars_per_year=bars_per_year_from_interval(args.interval),
+        params=dict(
+            initial_capital=args.initial_capital,
+            risk_per_trade=args.risk_per_trade,
+            stop_mult=args.stop_mult,
+            tp1_frac=args.tp1_frac,
+        ),
+        cache_dir=None if args.no_cache else args.cache_dir,
+        trades_dir=os.path.join(args.out_dir, "trades"),
+        plots_dir=os.path.join(args.out_dir, "plots") if args.plots else None,
+        workers=args.workers,
+        max_in_flight=args.max_in_flight,
+    )
+    elapsed = time.perf_counter() - t0
+
+    out_metrics = os.path.join(args.out_dir, "universe_metrics.csv")
+    out_timing = os.path.join(args.out_dir, "universe_timing.json")
+    table.to_csv(out_metrics, index=False)
+    report = timing_report(table)
+    report["wall_s"] = elapsed
+    with open(out_timing, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n=== Universe: {report['ok']}/{report['symbols']} symbols ok in {elapsed:.2f}s ===")
+    for stage in ("load", "features", "research", "backtest", "plot"):
+        if stage in report:
+            s = report[stage]
+            print(f"{stage:>10}: sum {s['sum_s']:.2f}s  mean {s['mean_s']:.3f}s  max {s['max_s']:.3f}s")
+    print(f"\nSaved: {out_metrics}")
+    print(f"Saved: {out_timing}")
+    print(f"Saved: {os.path.join(args.out_dir, 'trades')}/")
+    if args.plots:
+        print(f"Saved: {os.path.join(args.out_dir, 'plots')}/")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import time
+
+from src.data import download_ohlc
+from src.ingest import FileProvider
+from src.cache import BarStore, FeatureStore
+from src.features import add_monday_range
+from src.metrics import CURVE_STATS, bars_per_year_from_interval
+from src.plotting import render_equity
+from src.walkforward import walk_forward
+
+def _floats(s: str) -> list[float]:
+    return [float(x) for x in s.split(",") if x.strip()]
+
+def _bools(s: str) -> list[bool]:
+    return [x.strip().lower() in ("1", "true", "yes", "y") for x in s.split(",") if x.strip()]
+
+def main():
+    ap = argparse.ArgumentParser(description="Walk-forward optimization: Monday range sweep-and-fade strategy.")
+    ap.add_argument("--symbol", default="BTC-USD")
+    ap.add_argument("--interval", default="4h")
+    ap.add_argument("--period", default="10y")
+    ap.add_argument("--start", default=None)
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--cache_dir", default="data/bars", help="local bar cache (memory-mapped .npy per column)")
+    ap.add_argument("--no_cache", action="store_true", help="always download, bypassing the local cache")
+    ap.add_argument("--refresh", action="store_true", help="fetch bars newer than the last cached one")
+    ap.add_argument("--data_file", default=None,
+                    help="local CSV/Parquet of bars or trades to resample to --interval instead of yfinance")
+    ap.add_argument("--data_kind", choices=["bars", "trades"], default="bars",
+                    help="bars: open/high/low/close columns; trades: one price column")
+    ap.add_argument("--initial_capital", type=float, default=10_000.0)
+    ap.add_argument("--risk_per_trade", type=float, default=100.0)
+    ap.add_argument("--stop_mult", type=_floats, default=[0.5, 1.0, 1.5])
+    ap.add_argument("--tp1_frac", type=_floats, default=[0.25, 0.5, 0.75])
+    ap.add_argument("--tp2_to_full", type=_floats, default=[0.5, 1.0])
+    ap.add_argument("--tp1_at_mid", type=_bools, default=[True, False])
+    ap.add_argument("--exit_friday_close", type=_bools, default=[True, False])
+    ap.add_argument("--train_weeks", type=int, default=104, help="ISO weeks per train window")
+    ap.add_argument("--test_weeks", type=int, default=13, help="ISO weeks per test window")
+    ap.add_argument("--folds", type=int, default=None, help="split the history into this many test windows instead")
+    ap.add_argument("--anchored", action="store_true", help="train from the first week (growing) instead of rolling")
+    ap.add_argument("--objective", choices=CURVE_STATS, default="sharpe")
+    ap.add_argument("--min_trades", type=int, default=0, help="train trades a combination needs to be chosen")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--out_dir", default="results/walkforward")
+    args = ap.parse_args()
+
+    store = None if args.no_cache else BarStore(args.cache_dir)
+    provider = FileProvider({args.symbol: args.data_file}, kind=args.data_kind) if args.data_file else None
+    df = download_ohlc(args.symbol, interval=args.interval, period=args.period, start=args.start, end=args.end,
+                       provider=provider, store=store, refresh=args.refresh)
+    if store is not None:
+        print(f"Bar cache: {store.stats}")
+    features = None if store is None else FeatureStore(os.path.join(args.cache_dir, "_features"))
+    df = add_monday_range(df, store=features)
+    if features is not None:
+        print(f"Feature cache: {features.stats}")
+
+    grid = {
+        "stop_mult": args.stop_mult,
+        "tp1_frac": args.tp1_frac,
+        "tp2_to_full": args.tp2_to_full,
+        "tp1_at_mid": args.tp1_at_mid,
+        "exit_friday_close": args.exit_friday_close,
+    }
+
+    t0 = time.perf_counter()
+    try:
+        result = walk_forward(
+            df,
+            grid,
+            bars_per_year=bars_per_year_from_interval(args.interval),
+            train_weeks=args.train_weeks,
+            test_weeks=args.test_weeks,
+            n_folds=args.folds,
+            anchored=args.anchored,
+            objective=args.objective,
+            min_trades=args.min_trades,
+            initial_capital=args.initial_capital,
+            risk_per_trade=args.risk_per_trade,
+            workers=args.workers,
+        )
+    except ValueError as exc:
+        ap.error(str(exc))
+    elapsed = time.perf_counter() - t0
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    out_folds = os.path.join(args.out_dir, "walkforward_folds.csv")
+    out_scores = os.path.join(args.out_dir, "walkforward_scores.csv")
+    out_equity = os.path.join(args.out_dir, "walkforward_equity.csv")
+    out_trades = os.path.join(args.out_dir, "walkforward_trades.csv")
+    out_metrics = os.path.join(args.out_dir, "walkforward_metrics.json")
+    out_plot = os.path.join(args.out_dir, "walkforward_equity.png")
+    result.folds.to_csv(out_folds, index=False)
+    result.scores.to_csv(out_scores, index=False)
+    result.equity.to_csv(out_equity)
+    result.trades.to_csv(out_trades, index=False)
+    with open(out_metrics, "w", encoding="utf-8") as f:
+        json.dump(result.metrics, f, indent=2)
+    render_equity(result.equity, out_plot,
+                  title=f"Walk-forward out-of-sample equity: {args.symbol} ({args.interval})")
+
+    m = result.metrics
+    print(f"\n=== Walk-forward: {m['folds']} folds x {m['combinations']} combinations "
+          f"over {len(df)} bars in {elapsed:.2f}s ===")
+    cols = ["fold", "test_start", *grid, f"train_{args.objective}", f"test_{args.objective}", "test_pnl"]
+    print(result.folds[[c for c in cols if c in result.folds.columns]].to_string(index=False))
+    print(f"\nOut-of-sample: {m['equity']}")
+    print(f"In-sample best ({m['in_sample']['params']}): "
+          f"{ {k: m['in_sample'][k] for k in ('total_return', 'sharpe', 'max_drawdown')} }")
+    for path in (out_folds, out_scores, out_equity, out_trades, out_metrics, out_plot):
+        print(f"Saved: {path}")
+
+if __name__ == "__main__":
+    main()